@@ -80,8 +80,9 @@ print(f"{git.__name__} is installed.")
 # Local imports implemented to support Blender refreshes 
 """ORDER MATTERS"""
 modulesNames = ("newProject", "openProject", "reports",
-                "startMenu", "subscriptions","sourceControl", 
-                "commitsPanel", "appHandlers")
+                "startMenu", "subscriptions", "depsgraphCapture", 
+                "meshSnapshots", "thumbnails", "sourceControl", 
+                "autoCommit", "maintenance", "commitsPanel", "appHandlers")
 for module in modulesNames:
     if module in sys.modules:
         importlib.reload(sys.modules[module])
@@ -1,4 +1,3 @@
-import os
 import sys
 import importlib
 
@@ -7,7 +6,8 @@ from bpy.app import handlers
 from bpy.app.handlers import persistent
 
 # Local imports implemented to support Blender refreshes
-modulesNames = ("reports", "subscriptions")
+modulesNames = ("reports", "subscriptions", "depsgraphCapture", 
+                "meshSnapshots", "autoCommit", "thumbnails")
 for module in modulesNames:
     if module in sys.modules:
         importlib.reload(sys.modules[module])
@@ -29,28 +29,36 @@ def loadPreferencesHandler(_):
 
 @persistent
 def savePostHandler(_):
-    filepath = bpy.path.abspath("//")
-    filename = bpy.path.basename(bpy.data.filepath).split(".")[0]
-
     # Apply all transforms
     # bpy.ops.object.transform_apply(location=True, rotation=True, scale=True)
 
-    commands = reports.getCommands()
-
-    with open(os.path.join(filepath, f"{filename}.py"), "a") as file: 
-        for command in commands:
-            file.write(f"\t{command}\n")
-    
-    reports.clearReports()
+    # Write commands to Python file and clear reports
+    reports.flushCommands()
 
 
 @persistent
 def loadPostHandler(_):
     bpy.ops.wm.splash('INVOKE_DEFAULT')
     
-    # Message bus subscription
+    # Message bus subscription, of the properties chosen
+    subscriptions.setWatched(
+        bpy.context.window_manager.blendit.watchedProperties)
     subscriptions.subscribe()
 
+    # Depsgraph capture, if chosen
+    captureMode = bpy.context.window_manager.blendit.captureMode
+    depsgraphCapture.setEnabled(captureMode == 'DEPSGRAPH')
+
+    # Mesh snapshots, if chosen
+    meshSnapshots.setEnabled(bpy.context.window_manager.blendit.meshSnapshots)
+
+    # Auto-commit, if chosen
+    autoCommit.setEnabled(bpy.context.window_manager.blendit.autoCommit)
+
+    # Thumbnail back-fill, if chosen
+    thumbnails.setEnabled(
+        bpy.context.window_manager.blendit.thumbnailBackfill)
+
 
 def register():
     print("Registering to Change Defaults")
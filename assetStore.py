@@ -0,0 +1,204 @@
+import os
+import json
+import shutil
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+    Content-addressed store for the assets/ folder
+
+    <project>/assets.manifest           Versioned, "<hash> <size> <path>" lines
+    .git/blendit/assets/index.json      Stat cache, path -> [mtime, size, inode, hash]
+    .git/blendit/assets/objects/ab/cd   Unique file contents keyed by hash
+
+    Files whose mtime, size and inode match the stat cache are not rehashed,
+    new or changed files are hashed in parallel and each unique content is
+    stored once.
+"""
+ASSETS_DIR = "assets"
+MANIFEST = "assets.manifest"
+CHUNK_SIZE = 1024 * 1024
+
+
+def getStorePaths(storePath):
+    """Returns paths of stat index and objects directory"""
+
+    assetsPath = os.path.join(storePath, "assets")
+    return (os.path.join(assetsPath, "index.json"),
+            os.path.join(assetsPath, "objects"))
+
+
+def getObjectPath(objectsPath, digest):
+    """Returns path of stored object with given hash"""
+
+    return os.path.join(objectsPath, digest[:2], digest[2:])
+
+
+def hashFile(path):
+    """Returns sha256 hex digest of file contents"""
+
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def readIndex(indexPath):
+    """Returns stat index, empty if missing or unreadable"""
+
+    try:
+        with open(indexPath, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def writeIndex(indexPath, index):
+    """Writes stat index atomically"""
+
+    os.makedirs(os.path.dirname(indexPath), exist_ok=True)
+    tempPath = f"{indexPath}.tmp"
+    with open(tempPath, "w") as file:
+        json.dump(index, file)
+    os.replace(tempPath, indexPath)
+
+
+def scanAssets(path):
+    """Returns dict of relative path -> os.stat_result of files in assets/"""
+
+    assetsPath = os.path.join(path, ASSETS_DIR)
+    files = {}
+    for root, _, names in os.walk(assetsPath):
+        for name in names:
+            filePath = os.path.join(root, name)
+            relpath = os.path.relpath(filePath, path).replace(os.sep, "/")
+            files[relpath] = os.stat(filePath)
+    return files
+
+
+def hashAssets(path, storePath, workers=None):
+    """
+    Returns dict of relative path -> (hash, size) of files in assets/
+    Only files whose stat differs from the stat index are hashed.
+    """
+
+    indexPath, _ = getStorePaths(storePath)
+    index = readIndex(indexPath)
+    files = scanAssets(path)
+
+    hashes = {}
+    toHash = []
+    for relpath, stat in files.items():
+        cached = index.get(relpath)
+        if cached and cached[:3] == [stat.st_mtime_ns, stat.st_size,
+                                     stat.st_ino]:
+            hashes[relpath] = cached[3]
+        else:
+            toHash.append(relpath)
+
+    # Hash new and changed files in parallel, hashlib releases the GIL
+    if toHash:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            digests = executor.map(
+                hashFile, [os.path.join(path, relpath) for relpath in toHash])
+            for relpath, digest in zip(toHash, digests):
+                hashes[relpath] = digest
+
+    # Update stat index
+    index = {}
+    for relpath, stat in files.items():
+        index[relpath] = [stat.st_mtime_ns, stat.st_size, stat.st_ino,
+                          hashes[relpath]]
+    writeIndex(indexPath, index)
+
+    return {relpath: (hashes[relpath], files[relpath].st_size)
+            for relpath in files}
+
+
+def snapshot(path, storePath, workers=None):
+    """Stores new asset contents and writes assets.manifest"""
+
+    _, objectsPath = getStorePaths(storePath)
+    assets = hashAssets(path, storePath, workers)
+
+    # Store each unique content once
+    for relpath, (digest, _) in assets.items():
+        objectPath = getObjectPath(objectsPath, digest)
+        if os.path.exists(objectPath):
+            continue
+        os.makedirs(os.path.dirname(objectPath), exist_ok=True)
+        tempPath = f"{objectPath}.tmp"
+        shutil.copyfile(os.path.join(path, relpath), tempPath)
+        os.replace(tempPath, objectPath)
+
+    with open(os.path.join(path, MANIFEST), "w") as file:
+        for relpath in sorted(assets):
+            digest, size = assets[relpath]
+            file.write(f"{digest} {size} {relpath}\n")
+
+    return assets
+
+
+def readManifest(text):
+    """Returns dict of relative path -> (hash, size) from manifest text"""
+
+    assets = {}
+    for line in (text or "").splitlines():
+        digest, size, relpath = line.split(" ", 2)
+        assets[relpath] = (digest, int(size))
+    return assets
+
+
+def restore(path, storePath, manifestText):
+    """
+    Makes assets/ match the given manifest
+    Files not in the manifest are only removed if their content is stored.
+    """
+
+    _, objectsPath = getStorePaths(storePath)
+    wanted = readManifest(manifestText)
+    current = hashAssets(path, storePath)
+
+    for relpath, (digest, _) in wanted.items():
+        if current.get(relpath, (None,))[0] == digest:
+            continue
+        objectPath = getObjectPath(objectsPath, digest)
+        if not os.path.exists(objectPath):
+            print(f"Blendit: asset {relpath} missing from store.")
+            continue
+        filePath = os.path.join(path, relpath)
+        os.makedirs(os.path.dirname(filePath), exist_ok=True)
+        shutil.copyfile(objectPath, filePath)
+
+    for relpath, (digest, _) in current.items():
+        if relpath in wanted:
+            continue
+        if os.path.exists(getObjectPath(objectsPath, digest)):
+            os.remove(os.path.join(path, relpath))
+
+
+def prune(storePath, keep):
+    """
+    Removes stored objects whose hash is neither in keep nor in the stat
+    index. Returns (number of objects removed, bytes freed)
+    """
+
+    indexPath, objectsPath = getStorePaths(storePath)
+    keep = set(keep) | {entry[3] for entry in readIndex(indexPath).values()}
+
+    removed = freed = 0
+    if not os.path.isdir(objectsPath):
+        return removed, freed
+
+    for entry in os.scandir(objectsPath):
+        if not entry.is_dir():
+            continue
+        for obj in os.scandir(entry.path):
+            if entry.name + obj.name in keep:
+                continue
+            freed += obj.stat().st_size
+            removed += 1
+            os.remove(obj.path)
+
+    return removed, freed
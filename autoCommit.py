@@ -0,0 +1,179 @@
+import sys
+import time
+import importlib
+
+import bpy
+from bpy.app import handlers
+from bpy.app.handlers import persistent
+
+import pygit2 as git
+from pygit2._pygit2 import GitError
+
+# Local imports implemented to support Blender refreshes
+modulesNames = ("commandLog", "gitHelpers", "sourceControl")
+for module in modulesNames:
+    if module in sys.modules:
+        importlib.reload(sys.modules[module])
+    else:
+        parent = ".".join(__name__.split(".")[:-1])
+        globals()[module] = importlib.import_module(f"{parent}.{module}")
+
+
+"""
+    Auto-commit
+
+    Commits captured commands once Blender has been idle long enough, or
+    once enough commands are waiting and a burst of edits has settled.
+    Only commands already flushed to <name>.py, e.g. by saving, count as
+    waiting, reports are not read before committing. Checks run on a
+    timer and after saving, and never while a modal operator runs or
+    animation plays.
+
+    Running modal operators are only listed since Blender 4.2. Before
+    that, edits must settle for the whole idle time instead, so a commit
+    does not land in the middle of a modal operator.
+"""
+# Seconds between checks
+CHECK_INTERVAL = 10
+
+# Seconds without changes a burst of edits needs before committing
+SETTLE_TIME = 3
+
+# Time of the last change seen, and of the last one already committed
+lastActivity = time.monotonic()
+committedActivity = None
+
+enabled = False
+
+
+@persistent
+def depsgraphUpdateHandler(scene, depsgraph):
+    global lastActivity
+    lastActivity = time.monotonic()
+
+
+@persistent
+def savePostHandler(_):
+    # Commands were just flushed, check the threshold once edits settle
+    if enabled and not bpy.app.timers.is_registered(checkAfterSave):
+        bpy.app.timers.register(checkAfterSave, first_interval=SETTLE_TIME)
+
+
+def checkAfterSave():
+    checkAutoCommit()
+
+
+def isBusy():
+    """
+    Returns True while a modal operator runs or animation plays, None if
+    modal operators cannot be told
+    """
+
+    screen = bpy.context.screen
+    if screen and screen.is_animation_playing:
+        return True
+
+    busy = False
+    for window in bpy.context.window_manager.windows:
+        # Available since Blender 4.2
+        operators = getattr(window, "modal_operators", None)
+        if operators is None:
+            busy = None
+        elif len(operators):
+            return True
+    return busy
+
+
+def countPending(filepath, filename):
+    """Returns number of commands not yet committed"""
+
+    read = commandLog.fileReader(filepath)
+    text = read(f"{filename}.py")
+    if text is None:
+        return 0
+    return sum(1 for _ in commandLog.iterCommands(commandLog.splitLog(text)[1]))
+
+
+def autoCommit(context, repo, filepath, filename):
+    """Flushes captured commands and commits them, returns count committed"""
+
+    sourceControl.flushCommands(context, filepath, filename)
+
+    count = countPending(filepath, filename)
+    if not count:
+        return 0
+
+    gitHelpers.commit(repo, f"Auto-commit: {count} commands")
+    return count
+
+
+def checkAutoCommit():
+    """Timer committing when idle or over the command threshold"""
+
+    global committedActivity
+
+    if not enabled:
+        return None
+
+    # Nothing changed since the last commit
+    if lastActivity == committedActivity:
+        return CHECK_INTERVAL
+
+    busy = isBusy()
+    if not bpy.data.filepath or busy:
+        return CHECK_INTERVAL
+
+    context = bpy.context
+    settings = context.window_manager.blendit
+
+    # Without modal_operators only a long pause rules out a modal operator
+    settle = SETTLE_TIME if busy is False else settings.autoCommitIdle
+    idle = time.monotonic() - lastActivity
+    if idle < settle:
+        return CHECK_INTERVAL
+    filepath = bpy.path.abspath("//")
+    filename = bpy.path.basename(bpy.data.filepath).split(".")[0]
+
+    try:
+        repo = git.Repository(filepath)
+    except GitError:
+        return CHECK_INTERVAL
+
+    # Cheap check first, reports are only flushed when committing
+    pending = countPending(filepath, filename)
+    if idle < settings.autoCommitIdle and pending < settings.autoCommitCommands:
+        return CHECK_INTERVAL
+
+    committedActivity = lastActivity
+    count = autoCommit(context, repo, filepath, filename)
+    if count:
+        print(f"Blendit auto-commit: {count} commands")
+
+    return CHECK_INTERVAL
+
+
+def setEnabled(value):
+    """Starts or stops the auto-commit timer"""
+
+    global enabled, lastActivity
+    if value == enabled:
+        return
+    enabled = value
+
+    if enabled:
+        lastActivity = time.monotonic()
+        handlers.depsgraph_update_post.append(depsgraphUpdateHandler)
+        handlers.save_post.append(savePostHandler)
+        bpy.app.timers.register(checkAutoCommit, first_interval=CHECK_INTERVAL,
+                                persistent=True)
+    else:
+        if depsgraphUpdateHandler in handlers.depsgraph_update_post:
+            handlers.depsgraph_update_post.remove(depsgraphUpdateHandler)
+        if savePostHandler in handlers.save_post:
+            handlers.save_post.remove(savePostHandler)
+        if bpy.app.timers.is_registered(checkAutoCommit):
+            bpy.app.timers.unregister(checkAutoCommit)
+
+
+def unregister():
+    setEnabled(False)
@@ -0,0 +1,433 @@
+"""
+    Headless batch regeneration of Blendit projects
+
+    Usage:
+        blender -b --python batchRegen.py -- [--jobs N] [--output DIR]
+                                              PROJECT[@COMMIT] ...
+
+    Each PROJECT[@COMMIT] pair is regenerated into DIR/<name>-<commit>.blend
+    by its own headless Blender process, at most N at a time. COMMIT
+    defaults to HEAD and may be any revision understood by git, <commit>
+    is the short id it resolves to. Revisions resolving to the same
+    commit of a project are rejected.
+
+    --stop-command N and --stop-offset B replay the log only up to the Nth
+    command or byte B of the log, using the streaming interpreter.
+    --objects NAME ... only replays the commands these objects depend on.
+
+    --partitions replays groups of objects that share no datablocks in
+    parallel worker processes and appends their objects into one file.
+    Partitions of every project share the pool of N processes and are
+    merged by this process. Logs that cannot be split are regenerated
+    whole.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import importlib
+import traceback
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import bpy
+
+PACKAGE_PATH = os.path.dirname(os.path.abspath(__file__))
+STARTUP_FILE = os.path.join(PACKAGE_PATH, "startup.blend")
+
+
+def importBlendit():
+    """Imports the Blendit package when running as a standalone script"""
+
+    if __package__:
+        return sys.modules[__package__]
+
+    sys.path.insert(0, os.path.dirname(PACKAGE_PATH))
+    return importlib.import_module(os.path.basename(PACKAGE_PATH))
+
+
+def getScriptArgs():
+    """Returns arguments passed after -- on the Blender command line"""
+
+    if "--" not in sys.argv:
+        return []
+    return sys.argv[sys.argv.index("--") + 1:]
+
+
+def parseJob(spec):
+    """Returns (project path, revision) of a PROJECT[@COMMIT] spec"""
+
+    project, _, revision = spec.partition("@")
+    return os.path.abspath(project), revision or "HEAD"
+
+
+def resolveJobs(jobs):
+    """
+    Returns (project, revision, commit id) of (project, revision) pairs
+    Raises ValueError for unknown revisions and repeated commits.
+    """
+
+    import pygit2 as git
+
+    resolved = []
+    seen = {}
+    for project, revision in jobs:
+        try:
+            repo = git.Repository(project)
+            commit = repo.revparse_single(revision).peel(git.Commit)
+        except (KeyError, ValueError):
+            raise ValueError(f"{project}@{revision}: unknown revision")
+        except git.GitError as error:
+            raise ValueError(f"{project}@{revision}: {error}")
+
+        # Both would be written to the same file
+        commitId = str(commit.id)
+        if (project, commitId) in seen:
+            raise ValueError(f"{project}@{revision} is the same commit as "
+                             f"{project}@{seen[(project, commitId)]}")
+        seen[(project, commitId)] = revision
+        resolved.append((project, revision, commitId))
+    return resolved
+
+
+def regenCommit(project, revision, output, stopIndex=None, stopOffset=None,
+                objects=None):
+    """
+    Regenerates project at revision and saves it to output
+    stopIndex, stopOffset: only replay commands before this index or offset
+    objects: only replay commands these objects depend on
+    """
+
+    blendit = importBlendit()
+    import pygit2 as git
+
+    repo = git.Repository(project)
+    commit = repo.revparse_single(revision).peel(git.Commit)
+    filename = blendit.gitHelpers.getProjectName(repo)
+
+    # Start from Blendit's startup file, same as the app template
+    bpy.ops.wm.read_homefile(filepath=STARTUP_FILE, load_ui=False)
+
+    read = blendit.gitHelpers.treeReader(repo, commit)
+    if stopIndex is None and stopOffset is None:
+        regen = blendit.openProject.importRegen(project, filename, read, 
+                                                objects)
+        blendit.openProject.executeRegen(regen)
+    else:
+        interpreter = blendit.openProject.interpretRegen(project, filename, 
+                                                         read)
+        with blendit.replayHelpers.bulkReplay():
+            interpreter.run(stopOffset=stopOffset, stopIndex=stopIndex)
+        print(f"Replayed {interpreter.index} commands, "
+              f"{interpreter.offset} bytes")
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    bpy.ops.wm.save_mainfile(filepath=output)
+
+
+def getCommands(read, filename):
+    """Returns every command of a project log"""
+
+    blendit = importBlendit()
+    commandLog = blendit.commandLog
+    return [command for _, body in commandLog.readLogBodies(read, filename)
+            for command in commandLog.iterCommands(body)]
+
+
+def mergePartition(path, names):
+    """Appends objects with names and their collections from file at path"""
+
+    existing = {collection.name: collection 
+                for collection in bpy.data.collections}
+
+    with bpy.data.libraries.load(path) as (dataFrom, dataTo):
+        dataTo.collections = list(dataFrom.collections)
+        dataTo.objects = [name for name in names if name in dataFrom.objects]
+    collectionNames = list(dataFrom.collections)
+
+    # Nested collections are linked through their parent
+    children = {child.name for collection in dataTo.collections 
+                if collection for child in collection.children}
+
+    # Merge collections that already exist, e.g. the startup Collection
+    for name, collection in zip(collectionNames, dataTo.collections):
+        if collection is None:
+            continue
+        target = existing.get(name)
+        if target is None:
+            if collection.name not in children:
+                bpy.context.scene.collection.children.link(collection)
+            continue
+        for obj in collection.objects:
+            if obj.name not in target.objects:
+                target.objects.link(obj)
+        for child in collection.children:
+            if child.name not in target.children:
+                target.children.link(child)
+        bpy.data.collections.remove(collection)
+
+    # Objects that were only in the scene collection
+    for obj in dataTo.objects:
+        if obj is not None and not obj.users_collection:
+            bpy.context.scene.collection.objects.link(obj)
+
+
+def getPartitionGroups(project, revision, count):
+    """
+    Returns lists of object names to replay apart of project at revision,
+    None if the log cannot be split
+    """
+
+    blendit = importBlendit()
+    import pygit2 as git
+
+    repo = git.Repository(project)
+    commit = repo.revparse_single(revision).peel(git.Commit)
+    filename = blendit.gitHelpers.getProjectName(repo)
+    read = blendit.gitHelpers.treeReader(repo, commit)
+
+    commands = getCommands(read, filename)
+    return blendit.logSlicer.getPartitionGroups(commands, count)
+
+
+def mergePartitions(project, revision, output, paths, groups):
+    """Merges replayed partitions at paths, then replays scene settings"""
+
+    blendit = importBlendit()
+    import pygit2 as git
+
+    repo = git.Repository(project)
+    commit = repo.revparse_single(revision).peel(git.Commit)
+    filename = blendit.gitHelpers.getProjectName(repo)
+    read = blendit.gitHelpers.treeReader(repo, commit)
+
+    # Start from Blendit's startup file, same as the app template
+    bpy.ops.wm.read_homefile(filepath=STARTUP_FILE, load_ui=False)
+    for path, names in zip(paths, groups):
+        mergePartition(path, names)
+
+    # Scene settings may point to objects of any partition
+    isSceneCommand = blendit.logSlicer.isSceneCommand
+    regen = blendit.openProject.importRegen(
+        project, filename, read, 
+        commandFilter=lambda commands: [command for command in commands
+                                        if isSceneCommand(command)])
+    blendit.openProject.executeRegen(regen)
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    bpy.ops.wm.save_mainfile(filepath=output)
+
+
+def runJob(project, revision, output, limits=()):
+    """
+    Runs one regeneration in a headless Blender process
+    limits: extra worker arguments like ("--stop-command", "100")
+    """
+
+    command = [
+        bpy.app.binary_path, "-b", "--factory-startup",
+        "--python-exit-code", "1", "--python", os.path.abspath(__file__),
+        "--", "--worker", project, revision, output, *limits
+    ]
+
+    start = time.perf_counter()
+    process = subprocess.run(command, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+
+    error = ""
+    if process.returncode != 0:
+        lines = (process.stderr or process.stdout).strip().splitlines()
+        error = lines[-1] if lines else f"exit code {process.returncode}"
+
+    return {"project": project, "revision": revision, "output": output,
+            "time": elapsed, "error": error}
+
+
+def runBatch(jobs, outputPath, processes=None, limits=()):
+    """
+    Regenerates (project, revision, commit id) jobs in parallel, returns
+    results
+    """
+
+    processes = processes or os.cpu_count() or 1
+
+    def run(task):
+        project, revision, commitId, output = task
+        result = runJob(project, commitId, output, limits)
+        result["revision"] = revision
+        return result
+
+    # Threads only wait on the Blender processes doing the work
+    with ThreadPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(run, getTasks(jobs, outputPath)))
+
+
+def getTasks(jobs, outputPath):
+    """Returns (project, revision, commit id, output) of each job"""
+
+    tasks = []
+    for project, revision, commitId in jobs:
+        name = os.path.basename(os.path.normpath(project))
+        output = os.path.join(outputPath, f"{name}-{commitId[:7]}.blend")
+        tasks.append((project, revision, commitId, output))
+    return tasks
+
+
+def runPartitioned(jobs, outputPath, processes=None):
+    """
+    Regenerates (project, revision, commit id) jobs, replaying the
+    partitions of every project in one pool of processes and merging
+    them here
+    """
+
+    processes = processes or os.cpu_count() or 1
+
+    with tempfile.TemporaryDirectory() as directory, \
+         ThreadPoolExecutor(max_workers=processes) as executor:
+        pending = []
+        for index, task in enumerate(getTasks(jobs, outputPath)):
+            project, revision, commitId, output = task
+            try:
+                groups = getPartitionGroups(project, commitId, processes)
+            except Exception as error:
+                pending.append((task, f"{type(error).__name__}: {error}",
+                                None, None, []))
+                continue
+
+            if groups is None:
+                future = executor.submit(runJob, project, commitId, output)
+                pending.append((task, "", None, None, [future]))
+                continue
+
+            paths = [os.path.join(directory, f"{index}-{number}.blend")
+                     for number in range(len(groups))]
+            futures = [executor.submit(runJob, project, commitId, path, 
+                                       ["--objects", *names])
+                       for path, names in zip(paths, groups)]
+            pending.append((task, "", paths, groups, futures))
+
+        return [mergeJob(*job) for job in pending]
+
+
+def mergeJob(task, error, paths, groups, futures):
+    """Waits for the processes of one job, returns its result"""
+
+    project, revision, commitId, output = task
+    results = [future.result() for future in futures]
+    if groups is None:
+        if results:
+            return dict(results[0], revision=revision)
+        return {"project": project, "revision": revision, "output": output,
+                "time": 0.0, "error": error}
+
+    # Time of the job as if its partitions ran side by side
+    elapsed = max(result["time"] for result in results)
+    error = next((f"Partition failed: {result['error']}" 
+                  for result in results if result["error"]), "")
+    if not error:
+        start = time.perf_counter()
+        try:
+            mergePartitions(project, commitId, output, paths, groups)
+        except Exception as exception:
+            error = f"{type(exception).__name__}: {exception}"
+        elapsed += time.perf_counter() - start
+        print(f"Merged {len(groups)} partitions")
+
+    return {"project": project, "revision": revision, "output": output,
+            "time": elapsed, "error": error}
+
+
+def printResults(results, elapsed):
+    """Prints per job timings and failures"""
+
+    failed = 0
+    for result in results:
+        status = "FAILED" if result["error"] else "OK"
+        print(f"{status:6} {result['time']:8.2f}s  "
+              f"{result['project']}@{result['revision']}")
+        if result["error"]:
+            failed += 1
+            print(f"       {result['error']}")
+        else:
+            print(f"       -> {result['output']}")
+
+    print(f"{len(results) - failed}/{len(results)} regenerated "
+          f"in {elapsed:.2f}s")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="blender -b --python batchRegen.py --",
+        description="Regenerate Blendit projects in headless Blender.")
+    parser.add_argument("jobs", nargs="*", metavar="PROJECT[@COMMIT]")
+    parser.add_argument("--jobs", "-j", dest="processes", type=int,
+                        help="Number of parallel Blender processes")
+    parser.add_argument("--output", "-o", default=os.getcwd(),
+                        help="Directory to write .blend files to")
+    parser.add_argument("--stop-command", type=int, dest="stopIndex",
+                        help="Only replay commands before this index")
+    parser.add_argument("--stop-offset", type=int, dest="stopOffset",
+                        help="Only replay commands before this byte offset")
+    parser.add_argument("--objects", nargs="+", metavar="NAME",
+                        help="Only replay commands these objects depend on")
+    parser.add_argument("--partitions", action="store_true",
+                        help="Replay independent objects in parallel")
+    parser.add_argument("--thumbnail", help=argparse.SUPPRESS)
+    parser.add_argument("--worker", nargs=3, help=argparse.SUPPRESS,
+                        metavar=("PROJECT", "COMMIT", "OUTPUT"))
+    args = parser.parse_args(getScriptArgs())
+
+    # Worker process, regenerate a single job
+    if args.worker:
+        project, revision, output = args.worker
+        start = time.perf_counter()
+        regenCommit(project, revision, output, args.stopIndex, 
+                    args.stopOffset, args.objects)
+
+        # Back-filling a commit thumbnail, fails if nothing is visible
+        if (args.thumbnail and 
+                not importBlendit().thumbnails.renderHeadless(args.thumbnail)):
+            print("Nothing to render a thumbnail of")
+            return 1
+        print(f"Regenerated in {time.perf_counter() - start:.2f}s")
+        return 0
+
+    if not args.jobs:
+        parser.error("no projects given")
+
+    limits = []
+    if args.stopIndex is not None:
+        limits += ["--stop-command", str(args.stopIndex)]
+    if args.stopOffset is not None:
+        limits += ["--stop-offset", str(args.stopOffset)]
+    if args.objects:
+        limits += ["--objects", *args.objects]
+    if args.partitions and limits:
+        parser.error("--partitions replays whole logs, it cannot be "
+                     "combined with --stop-command, --stop-offset or --objects")
+
+    try:
+        jobs = resolveJobs([parseJob(spec) for spec in args.jobs])
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    if args.partitions:
+        results = runPartitioned(jobs, os.path.abspath(args.output), 
+                                 args.processes)
+    else:
+        results = runBatch(jobs, os.path.abspath(args.output), 
+                           args.processes, limits)
+    return 1 if printResults(results, time.perf_counter() - start) else 0
+
+
+if __name__ == "__main__":
+    try:
+        code = main()
+    except Exception:
+        traceback.print_exc()
+        code = 1
+    sys.exit(code)
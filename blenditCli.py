@@ -0,0 +1,213 @@
+"""
+    Blender-free command line tools for Blendit projects
+
+    Usage:
+        python blenditCli.py log PROJECT [-n N] [--author A] [--grep TEXT]
+        python blenditCli.py blame PROJECT [--command N]
+        python blenditCli.py stats PROJECT
+        python blenditCli.py compact PROJECT
+        python blenditCli.py verify PROJECT
+        python blenditCli.py prune PROJECT
+
+    Only depends on pygit2 and the command log format, pygit2 is imported
+    by the commands that need it.
+"""
+
+import os
+import sys
+import time
+import argparse
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import commandLog
+
+
+def openRepo(project):
+    """Returns pygit2 Repository of project"""
+
+    import pygit2 as git
+    return git.Repository(project)
+
+
+def getProjectName(project):
+    """Returns name of project at path"""
+
+    return os.path.basename(os.path.normpath(project))
+
+
+def log(args):
+    """Prints commit history"""
+
+    import gitHelpers
+
+    repo = openRepo(args.project)
+    commits = gitHelpers.iterCommits(repo, limit=args.n, author=args.author,
+                                     message=args.grep)
+    for commit in commits:
+        print(f"{commit.hex[:7]}  {commit.getDateStr()}  {commit.name}  "
+              f"{commit.getMessage()}")
+
+
+def blame(args):
+    """Prints the commit that added each command"""
+
+    import gitHelpers
+
+    repo = openRepo(args.project)
+    lines = gitHelpers.blame(repo)
+    if args.command is not None:
+        lines = lines[args.command:args.command + 1]
+    if lines:
+        print(gitHelpers.getBlameStr(lines))
+
+
+def stats(args):
+    """Prints command log statistics"""
+
+    read = commandLog.fileReader(args.project)
+    bodies = commandLog.readLogBodies(read, getProjectName(args.project))
+
+    operators = Counter()
+    commands = assignments = size = 0
+    for _, body in bodies:
+        size += len(body.encode())
+        for command in commandLog.iterCommands(body):
+            commands += 1
+            operator = commandLog.getOperatorName(command)
+            if operator:
+                operators[operator] += 1
+            elif commandLog.parseAssignment(command):
+                assignments += 1
+
+    pending = sum(1 for _ in commandLog.iterCommands(bodies[-1][1]))
+    print(f"Segments:     {len(bodies) - 1}")
+    print(f"Size:         {size} bytes")
+    print(f"Commands:     {commands} ({pending} uncommitted)")
+    print(f"Operators:    {sum(operators.values())}")
+    print(f"Assignments:  {assignments}")
+    print(f"Other:        {commands - sum(operators.values()) - assignments}")
+    for operator, count in operators.most_common(args.top):
+        print(f"  {count:8}  {operator}")
+
+
+def compact(args):
+    """Coalesces the whole log into a single segment and commits it"""
+
+    import gitHelpers
+
+    repo = openRepo(args.project)
+    filename = gitHelpers.getProjectName(repo)
+    segment, removed, before, after = commandLog.compactLog(
+        repo.workdir, filename, gitHelpers.getUsedSegmentNames(repo))
+
+    # Only managed files are staged on commit
+    for path in removed:
+        repo.index.remove(path)
+    repo.index.add(segment)
+
+    gitHelpers.commit(repo, f"Compacted command log: {before} -> {after} "
+                            "commands")
+    print(f"Compacted {before} commands into {after}, "
+          f"removed {len(removed)} segments.")
+
+
+def verify(args):
+    """Checks syntax and compile time of the generated executeCommands"""
+
+    filename = getProjectName(args.project)
+    path = os.path.join(os.path.abspath(args.project), f"{filename}.py")
+
+    start = time.perf_counter()
+    source = commandLog.buildSource(commandLog.fileReader(args.project),
+                                    filename)
+    built = time.perf_counter()
+
+    try:
+        compile(source, path, "exec")
+    except SyntaxError as e:
+        print(f"Syntax error: line {e.lineno}: {e.msg}")
+        if e.text:
+            print(f"  {e.text.strip()}")
+        return 1
+    compiled = time.perf_counter()
+
+    print(f"OK: {source.count(chr(10))} lines, "
+          f"built in {built - start:.3f}s, "
+          f"compiled in {compiled - built:.3f}s")
+    return 0
+
+
+def prune(args):
+    """Removes caches and unreferenced asset store objects"""
+
+    import shutil
+    import assetStore
+    import gitHelpers
+
+    repo = openRepo(args.project)
+
+    # Python bytecode of the project log
+    cachePath = os.path.join(repo.workdir, "__pycache__")
+    if os.path.isdir(cachePath):
+        shutil.rmtree(cachePath)
+        print("Removed __pycache__")
+
+    # Asset contents referenced by any commit
+    keep = set()
+    seen = set()
+    for commit in gitHelpers.iterReachableCommits(repo):
+        read = gitHelpers.treeReader(repo, commit)
+        try:
+            manifestId = commit.tree[assetStore.MANIFEST].id
+        except KeyError:
+            continue
+        if manifestId in seen:
+            continue
+        seen.add(manifestId)
+        keep.update(digest for digest, _ in
+                    assetStore.readManifest(read(assetStore.MANIFEST)).values())
+
+    storePath = gitHelpers.getBlenditPath(repo)
+    removed, freed = assetStore.prune(storePath, keep)
+    print(f"Removed {removed} asset objects, "
+          f"freed {gitHelpers.getSizeStr(freed)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="blenditCli",
+        description="Inspect and maintain Blendit projects without Blender.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    logParser = subparsers.add_parser("log", help=log.__doc__)
+    logParser.add_argument("-n", type=int, help="Number of commits to show")
+    logParser.add_argument("--author", help="Only commits by this author")
+    logParser.add_argument("--grep", help="Only commits with this message")
+    logParser.set_defaults(function=log)
+
+    blameParser = subparsers.add_parser("blame", help=blame.__doc__)
+    blameParser.add_argument("--command", type=int, 
+                             help="Only show the command with this index")
+    blameParser.set_defaults(function=blame)
+
+    statsParser = subparsers.add_parser("stats", help=stats.__doc__)
+    statsParser.add_argument("--top", type=int, default=10,
+                             help="Number of operators to list")
+    statsParser.set_defaults(function=stats)
+
+    for function in (compact, verify, prune):
+        subparser = subparsers.add_parser(function.__name__,
+                                          help=function.__doc__)
+        subparser.set_defaults(function=function)
+
+    for subparser in subparsers.choices.values():
+        subparser.add_argument("project", help="Path to Blendit project")
+
+    args = parser.parse_args()
+    return args.function(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,534 @@
+import os
+import re
+import ast
+import difflib
+
+# Matches `bpy.<path> = <value>` where <path> is made of attributes and
+# subscripts only, e.g. bpy.context.object.modifiers["Bevel"].width = 0.1
+ASSIGNMENT_PATTERN = re.compile(
+    r"^(bpy(?:\.\w+|\[(?:\"[^\"]*\"|'[^']*'|[^\]\"']*)\])+)\s=\s(.+)$")
+
+
+def parseAssignment(command):
+    """Returns (path, value) if command is a plain assignment, else None"""
+
+    match = ASSIGNMENT_PATTERN.match(command)
+    if not match:
+        return None
+    return match.group(1), match.group(2)
+
+
+def isValueLiteral(value):
+    """Returns True if value is a literal, not a datablock pointer"""
+
+    try:
+        return ast.literal_eval(value) is not None
+    except (ValueError, SyntaxError):
+        return False
+
+
+def overwrites(path, previousPath, value):
+    """
+    Returns True if assigning value to path overwrites previousPath entirely
+    Only values replace their items, assigning a pointer leaves the
+    properties of the datablock it pointed to as they were.
+    """
+
+    if path == previousPath:
+        return True
+    return (previousPath.startswith((f"{path}[", f"{path}."))
+            and isValueLiteral(value))
+
+
+def coalesceCommands(commands):
+    """
+    Last-write-wins coalescing of consecutive property assignments
+    Dragging a slider reports every intermediate value, only the last
+    assignment to a path is kept unless the new value reads the old one.
+    """
+
+    coalesced = []
+    previousPath = None
+    for command in commands:
+        assignment = parseAssignment(command)
+        if not assignment:
+            coalesced.append(command)
+            previousPath = None
+            continue
+
+        path, value = assignment
+        if (previousPath is not None and overwrites(path, previousPath, value)
+                and previousPath not in value and path not in value):
+            # Intermediate value is never read, drop it
+            coalesced[-1] = command
+        else:
+            coalesced.append(command)
+
+        previousPath = path
+
+    return coalesced
+
+
+def interleaveCommands(reports, captured):
+    """
+    Returns report lines with commands captured outside of reports put in
+    the order they were made
+    captured: list of (operator reports before them, commands)
+    """
+
+    captured = sorted(captured, key=lambda item: item[0])
+    lines = []
+    operators = 0
+    index = 0
+    for report in reports:
+        if report.startswith("bpy.ops."):
+            while index < len(captured) and captured[index][0] <= operators:
+                lines.extend(captured[index][1])
+                index += 1
+            operators += 1
+        lines.append(report)
+
+    for _, commands in captured[index:]:
+        lines.extend(commands)
+    return lines
+
+
+"""
+    Project log layout
+
+    <name>.py               Header followed by commands not yet committed
+    segments/manifest       Segment file names in replay order
+    segments/000000.seg     Commands sealed by a commit, never modified
+
+    Each commit seals the pending commands of <name>.py into a new segment
+    and resets <name>.py to the header, so a commit only adds a blob as
+    big as its own changes.
+"""
+LOG_HEADER = "import bpy\n\ndef executeCommands():\n\tpass\n"
+SEGMENTS_DIR = "segments"
+MANIFEST = f"{SEGMENTS_DIR}/manifest"
+SEGMENT_EXT = ".seg"
+
+# Versioned files written next to the log and referenced by commands
+SIDECAR_PATTERN = re.compile(r"""["'](meshes/[^"']+)["']""")
+
+
+def fileReader(path):
+    """Returns a reader of files relative to path, None if missing"""
+
+    def read(relpath, binary=False):
+        try:
+            with open(os.path.join(path, relpath), "rb" if binary else "r") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    return read
+
+
+def splitLog(text):
+    """Splits log text into header and body of pending commands"""
+
+    end = text.find("\tpass\n")
+    if end == -1:
+        return text, ""
+    end += len("\tpass\n")
+    return text[:end], text[end:]
+
+
+def readManifest(read):
+    """Returns list of segment paths in replay order"""
+
+    manifest = read(MANIFEST)
+    if manifest is None:
+        return []
+    return [f"{SEGMENTS_DIR}/{name}" for name in manifest.split()]
+
+
+def readLogBodies(read, filename):
+    """Returns list of (path, body) in replay order, segments then pending"""
+
+    text = read(f"{filename}.py")
+    if text is None:
+        raise FileNotFoundError(f"{filename}.py")
+
+    bodies = [(path, read(path) or "") for path in readManifest(read)]
+    bodies.append((f"{filename}.py", splitLog(text)[1]))
+    return bodies
+
+
+def buildSource(read, filename, batch=False, commandFilter=None):
+    """
+    Returns full executeCommands module source of a project
+    batch: replay runs of object assignments with blendit helpers and
+    sync the view layer only where commands need evaluated data
+    commandFilter: function returning the list of commands to keep
+    """
+
+    text = read(f"{filename}.py")
+    if text is None:
+        raise FileNotFoundError(f"{filename}.py")
+
+    header = splitLog(text)[0]
+    bodies = [body for _, body in readLogBodies(read, filename)]
+    if batch or commandFilter:
+        commands = [command for body in bodies 
+                    for command in iterCommands(body)]
+        if commandFilter:
+            commands = commandFilter(commands)
+        if batch:
+            commands = insertSyncPoints(batchAssignments(commands))
+        bodies = [f"\t{command}\n" for command in commands]
+    return header + "".join(bodies)
+
+
+def getNextSegmentName(segments, used=()):
+    """
+    Returns name of a new segment numbered after every segment in the
+    manifest and every name in used, e.g. names of committed segments a
+    revert or compaction dropped, so a name never holds other content
+    """
+
+    numbers = [int(name) for name in 
+               (segment.rsplit("/", 1)[-1][:-len(SEGMENT_EXT)] 
+                for segment in (*segments, *used)) if name.isdigit()]
+    return f"{max(numbers, default=-1) + 1:06d}{SEGMENT_EXT}"
+
+
+def appendCommands(path, filename, commands):
+    """Appends commands to the pending commands of <name>.py"""
+
+    if not commands:
+        return
+
+    with open(os.path.join(path, f"{filename}.py"), "a") as file:
+        file.write("".join(f"\t{command}\n" for command in commands))
+
+
+def sealSegment(path, filename, used=()):
+    """
+    Moves pending commands of <name>.py into a new segment
+    Returns path of the new segment relative to project, None if nothing
+    was pending.
+    used: segment names already committed, not to be reused
+    """
+
+    logPath = os.path.join(path, f"{filename}.py")
+    with open(logPath, "r") as file:
+        header, body = splitLog(file.read())
+
+    read = fileReader(path)
+    segments = readManifest(read)
+
+    os.makedirs(os.path.join(path, SEGMENTS_DIR), exist_ok=True)
+    if not body:
+        # Ensure new projects start with an (empty) manifest
+        if read(MANIFEST) is None:
+            with open(os.path.join(path, MANIFEST), "w") as file:
+                file.write("")
+        return None
+
+    # Write segment before the manifest references it
+    name = getNextSegmentName(segments, used)
+    with open(os.path.join(path, SEGMENTS_DIR, name), "w") as file:
+        file.write(body)
+
+    with open(os.path.join(path, MANIFEST), "a") as file:
+        file.write(f"{name}\n")
+
+    # Reset pending commands
+    with open(logPath, "w") as file:
+        file.write(header)
+
+    return f"{SEGMENTS_DIR}/{name}"
+
+
+def iterCommands(body):
+    """Yields commands of a log body, without indentation"""
+
+    for line in body.splitlines():
+        command = line.strip()
+        if command:
+            yield command
+
+
+def getReferencedFiles(body):
+    """Returns sidecar file paths referenced by commands in body"""
+
+    return list(dict.fromkeys(SIDECAR_PATTERN.findall(body)))
+
+
+def diffCommands(old, new):
+    """Returns list of (sign, command), "-" removed and "+" added"""
+
+    lines = []
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "delete"):
+            lines.extend(("-", command) for command in old[i1:i2])
+        if tag in ("replace", "insert"):
+            lines.extend(("+", command) for command in new[j1:j2])
+    return lines
+
+
+def getOperatorName(command):
+    """Returns operator id like 'mesh.primitive_cube_add', else None"""
+
+    if not command.startswith("bpy.ops."):
+        return None
+    return command[len("bpy.ops."):].split("(", 1)[0]
+
+
+def compactLog(path, filename, used=()):
+    """
+    Rewrites all segments and pending commands into a single coalesced
+    segment. Returns (segment path, removed segment paths, commands before,
+    commands after)
+    used: segment names already committed, not to be reused
+    """
+
+    read = fileReader(path)
+    bodies = readLogBodies(read, filename)
+    commands = [command for _, body in bodies for command in iterCommands(body)]
+    compacted = coalesceCommands(commands)
+
+    # Fresh name, so the segments replaced stay intact until the manifest
+    # points to the new one
+    segments = readManifest(read)
+    name = getNextSegmentName(segments, used)
+
+    os.makedirs(os.path.join(path, SEGMENTS_DIR), exist_ok=True)
+    with open(os.path.join(path, SEGMENTS_DIR, name), "w") as file:
+        for command in compacted:
+            file.write(f"\t{command}\n")
+
+    with open(os.path.join(path, MANIFEST), "w") as file:
+        file.write(f"{name}\n")
+
+    removed = segments
+    for segment in removed:
+        os.remove(os.path.join(path, segment))
+
+    # Reset pending commands
+    logPath = os.path.join(path, f"{filename}.py")
+    with open(logPath, "r") as file:
+        header = splitLog(file.read())[0]
+    with open(logPath, "w") as file:
+        file.write(header)
+
+    return f"{SEGMENTS_DIR}/{name}", removed, len(commands), len(compacted)
+
+
+# Commands entering and leaving mesh editing modes
+MODE_TOGGLES = ("bpy.ops.object.editmode_toggle(", 
+                "bpy.ops.sculpt.sculptmode_toggle(")
+MODE_ENTER = ("bpy.ops.object.mode_set(mode='EDIT'", 
+              "bpy.ops.object.mode_set(mode='SCULPT'")
+MODE_EXIT = ("bpy.ops.object.mode_set(mode='OBJECT'",)
+
+# Commands that only change the edited mesh, or nothing replayable
+MESH_EDIT_PREFIXES = ("bpy.ops.mesh.", "bpy.ops.transform.", "bpy.ops.sculpt.",
+                      "bpy.ops.view3d.select", "bpy.ops.wm.tool_set_by_id(",
+                      "bpy.context.scene.tool_settings.")
+# Mesh commands changing data a snapshot does not hold
+MESH_EDIT_EXCLUDED = ("bpy.ops.mesh.separate(", "bpy.ops.mesh.customdata_",
+                      "bpy.ops.mesh.normals_", "bpy.ops.mesh.set_normals_",
+                      "bpy.ops.mesh.smooth_normals(",
+                      "bpy.ops.mesh.mark_freestyle_",
+                      "bpy.ops.transform.edge_crease(",
+                      "bpy.ops.transform.edge_bevelweight(",
+                      "bpy.ops.transform.vert_crease(")
+
+
+def getModeRuns(commands):
+    """Returns (start, end) indices of complete edit or sculpt mode runs"""
+
+    runs = []
+    start = None
+    for index, command in enumerate(commands):
+        if command.startswith(MODE_TOGGLES):
+            if start is None:
+                start = index
+            else:
+                runs.append((start, index))
+                start = None
+        elif command.startswith(MODE_ENTER):
+            if start is None:
+                start = index
+        elif command.startswith(MODE_EXIT) and start is not None:
+            runs.append((start, index))
+            start = None
+    return runs
+
+
+def isMeshEditRun(commands):
+    """Returns True if commands inside a mode run only edit the mesh"""
+
+    for command in commands:
+        if (not command.startswith(MESH_EDIT_PREFIXES) or 
+                command.startswith(MESH_EDIT_EXCLUDED)):
+            return False
+    return True
+
+
+def replaceModeRuns(commands, replacements):
+    """
+    Replaces the last complete mode runs with lines restoring their result
+    replacements: list of line lists, one per run, oldest first
+    Runs doing more than editing the mesh are kept and followed by the lines.
+    Replacements without a complete run in commands are dropped, their run
+    was split by an earlier flush and its logged commands are kept.
+    """
+
+    commands = list(commands)
+    runs = getModeRuns(commands)
+    replacements = list(replacements)
+
+    # Restoring mid-run would write the mesh in edit mode
+    matched = replacements[max(0, len(replacements) - len(runs)):]
+
+    # From the end so earlier indices stay valid
+    pairs = list(zip(runs[len(runs) - len(matched):], matched))
+    for (start, end), lines in reversed(pairs):
+        if isMeshEditRun(commands[start + 1:end]):
+            commands[start:end + 1] = lines
+        else:
+            commands[end + 1:end + 1] = lines
+
+    return commands
+
+
+"""
+    Batched object assignments
+
+    Runs of assignments to transform and visibility properties of
+    bpy.data.objects are replayed with one blendit.setObjectProperties call
+    per property, which writes every object at once with foreach_set.
+    Assignments within a run target distinct (object, property) pairs once
+    coalesced, so grouping them by property keeps the result.
+"""
+OBJECT_ASSIGNMENT_PATTERN = re.compile(
+    r"""^bpy\.data\.objects\[('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")\]"""
+    r"\.(\w+) = (.+)$")
+VECTOR_PROPERTIES = ("location", "rotation_euler", "scale")
+FLAG_PROPERTIES = ("hide_viewport", "hide_render", "hide_select")
+
+# Shorter runs are not worth a collection wide read and write
+MIN_BATCH = 8
+
+
+def parseObjectAssignment(command):
+    """Returns (name, property, value) of a batchable assignment, else None"""
+
+    match = OBJECT_ASSIGNMENT_PATTERN.match(command)
+    if not match:
+        return None
+
+    name, prop, value = match.groups()
+    if prop not in VECTOR_PROPERTIES and prop not in FLAG_PROPERTIES:
+        return None
+
+    try:
+        name = ast.literal_eval(name)
+        value = ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return None
+
+    if prop in FLAG_PROPERTIES:
+        return (name, prop, value) if isinstance(value, bool) else None
+    if (isinstance(value, (tuple, list)) and len(value) == 3 and
+            all(isinstance(item, (int, float)) and not isinstance(item, bool)
+                for item in value)):
+        return name, prop, tuple(float(item) for item in value)
+    return None
+
+
+def batchAssignments(commands):
+    """Replaces long runs of batchable object assignments with helper calls"""
+
+    batched = []
+    run = []
+
+    def flush():
+        if len(run) < MIN_BATCH:
+            batched.extend(command for command, _ in run)
+        else:
+            # Property -> {object name: value}, last assignment wins
+            groups = {}
+            for _, (name, prop, value) in run:
+                groups.setdefault(prop, {})[name] = value
+            batched.extend(f"blendit.setObjectProperties({prop!r}, {values!r})"
+                           for prop, values in groups.items())
+        run.clear()
+
+    for command in commands:
+        assignment = parseObjectAssignment(command)
+        if assignment:
+            run.append((command, assignment))
+            continue
+        flush()
+        batched.append(command)
+    flush()
+
+    return batched
+
+
+"""
+    Sync points
+
+    During bulk replay view layer updates after each operator are deferred,
+    blendit.sync() evaluates pending changes before commands that may read
+    evaluated data. Only operators known not to read it run without one,
+    and a sync follows raw property assignments before anything else runs.
+"""
+# Operators that only write original data
+DEFERRABLE_OPERATORS = ("bpy.ops.mesh.primitive_", "bpy.ops.curve.primitive_",
+                        "bpy.ops.surface.primitive_",
+                        "bpy.ops.object.camera_add(",
+                        "bpy.ops.object.light_add(",
+                        "bpy.ops.object.empty_add(",
+                        "bpy.ops.object.text_add(",
+                        "bpy.ops.object.armature_add(",
+                        "bpy.ops.object.speaker_add(",
+                        "bpy.ops.object.modifier_add(",
+                        "bpy.ops.object.modifier_remove(",
+                        "bpy.ops.object.modifier_move_",
+                        "bpy.ops.object.material_slot_add(",
+                        "bpy.ops.object.material_slot_remove(",
+                        "bpy.ops.material.new(",
+                        "bpy.ops.object.shade_smooth(",
+                        "bpy.ops.object.shade_flat(",
+                        "bpy.ops.object.select_all(",
+                        "bpy.ops.object.delete(")
+SYNC_ATTRIBUTES = ("matrix_world", "evaluated_get", "evaluated_depsgraph_get",
+                   ".dimensions", "bound_box", "ray_cast")
+SYNC_COMMAND = "blendit.sync()"
+
+
+def needsSync(command, previous=None):
+    """
+    Returns True if command may read evaluated data
+    previous: command run before it, syncing after raw assignments
+    """
+
+    if any(attribute in command for attribute in SYNC_ATTRIBUTES):
+        return True
+    if (previous is not None and parseAssignment(previous) is not None
+            and parseAssignment(command) is None):
+        return True
+    return (command.startswith("bpy.ops.") and 
+            not command.startswith(DEFERRABLE_OPERATORS))
+
+
+def insertSyncPoints(commands):
+    """Inserts sync commands before commands needing evaluated data"""
+
+    synced = []
+    previous = None
+    for command in commands:
+        if (needsSync(command, previous) and synced and 
+                synced[-1] != SYNC_COMMAND):
+            synced.append(SYNC_COMMAND)
+        synced.append(command)
+        previous = command
+    return synced
@@ -0,0 +1,282 @@
+import os
+import heapq
+import struct
+
+"""
+    Commit-graph sidecar, .git/blendit/commit-graph
+
+    Append-only file of commits in topological order (parents first)
+        magic       b"BCG1"
+        record      20 byte oid, uint32 generation, uint8 parent count,
+                    uint32 position of each parent
+
+    Commits are also grouped into chains, runs of single-parent commits
+    where each one is the only child recorded for its parent. Ancestry
+    between commits of a mostly linear history then only hops once per
+    branch point instead of walking every commit.
+"""
+MAGIC = b"BCG1"
+RECORD = struct.Struct(">20sIB")
+PARENT = struct.Struct(">I")
+FILENAME = "commit-graph"
+
+
+def toRaw(oid):
+    """Returns 20 byte raw id of a pygit2 Oid, hex string or raw bytes"""
+
+    if isinstance(oid, bytes):
+        return oid
+    if isinstance(oid, str):
+        return bytes.fromhex(oid)
+    return oid.raw
+
+
+class CommitGraph:
+    """Commit-graph with generation numbers and parent indexes"""
+
+    def __init__(self, path):
+        self.path = os.path.join(path, FILENAME)
+        self.oids = []
+        self.positions = {}
+        self.generations = []
+        self.parents = []
+
+        # Chains of single-parent commits
+        self.chains = []
+        self.chainBases = []
+        self.chainCommits = []
+
+        self.load()
+
+    def load(self):
+        """Reads records from disk, ignoring a truncated last record"""
+
+        try:
+            with open(self.path, "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return
+
+        if not data.startswith(MAGIC):
+            return
+
+        offset = len(MAGIC)
+        size = len(data)
+        while offset + RECORD.size <= size:
+            oid, generation, count = RECORD.unpack_from(data, offset)
+            end = offset + RECORD.size + PARENT.size * count
+            if end > size:
+                break
+            parents = tuple(PARENT.unpack_from(data, offset + RECORD.size +
+                                               PARENT.size * i)[0]
+                            for i in range(count))
+            self.append(oid, generation, parents)
+            offset = end
+
+        # Drop a partially written record
+        if offset != size:
+            with open(self.path, "r+b") as file:
+                file.truncate(offset)
+
+    def append(self, oid, generation, parents):
+        """Adds a record in memory and assigns it to a chain"""
+
+        position = len(self.oids)
+        self.oids.append(oid)
+        self.positions[oid] = position
+        self.generations.append(generation)
+        self.parents.append(parents)
+
+        # Continue the parent's chain if the parent is its tip
+        if len(parents) == 1:
+            parent = parents[0]
+            chain = self.chains[parent]
+            if self.chainCommits[chain][-1] == parent:
+                self.chains.append(chain)
+                self.chainCommits[chain].append(position)
+                return
+
+        # New chain, based on the single parent if any
+        self.chains.append(len(self.chainCommits))
+        self.chainBases.append(parents if parents else ())
+        self.chainCommits.append([position])
+
+    def __contains__(self, oid):
+        return toRaw(oid) in self.positions
+
+    def __len__(self):
+        return len(self.oids)
+
+    def update(self, repo, tip):
+        """Adds tip and all its missing ancestors, returns number added"""
+
+        tip = toRaw(tip)
+        if tip in self.positions:
+            return 0
+
+        # Depth-first, parents are written before their children
+        records = []
+        stack = [(tip, False)]
+        pending = set()
+        while stack:
+            oid, visited = stack.pop()
+            if oid in self.positions:
+                continue
+
+            commit = repo[oid.hex()]
+            parentIds = [parent.raw for parent in commit.parent_ids]
+            if not visited:
+                if oid in pending:
+                    continue
+                pending.add(oid)
+                stack.append((oid, True))
+                stack.extend((parent, False) for parent in parentIds
+                             if parent not in self.positions)
+                continue
+
+            parents = tuple(self.positions[parent] for parent in parentIds)
+            generation = 1 + max((self.generations[parent]
+                                  for parent in parents), default=0)
+            self.append(oid, generation, parents)
+            records.append(RECORD.pack(oid, generation, len(parents)) +
+                           b"".join(PARENT.pack(parent) for parent in parents))
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "ab") as file:
+            if file.tell() == 0:
+                file.write(MAGIC)
+            file.write(b"".join(records))
+
+        return len(records)
+
+    def getGeneration(self, oid):
+        """Returns generation number of commit, roots are 1"""
+
+        return self.generations[self.positions[toRaw(oid)]]
+
+    def isAncestor(self, ancestor, descendant):
+        """Returns True if ancestor is reachable from descendant"""
+
+        a = self.positions[toRaw(ancestor)]
+        b = self.positions[toRaw(descendant)]
+        generation = self.generations[a]
+
+        while True:
+            if self.generations[b] < generation:
+                return False
+
+            # Generations increase by one along a chain
+            chain = self.chains[b]
+            if chain == self.chains[a]:
+                return generation <= self.generations[b]
+
+            bases = self.chainBases[chain]
+            if not bases:
+                return False
+            if len(bases) > 1:
+                return self.walkIsAncestor(a, b)
+            b = bases[0]
+
+    def walkIsAncestor(self, a, b):
+        """Graph walk fallback for histories with merges"""
+
+        generation = self.generations[a]
+        stack = [b]
+        seen = {b}
+        while stack:
+            position = stack.pop()
+            if position == a:
+                return True
+            for parent in self.parents[position]:
+                if parent not in seen and self.generations[parent] >= generation:
+                    seen.add(parent)
+                    stack.append(parent)
+        return False
+
+    def mergeBase(self, first, second):
+        """Returns raw oid of best common ancestor, None if unrelated"""
+
+        a = self.positions[toRaw(first)]
+        b = self.positions[toRaw(second)]
+        if a == b:
+            return self.oids[a]
+
+        # Chains reachable from a, with the highest position reached in each
+        reached = {}
+        position = a
+        while True:
+            chain = self.chains[position]
+            reached[chain] = position
+            bases = self.chainBases[chain]
+            if len(bases) != 1:
+                break
+            position = bases[0]
+        if len(self.chainBases[self.chains[position]]) > 1:
+            return self.walkMergeBase(a, b)
+
+        position = b
+        while True:
+            chain = self.chains[position]
+            if chain in reached:
+                other = reached[chain]
+                best = other if self.generations[other] <= \
+                    self.generations[position] else position
+                return self.oids[best]
+            bases = self.chainBases[chain]
+            if not bases:
+                return None
+            if len(bases) > 1:
+                return self.walkMergeBase(a, b)
+            position = bases[0]
+
+    def walkMergeBase(self, a, b):
+        """Generation ordered paint walk, fallback for merges"""
+
+        FIRST, SECOND = 1, 2
+        colors = {a: FIRST, b: SECOND}
+        queue = [(-self.generations[a], a), (-self.generations[b], b)]
+        while queue:
+            _, position = heapq.heappop(queue)
+            color = colors[position]
+            if color == FIRST | SECOND:
+                return self.oids[position]
+            for parent in self.parents[position]:
+                parentColor = colors.get(parent, 0)
+                if parentColor | color != parentColor:
+                    colors[parent] = parentColor | color
+                    heapq.heappush(queue, (-self.generations[parent], parent))
+        return None
+
+
+# Loaded graphs, keyed by path
+graphs = {}
+
+
+def load(path):
+    """Returns cached CommitGraph stored in path, reloaded if changed"""
+
+    filePath = os.path.join(path, FILENAME)
+    try:
+        size = os.path.getsize(filePath)
+    except OSError:
+        size = 0
+
+    cached = graphs.get(path)
+    if cached and cached[1] == size:
+        return cached[0]
+
+    graph = CommitGraph(path)
+    graphs[path] = (graph, size)
+    return graph
+
+
+def update(repo, path, tip):
+    """Adds tip and its missing ancestors to the graph stored in path"""
+
+    graph = load(path)
+    graph.update(repo, tip)
+
+    filePath = os.path.join(path, FILENAME)
+    graphs[path] = (graph, os.path.getsize(filePath)
+                    if os.path.exists(filePath) else 0)
+    return graph
@@ -1,17 +1,19 @@
 import sys
 import importlib
-from datetime import datetime
+from datetime import datetime, timezone
 
 import bpy
 from bpy.types import Panel, PropertyGroup, UIList
-from bpy.props import (CollectionProperty, EnumProperty, IntProperty,
-                       PointerProperty, StringProperty)
+from bpy.props import (BoolProperty, CollectionProperty, EnumProperty, 
+                       IntProperty, PointerProperty, StringProperty)
 
 import pygit2 as git
 from pygit2._pygit2 import GitError
 
 # Local imports implemented to support Blender refreshes
-modulesNames = ("gitHelpers", "openProject", "sourceControl")
+modulesNames = ("gitHelpers", "openProject", "sourceControl", "maintenance",
+                "depsgraphCapture", "meshSnapshots", "thumbnails", "autoCommit",
+                "subscriptions")
 for module in modulesNames:
     if module in sys.modules:
         importlib.reload(sys.modules[module])
@@ -22,15 +24,29 @@ for module in modulesNames:
 
 BRANCH_ICON = 'IPO_BEZIER'
 NEW_BRANCH_ICON = 'ADD'
+BLAME_ICON = 'TEXT'
+SEARCH_ICON = 'VIEWZOOM'
+DIFF_ICON = 'ARROW_LEFTRIGHT'
+DIFF_BASE_ICON = 'PINNED'
+SLICE_ICON = 'OUTLINER_OB_GROUP_INSTANCE'
+ADDED_ICON = 'ADD'
+REMOVED_ICON = 'REMOVE'
 CLEAR_ICON = 'X'
 COMMENT_ICON = 'LAYER_USED'
 
+# Size of the selected commit's thumbnail, in icon sizes
+THUMBNAIL_SCALE = 6
+
+# Lines of the last diff drawn in the panel, the rest is in the Text Editor
+DIFF_PREVIEW_LINES = 20
+
 
 class BlenditCommitsListItem(PropertyGroup):
     id: StringProperty(description="Unique ID of commit")
     name: StringProperty(description="Name of commiter")
     email: StringProperty(description="Email of commiter")
-    date: StringProperty(description="Date of commit")
+    time: IntProperty(description="Time of commit, seconds since epoch")
+    offset: IntProperty(description="Timezone offset of commit in minutes")
     message: StringProperty(description="Commit message")
 
 
@@ -77,6 +93,7 @@ class BlenditPanelData(PropertyGroup):
         # Checkout branch
         ref = repo.lookup_reference(branch.name)
         repo.checkout(ref)
+        gitHelpers.restoreAssets(repo)
 
         # Regen file
         openProject.regenFile(filepath, filename)
@@ -102,6 +119,116 @@ class BlenditPanelData(PropertyGroup):
         description="A short description of the changes made"
     )
 
+    def setCaptureMode(self, context):
+        depsgraphCapture.setEnabled(self.captureMode == 'DEPSGRAPH')
+
+    captureMode: EnumProperty(
+        name="Capture",
+        description="How changes are captured",
+        items=[
+            ('REPORTS', "Reports", "Capture operators and property edits "
+                                   "from the Info reports"),
+            ('DEPSGRAPH', "Depsgraph", "Also capture property changes of "
+                                       "datablocks updated by the depsgraph"),
+        ],
+        default='REPORTS',
+        update=setCaptureMode
+    )
+
+    def setWatchedProperties(self, context):
+        invalid = subscriptions.setWatched(self.watchedProperties)
+        if invalid:
+            print(f"Blendit cannot watch: {', '.join(invalid)}")
+
+        # Apply to message bus subscriptions
+        subscriptions.unsubscribe()
+        subscriptions.subscribe()
+
+    watchedProperties: StringProperty(
+        name="Watched",
+        default=subscriptions.DEFAULT_WATCHED,
+        description="Properties captured when changed without a report, "
+                    "as Type.property names of Object, Modifier, Material, "
+                    "Scene or RenderSettings separated by spaces",
+        update=setWatchedProperties
+    )
+
+    def setMeshSnapshots(self, context):
+        meshSnapshots.setEnabled(self.meshSnapshots)
+
+    meshSnapshots: BoolProperty(
+        name="Mesh snapshots",
+        default=False,
+        description="Store the mesh when leaving edit or sculpt mode and "
+                    "log a single restore instead of every edit",
+        update=setMeshSnapshots
+    )
+
+    def setThumbnailBackfill(self, context):
+        thumbnails.setEnabled(self.thumbnailBackfill)
+
+    thumbnailBackfill: BoolProperty(
+        name="Render missing thumbnails",
+        default=False,
+        description="Regenerate recent commits without a thumbnail in a "
+                    "headless Blender and render one",
+        update=setThumbnailBackfill
+    )
+
+    def setAutoCommit(self, context):
+        autoCommit.setEnabled(self.autoCommit)
+
+    autoCommit: BoolProperty(
+        name="Auto-commit",
+        default=False,
+        description="Commit captured commands when idle or when many are "
+                    "waiting",
+        update=setAutoCommit
+    )
+
+    autoCommitIdle: IntProperty(
+        name="Idle",
+        default=300,
+        min=10,
+        subtype='TIME_ABSOLUTE',
+        description="Seconds without changes before auto-committing"
+    )
+
+    autoCommitCommands: IntProperty(
+        name="Commands",
+        default=200,
+        min=1,
+        description="Number of commands already flushed to <name>.py, "
+                    "e.g. by saving, that triggers an auto-commit once "
+                    "edits settle. Commands not yet flushed are not counted"
+    )
+
+    saveBlend: BoolProperty(
+        name="Save .blend",
+        default=False,
+        description="Also save the .blend file when committing, "
+                    "instead of only writing commands to the log"
+    )
+
+    stageAll: BoolProperty(
+        name="Stage all files",
+        default=False,
+        description="Commit every file in the project folder, "
+                    "not only the files managed by Blendit"
+    )
+
+    searchQuery: StringProperty(
+        name="",
+        options={'TEXTEDIT_UPDATE'},
+        description="Only list commits whose message, author or operators "
+                    "contain these words"
+    )
+
+    diffBase: StringProperty(
+        name="Diff Base",
+        description="ID of commit other commits are compared with"
+    )
+
     commitsList: CollectionProperty(type=BlenditCommitsListItem)
 
     commitsListIndex: IntProperty(default=0)
@@ -121,19 +248,52 @@ class BlenditPanel(BlenditPanelMixin, Panel):
         pass
 
 
+# (project path, query) -> matching commit ids, cleared on new commits
+searchResults = {}
+
+
+def getSearchResults(query):
+    """Returns set of ids of commits matching query"""
+
+    filepath = bpy.path.abspath("//")
+    key = (filepath, query)
+    if key not in searchResults:
+        try:
+            repo = git.Repository(filepath)
+        except GitError:
+            return set()
+        searchResults[key] = gitHelpers.searchCommits(repo, query)
+    return searchResults[key]
+
+
 class BlenditCommitsList(UIList):
     """List of Commits in project."""
 
+    def filter_items(self, context, data, propname):
+        items = getattr(data, propname)
+        query = context.window_manager.blendit.searchQuery.strip()
+        if not query:
+            return [], []
+
+        matches = getSearchResults(query)
+        flags = [self.bitflag_filter_item if item.id in matches else 0
+                 for item in items]
+        return flags, []
+
     def draw_item(self, context, layout, data, item, icon, active_data,
                   active_propname, index):
         
         split = layout.split(factor=0.825)
         
         col1 = split.column()
-        col1.label(text=item.message, icon=COMMENT_ICON)
+        icon = thumbnails.getIcon(item.id)
+        if icon:
+            col1.label(text=item.message, icon_value=icon)
+        else:
+            col1.label(text=item.message, icon=COMMENT_ICON)
 
         # Get last mofied string
-        commitTime = datetime.strptime(item.date, gitHelpers.GIT_TIME_FORMAT)
+        commitTime = datetime.fromtimestamp(item.time, timezone.utc)
         lastModified = gitHelpers.getLastModifiedStr(commitTime)
 
         col2 = split.column()
@@ -187,6 +347,10 @@ class BlenditSubPanel1(BlenditPanelMixin, Panel):
         layout = self.layout
         blendit = context.window_manager.blendit
 
+        # Search commits
+        row = layout.row()
+        row.prop(blendit, "searchQuery", icon=SEARCH_ICON)
+
         # List of Commits
         row = layout.row()
         row.template_list(
@@ -201,6 +365,13 @@ class BlenditSubPanel1(BlenditPanelMixin, Panel):
             sort_lock=True,
         )
 
+        # Thumbnail of selected commit
+        if blendit.commitsList:
+            icon = thumbnails.getIcon(
+                blendit.commitsList[blendit.commitsListIndex].id)
+            if icon:
+                layout.template_icon(icon_value=icon, scale=THUMBNAIL_SCALE)
+
         if blendit.commitsList and blendit.commitsListIndex != 0:
             try:
                 repo = git.Repository(filepath)
@@ -219,35 +390,94 @@ class BlenditSubPanel1(BlenditPanelMixin, Panel):
             switch = row.operator(sourceControl.BlenditRevertToCommit.bl_idname, 
                                   text="Revert to Commit")
             switch.id = blendit.commitsList[blendit.commitsListIndex]["id"]
+
+        if blendit.commitsList:
+            drawDiff(layout, blendit)
+
+            row = layout.row()
+            replay = row.operator(sourceControl.BlenditReplaySlice.bl_idname, 
+                                  icon=SLICE_ICON)
+            replay.id = blendit.commitsList[blendit.commitsListIndex].id
         
         # Add commits to list
         bpy.app.timers.register(addCommitsToList)
 
 
+def drawDiff(layout, blendit):
+    """Draws diff base selection and the last diff of selected commit"""
+
+    selected = blendit.commitsList[blendit.commitsListIndex].id
+
+    row = layout.row()
+    base = row.operator(sourceControl.BlenditSetDiffBase.bl_idname, 
+                        text="Set as Diff Base", icon=DIFF_BASE_ICON)
+    base.id = selected
+
+    if not blendit.diffBase or blendit.diffBase == selected:
+        return
+
+    diff = row.operator(sourceControl.BlenditDiffCommits.bl_idname, 
+                        text=f"Diff {blendit.diffBase[:7]}..{selected[:7]}",
+                        icon=DIFF_ICON)
+    diff.old = blendit.diffBase
+    diff.new = selected
+
+    lastDiff = sourceControl.lastDiff
+    if not lastDiff or lastDiff[:2] != (blendit.diffBase, selected):
+        return
+
+    _, _, lines, rewritten = lastDiff
+    box = layout.box()
+    if rewritten:
+        box.label(text="Log was rewritten, compared command by command.", 
+                  icon='INFO')
+    if not lines:
+        box.label(text="No changes.")
+    for sign, command in lines[:DIFF_PREVIEW_LINES]:
+        box.label(text=command, 
+                  icon=ADDED_ICON if sign == "+" else REMOVED_ICON)
+    if len(lines) > DIFF_PREVIEW_LINES:
+        box.label(text=f"{len(lines) - DIFF_PREVIEW_LINES} more lines in "
+                       "the Text Editor.")
+
+
+# (project path, head commit) the list was last filled from
+listedHead = None
+
+
 def addCommitsToList():
     """Add commits to list"""
 
+    global listedHead
+
     # Get list
     commitsList = bpy.context.window_manager.blendit.commitsList
-    
-    # Clear list
-    commitsList.clear()
 
     # Get commits
     filepath = bpy.path.abspath("//")
     try:
         repo = git.Repository(filepath)
+        head = (filepath, repo.head.target)
     except GitError:
         return
 
-    commits = gitHelpers.getCommits(repo)
-    for commit in commits:
+    # List is up to date
+    if head == listedHead and commitsList:
+        return
+    listedHead = head
+    searchResults.clear()
+    
+    # Clear list
+    commitsList.clear()
+
+    for commit in gitHelpers.iterCommits(repo):
         item = commitsList.add()
-        item.id = commit["id"]
-        item.name = commit["name"]
-        item.email = commit["email"]
-        item.date = commit["date"]
-        item.message = commit["message"]
+        item.id = commit.hex
+        item.name = commit.name
+        item.email = commit.email
+        item.time = commit.time
+        item.offset = commit.offset
+        item.message = commit.getMessage()
 
 
 class BlenditSubPanel2(BlenditPanelMixin, Panel):
@@ -277,6 +507,35 @@ class BlenditSubPanel2(BlenditPanelMixin, Panel):
         commit = row.operator(sourceControl.BlenditCommit.bl_idname, 
                                text="Commit Changes")
         commit.message = message
+        commit.stageAll = context.window_manager.blendit.stageAll
+
+        row = layout.row()
+        row.prop(context.window_manager.blendit, "saveBlend")
+        row.prop(context.window_manager.blendit, "stageAll")
+
+        row = layout.row()
+        row.prop(context.window_manager.blendit, "captureMode", expand=True)
+        row = layout.row()
+        row.prop(context.window_manager.blendit, "watchedProperties")
+        row = layout.row()
+        row.prop(context.window_manager.blendit, "meshSnapshots")
+        row.prop(context.window_manager.blendit, "thumbnailBackfill")
+
+        row = layout.row(align=True)
+        row.prop(context.window_manager.blendit, "autoCommit")
+        sub = row.row(align=True)
+        sub.active = context.window_manager.blendit.autoCommit
+        sub.prop(context.window_manager.blendit, "autoCommitIdle")
+        sub.prop(context.window_manager.blendit, "autoCommitCommands")
+        if context.window_manager.blendit.autoCommit:
+            filename = bpy.path.basename(bpy.data.filepath).split(".")[0]
+            layout.label(text=f"Commands counts only those flushed to "
+                              f"{filename}.py", icon='INFO')
+
+        row = layout.row()
+        row.operator(maintenance.BlenditMaintenance.bl_idname, 
+                     icon=maintenance.MAINTENANCE_ICON)
+        row.operator(sourceControl.BlenditBlame.bl_idname, icon=BLAME_ICON)
 
 
 """ORDER MATTERS"""
@@ -0,0 +1,259 @@
+import sys
+import importlib
+
+import bpy
+from bpy.app import handlers
+from bpy.app.handlers import persistent
+
+# Local imports implemented to support Blender refreshes
+modulesNames = ("reports", "subscriptions")
+for module in modulesNames:
+    if module in sys.modules:
+        importlib.reload(sys.modules[module])
+    else:
+        parent = ".".join(__name__.split(".")[:-1])
+        globals()[module] = importlib.import_module(f"{parent}.{module}")
+
+
+"""
+    Depsgraph driven capture
+
+    Only IDs the depsgraph reports as updated are looked at. Their watched
+    properties are diffed against a per ID snapshot and changed values are
+    kept last-write-wins until the next operator is registered. Operators
+    are still captured from reports, since creating datablocks is not a
+    property change.
+
+    Changes are handed to reports with the number of operators run before
+    them, so they are logged between the operator reports in the order
+    they were made. Changes made by an operator, in the update it is
+    registered in or while it ran modal, like moving an object, are left
+    to its report. IDs are keyed by session_uid, which is kept when they
+    are renamed.
+"""
+# ID type -> (bpy.data collection, watched properties)
+WATCHED = {
+    bpy.types.Object: ("objects", ("location", "rotation_euler", "scale",
+                                   "hide_viewport", "hide_render", "parent",
+                                   "active_material")),
+    bpy.types.Material: ("materials", ("diffuse_color", "metallic",
+                                       "roughness", "blend_method")),
+    bpy.types.Scene: ("scenes", ("frame_start", "frame_end", "camera",
+                                 "world")),
+    bpy.types.World: ("worlds", ("color",)),
+    bpy.types.Light: ("lights", ("color", "energy")),
+    bpy.types.Camera: ("cameras", ("lens", "clip_start", "clip_end")),
+}
+
+# Transform only updates need not diff the other properties
+TRANSFORM_PROPERTIES = ("location", "rotation_euler", "scale")
+
+# session_uid -> {property: value}
+snapshots = {}
+
+# session_uid -> bpy.data collection of the ID
+collections = {}
+
+# (session_uid, property) -> value, in order of last change, made outside
+# and while a modal operator runs
+pending = {}
+modalPending = {}
+
+# (operators run before, assignments) of changes already closed
+captured = []
+
+# Operators registered since the last flush and pointer of the last one
+operatorCount = 0
+lastOperator = 0
+
+enabled = False
+
+
+def getWatched(id):
+    """Returns (collection, properties) watched for an ID, else None"""
+
+    for idType, watched in WATCHED.items():
+        if isinstance(id, idType):
+            return watched
+    return None
+
+
+def getValues(id, properties):
+    return {name: subscriptions.formatValue(getattr(id, name))
+            for name in properties if hasattr(id, name)}
+
+
+def takeSnapshots():
+    """Snapshots every watched ID, done once when capture starts"""
+
+    global operatorCount, lastOperator
+
+    clearPending()
+    operatorCount = 0
+    lastOperator = reports.getLastOperator()
+    for collection, properties in WATCHED.values():
+        for id in getattr(bpy.data, collection):
+            snapshots[id.session_uid] = getValues(id, properties)
+            collections[id.session_uid] = collection
+
+
+def clearPending():
+    snapshots.clear()
+    collections.clear()
+    pending.clear()
+    modalPending.clear()
+    captured.clear()
+
+
+def isModalRunning():
+    """
+    Returns True if a modal operator runs, None if Blender cannot tell,
+    modal_operators is only available since 4.2
+    """
+
+    running = False
+    for window in bpy.context.window_manager.windows:
+        operators = getattr(window, "modal_operators", None)
+        if operators is None:
+            return None
+        running = running or len(operators) > 0
+    return running
+
+
+def closePending(changes, position):
+    """Turns changes into assignments logged after position operators"""
+
+    # IDs by session_uid, the name may have changed since
+    ids = {}
+    for collection in {collections[uid] for uid, _ in changes}:
+        ids.update((id.session_uid, id) 
+                   for id in getattr(bpy.data, collection))
+
+    commands = []
+    for (uid, prop), value in changes.items():
+        id = ids.get(uid)
+        if id is None:
+            continue
+        commands.append(f"bpy.data.{collections[uid]}[{id.name!r}]"
+                        f".{prop} = {value}")
+    changes.clear()
+
+    if commands:
+        captured.append((position, commands))
+
+
+def checkOperators():
+    """
+    Closes changes made before operators registered since last check and
+    drops those made while they ran modal. Returns number of operators
+    """
+
+    global operatorCount, lastOperator
+
+    count = reports.countOperatorsSince(lastOperator)
+    if not count:
+        return 0
+
+    closePending(pending, operatorCount)
+    modalPending.clear()
+    operatorCount += count
+    lastOperator = reports.getLastOperator()
+    return count
+
+
+@persistent
+def depsgraphUpdateHandler(scene, depsgraph):
+    """Diffs watched properties of IDs updated in this evaluation"""
+
+    # Changes of this update were made by the operators just registered
+    registered = checkOperators()
+
+    # Without modal_operators changes are assumed to be made by operators
+    changes, other = pending, modalPending
+    if isModalRunning() is not False:
+        changes, other = modalPending, pending
+
+    for update in depsgraph.updates:
+        id = update.id.original
+        watched = getWatched(id)
+        if not watched:
+            continue
+
+        collection, properties = watched
+        uid = id.session_uid
+        previous = snapshots.get(uid)
+
+        # Only the transform changed
+        if (previous is not None and update.is_updated_transform and
+                not update.is_updated_geometry and
+                not update.is_updated_shading and
+                isinstance(id, bpy.types.Object)):
+            properties = TRANSFORM_PROPERTIES
+
+        values = getValues(id, properties)
+        if previous is None:
+            # New ID, created by an operator captured from reports
+            snapshots[uid] = values
+            collections[uid] = collection
+            continue
+
+        for name, value in values.items():
+            if not registered and previous.get(name) != value:
+                # A later value replaces one kept on either side, e.g.
+                # the original value after a cancelled modal operator
+                other.pop((uid, name), None)
+                changes.pop((uid, name), None)
+                changes[(uid, name)] = value
+        previous.update(values)
+
+
+def popCommands():
+    """
+    Returns (operators run before, assignments) of changes made since the
+    last flush, for IDs that still exist
+    """
+
+    global operatorCount
+
+    checkOperators()
+    closePending(pending, operatorCount)
+
+    # Changes of a running modal operator wait for it to be registered
+    if not isModalRunning():
+        closePending(modalPending, operatorCount)
+    operatorCount = 0
+
+    commands = list(captured)
+    captured.clear()
+    return commands
+
+
+def reset():
+    """Discards pending changes and snapshots current state"""
+
+    if enabled:
+        takeSnapshots()
+
+
+def setEnabled(value):
+    """Starts or stops depsgraph capture"""
+
+    global enabled
+    if value == enabled:
+        return
+    enabled = value
+
+    if enabled:
+        takeSnapshots()
+        handlers.depsgraph_update_post.append(depsgraphUpdateHandler)
+        reports.commandSources.append(popCommands)
+    else:
+        if depsgraphUpdateHandler in handlers.depsgraph_update_post:
+            handlers.depsgraph_update_post.remove(depsgraphUpdateHandler)
+        if popCommands in reports.commandSources:
+            reports.commandSources.remove(popCommands)
+        clearPending()
+
+
+def unregister():
+    setEnabled(False)
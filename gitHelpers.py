@@ -1,13 +1,39 @@
 import os
+import sys
+import time
+import zlib
+import struct
+import importlib
 from datetime import datetime, timezone, timedelta
 from unicodedata import name
 
 import pygit2 as git
 from pygit2._pygit2 import GitError
 
+# Local imports implemented to support Blender refreshes and blenditCli
+modulesNames = ("assetStore", "commandLog", "commitGraph", "logIndex", 
+                "searchIndex")
+for module in modulesNames:
+    if module in sys.modules:
+        globals()[module] = importlib.reload(sys.modules[module])
+    else:
+        parent = ".".join(__name__.split(".")[:-1])
+        name = f"{parent}.{module}" if parent else module
+        globals()[module] = importlib.import_module(name)
+
 # Format: Fri Sep  2 19:36:07 2022 +0530
 GIT_TIME_FORMAT = "%c %z"
 
+# Unreachable loose objects younger than this are kept (same as git gc)
+PRUNE_EXPIRE = 2 * 7 * 24 * 60 * 60
+
+# Header names of object types, for writing loose objects
+OBJECT_TYPE_NAMES = {git.GIT_OBJECT_COMMIT: b"commit", 
+                     git.GIT_OBJECT_TREE: b"tree",
+                     git.GIT_OBJECT_BLOB: b"blob", 
+                     git.GIT_OBJECT_TAG: b"tag"}
+HEX_DIGITS = frozenset("0123456789abcdef")
+
 
 def getLastModifiedStr(date):
     """
@@ -58,28 +84,148 @@ def getLastModifiedStr(date):
     return output
 
 
-def commit(repo, message):
-    """Add all and commit changes to current branch"""
+def getProjectName(repo):
+    """Returns name of Blendit project, same as its directory name"""
+
+    return os.path.basename(os.path.normpath(repo.workdir))
+
+
+def getBlenditPath(repo):
+    """Returns path of untracked Blendit data inside the .git directory"""
+
+    path = os.path.join(repo.path, "blendit")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def restoreAssets(repo):
+    """Restores assets/ to match the checked out assets.manifest"""
+
+    path = repo.workdir
+    manifestPath = os.path.join(path, assetStore.MANIFEST)
+    if not os.path.exists(manifestPath):
+        return
+
+    with open(manifestPath, "r") as file:
+        assetStore.restore(path, getBlenditPath(repo), file.read())
+
+
+def treeReader(repo, commit):
+    """
+    Returns a reader of files in the tree of commit, None if missing
+    Files in assets/ are read from the asset store, as of the manifest.
+    """
+
+    tree = commit.tree
+    assets = None
+
+    def read(relpath, binary=False):
+        nonlocal assets
+        if relpath.startswith(f"{assetStore.ASSETS_DIR}/"):
+            if assets is None:
+                assets = assetStore.readManifest(read(assetStore.MANIFEST))
+            if relpath not in assets:
+                return None
+            _, objectsPath = assetStore.getStorePaths(getBlenditPath(repo))
+            path = assetStore.getObjectPath(objectsPath, assets[relpath][0])
+            if not os.path.exists(path):
+                return None
+            with open(path, "rb") as file:
+                data = file.read()
+        else:
+            try:
+                entry = tree[relpath]
+            except KeyError:
+                return None
+            data = repo[entry.id].data
+        return data if binary else data.decode()
+
+    return read
+
+
+def getManagedPaths(repo):
+    """Returns paths of files written by Blendit, relative to project"""
+
+    return [
+        f"{getProjectName(repo)}.py",
+        ".gitignore",
+        commandLog.MANIFEST,
+        assetStore.MANIFEST,
+    ]
 
-    # Add all
-    repo.index.add_all()
-    repo.index.write()
+
+def stagePaths(repo, paths):
+    """
+    Stages given paths, skipping unchanged ones
+    Status uses the index stat cache, so unchanged files are not rehashed.
+    """
+
+    index = repo.index
+    for path in paths:
+        try:
+            status = repo.status_file(path)
+        except KeyError:
+            # Neither in working tree nor index
+            continue
+
+        if status & git.GIT_STATUS_WT_DELETED:
+            index.remove(path)
+        elif status & (git.GIT_STATUS_WT_NEW | git.GIT_STATUS_WT_MODIFIED |
+                       git.GIT_STATUS_WT_TYPECHANGE):
+            index.add(path)
+
+    index.write()
+
+
+def commit(repo, message, stageAll=False):
+    """
+    Commit changes to current branch
+    stageAll: add all files instead of only Blendit managed ones
+    """
+
+    # Move pending commands into their own segment
+    segment = commandLog.sealSegment(repo.workdir, getProjectName(repo), 
+                                     getUsedSegmentNames(repo))
+
+    # Store changed assets and record their manifest
+    if os.path.isdir(os.path.join(repo.workdir, assetStore.ASSETS_DIR)):
+        assetStore.snapshot(repo.workdir, getBlenditPath(repo))
+
+    if stageAll:
+        # Add all
+        repo.index.add_all()
+        repo.index.write()
+    else:
+        paths = getManagedPaths(repo)
+        if segment:
+            # New segment and sidecar files its commands reference
+            paths.append(segment)
+            with open(os.path.join(repo.workdir, segment), "r") as file:
+                paths.extend(commandLog.getReferencedFiles(file.read()))
+        stagePaths(repo, paths)
+
+    tree = repo.index.write_tree()
+    return createCommit(repo, tree, message)
+
+
+def createCommit(repo, tree, message, parents=None):
+    """Commits tree to current branch, parents default to HEAD"""
 
     name = repo.config["User.name"]
     email = repo.config["User.email"]
     signature = git.Signature(name, email)
-    tree = repo.index.write_tree()
     
     try:
         # Assuming prior commits exist
         ref = repo.head.name
-        parents = [repo.head.target]
+        if parents is None:
+            parents = [repo.head.target]
     except GitError:
         # Initial Commit
         ref = "HEAD"
         parents = []
 
-    repo.create_commit(
+    oid = repo.create_commit(
         ref, 
         signature, 
         signature, 
@@ -88,27 +234,540 @@ def commit(repo, message):
         parents
     )
 
+    # Keep commit-graph and log index up to date
+    commitGraph.update(repo, getBlenditPath(repo), oid)
+    logIndex.update(repo, getBlenditPath(repo), oid)
+    updateSearchIndex(repo, oid)
+
+    return oid
+
+
+def revert(repo, target, message):
+    """
+    Commits the tree of target on top of HEAD, only writing working files
+    that differ. Uncommitted commands are discarded.
+
+        A <-- B <-- C <-- D            <-- master <-- HEAD
+
+        Revert to A
+
+        A <-- B <-- C <-- D <-- A'     <-- master <-- HEAD
+    """
+
+    head = repo[repo.head.target]
+    workdir = repo.workdir
+
+    # Write files changed between HEAD and target, and stage them
+    for delta in head.tree.diff_to_tree(target.tree).deltas:
+        if delta.status == git.GIT_DELTA_DELETED:
+            path = os.path.join(workdir, delta.old_file.path)
+            if os.path.exists(path):
+                os.remove(path)
+            repo.index.remove(delta.old_file.path)
+            continue
+
+        path = os.path.join(workdir, delta.new_file.path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(repo[delta.new_file.id].data)
+        repo.index.add(delta.new_file.path)
+
+    # Discard uncommitted commands
+    logName = f"{getProjectName(repo)}.py"
+    if repo.status_file(logName) != git.GIT_STATUS_CURRENT:
+        try:
+            data = repo[target.tree[logName].id].data
+        except KeyError:
+            data = None
+        if data is not None:
+            with open(os.path.join(workdir, logName), "wb") as file:
+                file.write(data)
+            repo.index.add(logName)
+
+    # Only changed entries were updated, the rest keep their stat cache
+    repo.index.write()
+
+    return createCommit(repo, target.tree_id, message, [head.id])
+
+
+def getCommitGraph(repo, *tips):
+    """Returns commit-graph of repo containing HEAD and given commits"""
+
+    graph = commitGraph.load(getBlenditPath(repo))
+    try:
+        tips += (repo.head.target,)
+    except GitError:
+        pass
+
+    for tip in tips:
+        if tip not in graph:
+            graph = commitGraph.update(repo, getBlenditPath(repo), tip)
+    return graph
+
+
+def isAncestor(repo, ancestor, descendant):
+    """Returns True if commit ancestor is reachable from descendant"""
+
+    graph = getCommitGraph(repo, ancestor, descendant)
+    return graph.isAncestor(ancestor, descendant)
+
+
+def mergeBase(repo, first, second):
+    """Returns Oid of best common ancestor of two commits, None if unrelated"""
+
+    graph = getCommitGraph(repo, first, second)
+    base = graph.mergeBase(first, second)
+    return git.Oid(raw=base) if base else None
+
+
+def getLogIndex(repo, *tips):
+    """Returns log index of repo containing HEAD and given commits"""
+
+    index = logIndex.load(getBlenditPath(repo))
+    try:
+        tips += (repo.head.target,)
+    except GitError:
+        pass
+
+    for tip in tips:
+        if tip not in index:
+            index = logIndex.update(repo, getBlenditPath(repo), tip)
+    return index
+
+
+def getUsedSegmentNames(repo):
+    """Returns names of segments committed in the history of HEAD"""
+
+    return {name for name, _ in getLogIndex(repo).entries}
+
+
+def blame(repo, commit=None):
+    """
+    Returns list of (CommitRecord, command) for the log of commit
+    Defaults to HEAD followed by uncommitted commands, credited to None.
+    """
+
+    working = commit is None
+    if working:
+        try:
+            commit = repo[repo.head.target]
+        except GitError:
+            commit = None
+
+    lines = []
+    if commit is not None:
+        index = getLogIndex(repo, commit.id)
+        result = index.blame(repo, commit.id, 
+                             getCommitGraph(repo, commit.id))
+
+        records = {}
+        read = treeReader(repo, commit)
+        commands = (command for _, body in 
+                    commandLog.readLogBodies(read, getProjectName(repo))[:-1]
+                    for command in commandLog.iterCommands(body))
+        for i, command in enumerate(commands):
+            credited = result.getCommit(i)
+            if credited not in records:
+                records[credited] = CommitRecord(repo[credited])
+            lines.append((records[credited], command))
+
+    if working:
+        with open(os.path.join(repo.workdir, 
+                               f"{getProjectName(repo)}.py"), "r") as file:
+            body = commandLog.splitLog(file.read())[1]
+        lines.extend((None, command) for command in 
+                     commandLog.iterCommands(body))
+
+    return lines
+
+
+def diffCommits(repo, old, new):
+    """
+    Returns (list of (sign, command), rewritten) from commit old to new
+    Segments are compared by blob id and only those after the common prefix
+    are read. A real diff is only run if both sides have segments the other
+    lacks, i.e. the log was rewritten, e.g. by compaction.
+    """
+
+    oldIds = logIndex.getSegmentIds(repo, repo[str(old)])
+    newIds = logIndex.getSegmentIds(repo, repo[str(new)])
+
+    common = 0
+    while (common < min(len(oldIds), len(newIds)) and 
+           oldIds[common] == newIds[common]):
+        common += 1
+
+    def getCommands(ids):
+        return [command for id in ids for command in 
+                commandLog.iterCommands(repo[id].data.decode())]
+
+    removed = getCommands(oldIds[common:])
+    added = getCommands(newIds[common:])
+    if not removed or not added:
+        return ([("-", command) for command in removed] + 
+                [("+", command) for command in added]), False
+
+    return commandLog.diffCommands(removed, added), True
+
+
+def getSearchText(repo, commit, index):
+    """Returns message, author and appended operator names of commit"""
+
+    operators = set()
+    for _, blob, _, _, _, _ in index.records.get(str(commit.id), []):
+        for command in commandLog.iterCommands(repo[blob].data.decode()):
+            operator = commandLog.getOperatorName(command)
+            if operator:
+                operators.add(operator)
+
+    author = commit.author
+    return " ".join([commit.message, author.name, author.email, *operators])
+
+
+def updateSearchIndex(repo, tip):
+    """Indexes tip and its ancestors missing from the search index"""
+
+    path = getBlenditPath(repo)
+    index = searchIndex.load(path)
+    if tip in index:
+        return index
+
+    # Log index provides the segments each commit appended
+    logs = getLogIndex(repo, tip)
+
+    entries = []
+    stack = [repo[str(tip)]]
+    seen = set()
+    while stack:
+        commit = stack.pop()
+        if commit.id in seen or commit.id in index:
+            continue
+        seen.add(commit.id)
+        entries.append((str(commit.id), getSearchText(repo, commit, logs)))
+        stack.extend(commit.parents)
+
+    return searchIndex.update(path, entries)
+
+
+def searchCommits(repo, query):
+    """Returns set of hex ids of commits matching every word of query"""
+
+    try:
+        index = updateSearchIndex(repo, repo.head.target)
+    except GitError:
+        return set()
+    return index.search(query)
+
+
+def getBlameStr(lines):
+    """Returns blame lines as text, one command per line"""
+
+    output = []
+    for record, command in lines:
+        if record is None:
+            credit = f"{'0000000':7}  {'Uncommitted':16}  {'':10}"
+        else:
+            date = record.getDatetime().strftime("%Y-%m-%d")
+            credit = f"{record.hex[:7]}  {record.name[:16]:16}  {date}"
+        output.append(f"{credit}  {command}")
+    return "\n".join(output)
+
+
+class CommitRecord:
+    """Compact commit record, strings are formatted only for display"""
+
+    __slots__ = ("oid", "name", "email", "time", "offset", "message")
+
+    def __init__(self, commit):
+        author = commit.author
+        self.oid = commit.id.raw
+        self.name = author.name
+        self.email = author.email
+        self.time = author.time
+        self.offset = author.offset
+        self.message = commit.message
+
+    @property
+    def hex(self):
+        return self.oid.hex()
+
+    def getDatetime(self):
+        """Returns offset-aware datetime.datetime of commit"""
+
+        timezoneInfo = timezone(timedelta(minutes=self.offset))
+        return datetime.fromtimestamp(float(self.time), timezoneInfo)
+
+    def getDateStr(self):
+        """Returns date in git format"""
+
+        return self.getDatetime().strftime(GIT_TIME_FORMAT)
+
+    def getMessage(self):
+        """Returns commit message without surrounding whitespace"""
+
+        return self.message.strip(" \t\n\r")
+
+
+def iterCommits(repo, limit=None, author=None, message=None, since=None,
+                until=None):
+    """
+    Lazily yields CommitRecords of current branch, newest first
+    limit: maximum number of records
+    author: case-insensitive substring of author name or email
+    message: case-insensitive substring of commit message
+    since, until: inclusive bounds of author time, seconds since epoch
+    """
+
+    try:
+        head = repo.head.target
+    except GitError:
+        return
+
+    author = author.lower() if author else None
+    message = message.lower() if message else None
+
+    count = 0
+    for commit in repo.walk(head, git.GIT_SORT_TIME):
+        if limit is not None and count >= limit:
+            return
+
+        signature = commit.author
+        if since is not None and signature.time < since:
+            continue
+        if until is not None and signature.time > until:
+            continue
+        if author and (author not in signature.name.lower() and
+                       author not in signature.email.lower()):
+            continue
+        if message and message not in commit.message.lower():
+            continue
+
+        count += 1
+        yield CommitRecord(commit)
+
+
+def getSizeStr(size):
+    """Returns human readable string of size in bytes"""
+
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            break
+        size /= 1024
+
+    return f"{size:.1f} {unit}" if unit != "B" else f"{size} {unit}"
+
+
+def getPackObjectCount(idxPath):
+    """Returns number of objects in a version 2 pack index file"""
+
+    with open(idxPath, "rb") as file:
+        header = file.read(8 + 256 * 4)
+
+    # Magic number and version, followed by 256 entry fan-out table
+    if len(header) < 8 + 256 * 4 or header[:4] != b"\377tOc":
+        return 0
+
+    # Last fan-out entry is the total number of objects
+    return struct.unpack(">I", header[-4:])[0]
+
+
+def isHex(name):
+    return bool(name) and set(name) <= HEX_DIGITS
+
+
+def getPackObjects(idxPath):
+    """Returns ids of objects in a version 2 pack index file"""
+
+    count = getPackObjectCount(idxPath)
+    with open(idxPath, "rb") as file:
+        # Sorted object ids follow the fan-out table
+        file.seek(8 + 256 * 4)
+        data = file.read(count * 20)
+    return [git.Oid(raw=data[i:i + 20]) for i in range(0, len(data), 20)]
+
+
+def getLooseObjects(objectsPath):
+    """Returns {path: id} of loose objects, skipping temporary files"""
+
+    objects = {}
+    for entry in os.scandir(objectsPath):
+        if len(entry.name) != 2 or not isHex(entry.name) or not entry.is_dir():
+            continue
+        for obj in os.scandir(entry.path):
+            if len(obj.name) == 38 and isHex(obj.name):
+                objects[obj.path] = git.Oid(hex=entry.name + obj.name)
+    return objects
+
+
+def getObjectStats(repo):
+    """Returns counts and on disk sizes of loose and packed objects"""
+
+    objectsPath = os.path.join(repo.path, "objects")
+    stats = {"loose": 0, "looseSize": 0, "packs": 0, "packed": 0, 
+             "packSize": 0}
+
+    for path in getLooseObjects(objectsPath):
+        stats["loose"] += 1
+        stats["looseSize"] += os.path.getsize(path)
+
+    packPath = os.path.join(objectsPath, "pack")
+    if os.path.isdir(packPath):
+        for entry in os.scandir(packPath):
+            if entry.name.endswith(".idx"):
+                stats["packs"] += 1
+                stats["packed"] += getPackObjectCount(entry.path)
+            if entry.name.endswith((".idx", ".pack")):
+                stats["packSize"] += entry.stat().st_size
+
+    stats["size"] = stats["looseSize"] + stats["packSize"]
+    return stats
+
+
+def iterReachableCommits(repo):
+    """Yields commits reachable from any reference or reflog entry"""
+
+    tips = []
+    for name in ["HEAD", *repo.references]:
+        reference = repo.references.get(name)
+        if reference is None:
+            continue
+        try:
+            tips.append(reference.peel(git.Commit).id)
+        except (GitError, ValueError):
+            pass
+
+        # Like git gc, keep what reflogs still point to
+        try:
+            entries = list(reference.log())
+        except GitError:
+            continue
+        for entry in entries:
+            for oid in (entry.oid_old, entry.oid_new):
+                if oid in repo:
+                    tips.append(oid)
+
+    if not tips:
+        return
+
+    walker = repo.walk(tips[0], git.GIT_SORT_NONE)
+    for tip in tips[1:]:
+        walker.push(tip)
+    yield from walker
+
+
+def getReachableObjects(repo):
+    """Returns set of ids of objects reachable from references and index"""
+
+    reachable = set()
+    trees = []
+
+    for commit in iterReachableCommits(repo):
+        reachable.add(commit.id)
+        trees.append(commit.tree_id)
+
+    # Trees and blobs, shared subtrees are only visited once
+    while trees:
+        treeId = trees.pop()
+        if treeId in reachable:
+            continue
+        reachable.add(treeId)
+        for entry in repo[treeId]:
+            if entry.type_str == "tree":
+                trees.append(entry.id)
+            elif entry.type_str == "blob":
+                reachable.add(entry.id)
+
+    # Staged but uncommitted blobs
+    for entry in repo.index:
+        reachable.add(entry.id)
+
+    return reachable
+
+
+def writeLooseObject(repo, oid, mtime):
+    """Writes object oid as a loose object last modified at mtime"""
+
+    objType, data = repo.odb.read(oid)
+    hexId = str(oid)
+    directory = os.path.join(repo.path, "objects", hexId[:2])
+    os.makedirs(directory, exist_ok=True)
+
+    path = os.path.join(directory, hexId[2:])
+    header = OBJECT_TYPE_NAMES[objType] + b" %d\0" % len(data)
+    with open(path, "wb") as file:
+        file.write(zlib.compress(header + data))
+    os.utime(path, (mtime, mtime))
+
+
+def repack(repo, pruneExpire=PRUNE_EXPIRE):
+    """
+    Packs reachable objects into a single delta-compressed pack and prunes
+    loose objects. Returns object stats before and after.
+    Unreachable objects of packs younger than pruneExpire are written out
+    as loose objects dated as their pack, so they expire like git gc's.
+    """
+
+    before = getObjectStats(repo)
+
+    objectsPath = os.path.join(repo.path, "objects")
+    packPath = os.path.join(objectsPath, "pack")
+    os.makedirs(packPath, exist_ok=True)
+    oldPacks = {name: os.stat(os.path.join(packPath, name)).st_mtime_ns
+                for name in os.listdir(packPath)}
+
+    # Write reachable objects to a new pack
+    reachable = getReachableObjects(repo)
+    if not reachable:
+        return before, before
+
+    builder = git.PackBuilder(repo)
+    for oid in reachable:
+        builder.add(oid)
+    builder.write(packPath)
+
+    # A pack with the same objects is rewritten under the same name
+    newPacks = {name.rsplit(".", 1)[0] for name in os.listdir(packPath)
+                if oldPacks.get(name) != 
+                os.stat(os.path.join(packPath, name)).st_mtime_ns}
+    oldPacks = {name for name in oldPacks 
+                if name.rsplit(".", 1)[0] not in newPacks}
 
-def getCommits(repo):
-    """Returns a list commit objects"""
+    # Old packs are superseded by the new one, unless marked with .keep
+    expire = time.time() - pruneExpire
+    if newPacks:
+        keep = {name.rsplit(".", 1)[0] for name in oldPacks 
+                if name.endswith(".keep")}
+        loose = set(getLooseObjects(objectsPath).values())
+        for name in oldPacks:
+            base = name.rsplit(".", 1)[0]
+            pack = os.path.join(packPath, f"{base}.pack")
+            if (not name.startswith("pack-") or not name.endswith(".idx") 
+                    or base in keep or not os.path.exists(pack)):
+                continue
+            mtime = os.path.getmtime(pack)
+            if mtime < expire:
+                continue
+            for oid in getPackObjects(os.path.join(packPath, name)):
+                if oid not in reachable and oid not in loose:
+                    writeLooseObject(repo, oid, mtime)
+                    loose.add(oid)
 
-    commits = []
-    last = repo[repo.head.target]
-    for commit in repo.walk(last.id, git.GIT_SORT_TIME):
-        timezoneInfo = timezone(timedelta(minutes=commit.author.offset))
-        datetimeString = datetime.fromtimestamp(float(commit.author.time), 
-                                    timezoneInfo).strftime(GIT_TIME_FORMAT)
+        for name in oldPacks:
+            if name.startswith("pack-") and name.rsplit(".", 1)[0] not in keep:
+                os.remove(os.path.join(packPath, name))
 
-        commitDict = {}
-        commitDict["id"] = commit.hex
-        commitDict["name"] = commit.author.name
-        commitDict["email"] = commit.author.email
-        commitDict["date"] = datetimeString
-        commitDict["message"] = commit.message.strip(" \t\n\r")
+    # Remove packed loose objects and expired unreachable ones
+    for path, oid in getLooseObjects(objectsPath).items():
+        if oid in reachable or os.path.getmtime(path) < expire:
+            os.remove(path)
+    for entry in os.scandir(objectsPath):
+        if (len(entry.name) == 2 and isHex(entry.name) and entry.is_dir() 
+                and not os.listdir(entry.path)):
+            os.rmdir(entry.path)
 
-        commits.append(commitDict)
+    after = getObjectStats(repo)
+    return before, after
 
-    return commits
 
 def makeGitIgnore(path):
     """Generates .gitignore file for Blendit project at given path"""
@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import importlib
+from bisect import bisect_right
+
+# Local imports implemented to support Blender refreshes and blenditCli
+modulesNames = ("commandLog",)
+for module in modulesNames:
+    if module in sys.modules:
+        globals()[module] = importlib.reload(sys.modules[module])
+    else:
+        parent = ".".join(__name__.split(".")[:-1])
+        name = f"{parent}.{module}" if parent else module
+        globals()[module] = importlib.import_module(name)
+
+
+"""
+    Log index sidecar, .git/blendit/log-index
+
+    One JSON line per commit, parents before children
+        {"commit": hex, "segments": [[name, blob, bytes, commands,
+                                      byte offset, command offset], ...]}
+
+    Lists the manifest entries a commit added compared with its parents,
+    with their size and the offset they start at in that commit's log.
+    Entries are keyed by segment name and blob, so a segment identical to
+    an older one under a new name is still credited to the commit adding
+    it, while reverts, which commit an older manifest, add no entries and
+    keep crediting the original commits.
+"""
+FILENAME = "log-index"
+
+
+def getSegments(repo, commit):
+    """Returns (name, blob hex) of segments of a commit in replay order"""
+
+    tree = commit.tree
+    try:
+        manifest = repo[tree[commandLog.MANIFEST].id].data.decode()
+    except KeyError:
+        return []
+
+    segments = []
+    for name in manifest.split():
+        try:
+            entry = tree[f"{commandLog.SEGMENTS_DIR}/{name}"]
+        except KeyError:
+            continue
+        segments.append((name, str(entry.id)))
+    return segments
+
+
+def getSegmentIds(repo, commit):
+    """Returns blob hex ids of segments of a commit in replay order"""
+
+    return [blob for _, blob in getSegments(repo, commit)]
+
+
+def countCommands(text):
+    return sum(1 for _ in commandLog.iterCommands(text))
+
+
+class Blame:
+    """Commits credited for command ranges of one log"""
+
+    def __init__(self, commits, commandStarts, byteStarts, commands, size):
+        self.commits = commits
+        self.commandStarts = commandStarts
+        self.byteStarts = byteStarts
+        self.commands = commands
+        self.size = size
+
+    def getCommit(self, index):
+        """Returns hex id of commit that added command index, None if after"""
+
+        if index < 0 or index >= self.commands:
+            return None
+        return self.commits[bisect_right(self.commandStarts, index) - 1]
+
+    def getCommitAtOffset(self, offset):
+        """Returns hex id of commit that added byte offset, None if after"""
+
+        if offset < 0 or offset >= self.size:
+            return None
+        return self.commits[bisect_right(self.byteStarts, offset) - 1]
+
+
+class LogIndex:
+    """Manifest entries added by each commit"""
+
+    def __init__(self, path):
+        self.path = os.path.join(path, FILENAME)
+
+        # Commit hex -> list of added manifest entries
+        self.records = {}
+
+        # (segment name, blob hex) -> commits that added it
+        self.entries = {}
+
+        # Blob hex -> (bytes, commands)
+        self.blobs = {}
+
+        # Commit hex -> Blame
+        self.blames = {}
+
+        self.load()
+
+    def load(self):
+        """Reads records from disk, ignoring a truncated last line"""
+
+        try:
+            with open(self.path, "r") as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return
+
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            # Written by an older version, credited by blob only
+            if any(len(segment) != 6 for segment in record["segments"]):
+                self.records.clear()
+                self.entries.clear()
+                self.blobs.clear()
+                os.remove(self.path)
+                return
+            self.add(record["commit"], record["segments"])
+
+    def add(self, commit, segments):
+        self.records[commit] = segments
+        for name, blob, size, commands, _, _ in segments:
+            self.entries.setdefault((name, blob), []).append(commit)
+            self.blobs[blob] = (size, commands)
+
+    def __contains__(self, commit):
+        return str(commit) in self.records
+
+    def getBlobSize(self, repo, blob):
+        """Returns (bytes, commands) of a segment blob"""
+
+        if blob not in self.blobs:
+            data = repo[blob].data.decode()
+            self.blobs[blob] = (len(data.encode()), countCommands(data))
+        return self.blobs[blob]
+
+    def update(self, repo, tip):
+        """Indexes tip and its missing ancestors, returns number added"""
+
+        tip = str(tip)
+        if tip in self.records:
+            return 0
+
+        # Depth-first, parents are indexed before their children
+        order = []
+        stack = [(tip, False)]
+        pending = set()
+        while stack:
+            oid, visited = stack.pop()
+            if oid in self.records:
+                continue
+            if visited:
+                order.append(oid)
+                continue
+            if oid in pending:
+                continue
+            pending.add(oid)
+            stack.append((oid, True))
+            stack.extend((str(parent), False)
+                         for parent in repo[oid].parent_ids
+                         if str(parent) not in self.records)
+
+        lines = []
+        for oid in order:
+            commit = repo[oid]
+            inherited = {entry for parent in commit.parents
+                         for entry in getSegments(repo, parent)}
+
+            segments = []
+            size = commands = 0
+            for name, blob in getSegments(repo, commit):
+                blobSize, blobCommands = self.getBlobSize(repo, blob)
+                if (name, blob) not in inherited:
+                    segments.append([name, blob, blobSize, blobCommands,
+                                     size, commands])
+                size += blobSize
+                commands += blobCommands
+
+            self.add(oid, segments)
+            lines.append(json.dumps({"commit": oid, "segments": segments}))
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a") as file:
+            file.write("".join(f"{line}\n" for line in lines))
+
+        return len(lines)
+
+    def getRanges(self, commit):
+        """
+        Returns ranges of commands a commit added to its log, list of
+        (byte offset, byte end, command offset, command end)
+        """
+
+        return [(byteStart, byteStart + size, commandStart,
+                 commandStart + commands)
+                for _, _, size, commands, byteStart, commandStart
+                in self.records[str(commit)]]
+
+    def getCredit(self, graph, commit, entry):
+        """Returns hex id of the commit that added entry to commit's log"""
+
+        commits = self.entries[entry]
+        if commit in commits:
+            return commit
+        if len(commits) == 1:
+            return commits[0]
+
+        # Added separately on several branches, take the one in history
+        for credited in commits:
+            if credited in graph and graph.isAncestor(credited, commit):
+                return credited
+        return commits[0]
+
+    def blame(self, repo, commit, graph):
+        """
+        Returns Blame of the log of an indexed commit, graph is a
+        CommitGraph containing commit
+        """
+
+        commit = str(commit)
+        if commit in self.blames:
+            return self.blames[commit]
+
+        commits = []
+        commandStarts = []
+        byteStarts = []
+        size = commands = 0
+        for entry in getSegments(repo, repo[commit]):
+            blobSize, blobCommands = self.getBlobSize(repo, entry[1])
+            if blobCommands:
+                commits.append(self.getCredit(graph, commit, entry))
+                commandStarts.append(commands)
+                byteStarts.append(size)
+            size += blobSize
+            commands += blobCommands
+
+        blame = Blame(commits, commandStarts, byteStarts, commands, size)
+        self.blames[commit] = blame
+        return blame
+
+
+# Loaded indexes, keyed by path
+indexes = {}
+
+
+def load(path):
+    """Returns cached LogIndex stored in path, reloaded if changed"""
+
+    filePath = os.path.join(path, FILENAME)
+    try:
+        size = os.path.getsize(filePath)
+    except OSError:
+        size = 0
+
+    cached = indexes.get(path)
+    if cached and cached[1] == size:
+        return cached[0]
+
+    index = LogIndex(path)
+    indexes[path] = (index, size)
+    return index
+
+
+def update(repo, path, tip):
+    """Indexes tip and its missing ancestors in the index stored in path"""
+
+    index = load(path)
+    index.update(repo, tip)
+
+    filePath = os.path.join(path, FILENAME)
+    indexes[path] = (index, os.path.getsize(filePath)
+                     if os.path.exists(filePath) else 0)
+    return index
@@ -0,0 +1,236 @@
+import os
+import re
+import ast
+import sys
+import mmap
+import importlib
+from functools import lru_cache
+
+# Local imports implemented to support Blender refreshes
+modulesNames = ("commandLog",)
+for module in modulesNames:
+    if module in sys.modules:
+        importlib.reload(sys.modules[module])
+    else:
+        parent = ".".join(__name__.split(".")[:-1])
+        name = f"{parent}.{module}" if parent else module
+        globals()[module] = importlib.import_module(name)
+
+
+"""
+    Streaming replay interpreter
+
+    Runs the command log one command at a time instead of compiling it into
+    a single executeCommands function. Segments and pending commands are
+    memory-mapped and scanned line by line, so only the current command is
+    decoded. Operator calls with literal arguments are dispatched through a
+    cached operator lookup, other commands are compiled once and cached.
+
+    Offsets count bytes of the log bodies, segments then pending commands,
+    as if concatenated. Indices count commands from 0.
+"""
+OPERATOR_PATTERN = re.compile(r"^bpy\.ops\.(\w+)\.(\w+)\((.*)\)$")
+PENDING_START = b"\tpass\n"
+
+# Compiled commands kept, repeated commands like selections hit the cache
+CODE_CACHE_SIZE = 4096
+
+
+def mapFile(path, start=0):
+    """Returns read-only mmap of file, None if missing or empty"""
+
+    try:
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size <= start:
+                return None
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+
+
+def mapLog(path, filename):
+    """Returns list of (buffer, start) of log bodies in the working tree"""
+
+    read = commandLog.fileReader(path)
+    buffers = [(mapFile(os.path.join(path, segment)), 0)
+               for segment in commandLog.readManifest(read)]
+
+    pending = mapFile(os.path.join(path, f"{filename}.py"))
+    if pending is None:
+        raise FileNotFoundError(f"{filename}.py")
+    start = pending.find(PENDING_START)
+    buffers.append((pending, start + len(PENDING_START) if start != -1
+                    else len(pending)))
+
+    return [(buffer, start) for buffer, start in buffers if buffer is not None]
+
+
+def getLogSize(path, filename):
+    """Returns total size in bytes of segments and <name>.py"""
+
+    read = commandLog.fileReader(path)
+    paths = commandLog.readManifest(read) + [f"{filename}.py"]
+    return sum(os.path.getsize(os.path.join(path, relpath))
+               for relpath in paths 
+               if os.path.exists(os.path.join(path, relpath)))
+
+
+def readLog(read, filename):
+    """Returns list of (buffer, start) of log bodies from a reader"""
+
+    return [(body.encode(), 0) for _, body in
+            commandLog.readLogBodies(read, filename)]
+
+
+@lru_cache(maxsize=CODE_CACHE_SIZE)
+def compileCommand(command):
+    return compile(command, "<blendit>", "exec")
+
+
+@lru_cache(maxsize=CODE_CACHE_SIZE)
+def parseOperatorCall(command):
+    """Returns (module, operator, args, kwargs) of a literal call, else None"""
+
+    match = OPERATOR_PATTERN.match(command)
+    if not match:
+        return None
+
+    try:
+        call = ast.parse(command, mode="eval").body
+        args = tuple(ast.literal_eval(arg) for arg in call.args)
+        kwargs = {keyword.arg: ast.literal_eval(keyword.value)
+                  for keyword in call.keywords}
+    except (ValueError, SyntaxError, TypeError, AttributeError):
+        return None
+
+    if any(key is None for key in kwargs):
+        return None
+    return match.group(1), match.group(2), args, kwargs
+
+
+class LogInterpreter:
+    """Resumable replay of a command log"""
+
+    def __init__(self, buffers, namespace, sync=False):
+        """
+        buffers: list of (buffer, start) as returned by mapLog or readLog
+        namespace: globals commands run in, e.g. {"bpy": bpy}
+        sync: run blendit.sync() before commands needing evaluated data
+        """
+
+        self.buffers = buffers
+        self.namespace = namespace
+        self.sync = sync
+        self.operators = {}
+
+        # Last command run, assignments are synced before what follows
+        self.previous = None
+
+        # Position of the next command
+        self.offset = 0
+        self.index = 0
+        self.buffer = 0
+        self.position = buffers[0][1] if buffers else 0
+
+        self.paused = False
+
+    def close(self):
+        for buffer, _ in self.buffers:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+        self.buffers = []
+
+    def getOperator(self, module, name):
+        """Returns cached bpy.ops operator"""
+
+        key = (module, name)
+        operator = self.operators.get(key)
+        if operator is None:
+            operator = getattr(getattr(self.namespace["bpy"].ops, module), name)
+            self.operators[key] = operator
+        return operator
+
+    def nextCommand(self):
+        """Returns (offset, command) of the next command, None at the end"""
+
+        while self.buffer < len(self.buffers):
+            data, start = self.buffers[self.buffer]
+            end = data.find(b"\n", self.position)
+            if end == -1:
+                end = len(data)
+
+            offset = self.offset
+            command = data[self.position:end].strip()
+            self.offset += end + 1 - self.position
+            self.position = end + 1
+
+            if self.position >= len(data):
+                self.offset -= self.position - len(data)
+                self.buffer += 1
+                if self.buffer < len(self.buffers):
+                    self.position = self.buffers[self.buffer][1]
+
+            if command:
+                return offset, command.decode()
+        return None
+
+    def execute(self, command):
+        """Runs a single command"""
+
+        if self.sync and commandLog.needsSync(command, self.previous):
+            self.namespace["blendit"].sync()
+        self.previous = command
+
+        call = parseOperatorCall(command)
+        if call:
+            module, name, args, kwargs = call
+            self.getOperator(module, name)(*args, **kwargs)
+        else:
+            exec(compileCommand(command), self.namespace)
+
+    def run(self, stopOffset=None, stopIndex=None, maxCommands=None):
+        """
+        Runs commands until the end of the log, pause() or a limit
+        stopOffset: stop before the command starting at or after offset
+        stopIndex: stop before the command with this index
+        maxCommands: stop after running this many commands
+        Returns number of commands run, call again to resume.
+        """
+
+        self.paused = False
+        count = 0
+        while not self.paused:
+            if maxCommands is not None and count >= maxCommands:
+                break
+            if stopIndex is not None and self.index >= stopIndex:
+                break
+
+            state = (self.offset, self.buffer, self.position)
+            nextCommand = self.nextCommand()
+            if nextCommand is None:
+                break
+
+            offset, command = nextCommand
+            if stopOffset is not None and offset >= stopOffset:
+                # Leave the command for a later run
+                self.offset, self.buffer, self.position = state
+                break
+
+            self.execute(command)
+            self.index += 1
+            count += 1
+
+        return count
+
+    def pause(self):
+        """Stops run() after the current command"""
+
+        self.paused = True
+
+    def isFinished(self):
+        return self.buffer >= len(self.buffers)
+
+    def executeCommands(self):
+        """Runs the rest of the log, like regen.executeCommands"""
+
+        self.run()
@@ -0,0 +1,692 @@
+import re
+import ast
+
+"""
+    Dependency slicing of the command log
+
+    Commands are replayed symbolically, tracking object names, the active
+    object and the selection, to find which datablocks each command reads
+    and writes. Walking the log backwards from the chosen datablocks then
+    keeps only the commands their final state depends on.
+
+    Keys are (bpy.data collection, name). The analysis is conservative:
+    commands whose targets cannot be told are assumed to act on the
+    active and selected objects, so a slice may contain more than needed
+    but replays the chosen datablocks like the full log does.
+
+    Objects are linked to the datablocks they use, their object data,
+    materials and any datablock assigned to them. Writing a datablock
+    writes every object using it, so slicing an object keeps the edits
+    made to its mesh or materials through other objects sharing them.
+    Datablocks whose name cannot be told are keyed (collection, None)
+    and stand for any datablock of that collection.
+"""
+SELECTION = ("context", "selection")
+
+# Names of objects whose name is derived from this base, for suffixes
+NAMES = "names"
+
+# Object data created along with an object, keyed ("data", "#<number>")
+DATA = "data"
+
+# Collections holding object data, aliasing any ("data", ...) key
+OBDATA_COLLECTIONS = ("meshes", "curves", "metaballs", "lattices",
+                      "armatures", "cameras", "lights", "speakers",
+                      "grease_pencils", "volumes", "pointclouds",
+                      "hair_curves")
+
+# Operator module -> collection of datablocks it may create or rename
+DATA_MODULES = {"material": "materials", "world": "worlds",
+                "texture": "textures", "image": "images",
+                "node": "node_groups", "collection": "collections"}
+
+REFERENCE_PATTERN = re.compile(r"""bpy\.data\.(\w+)\[("[^"]*"|'[^']*')\]""")
+OPERATOR_PATTERN = re.compile(r"^bpy\.ops\.(\w+\.\w+)\((.*)\)$")
+SELECT_PATTERN = re.compile(
+    r"^\[bpy\.context\.view_layer\.objects\.get\(obj\)\.select_set\(True\) "
+    r"for obj in (\[.*\])\]$")
+SET_SELECTION_PATTERN = re.compile(r"^blendit\.setSelection\((\[.*\])\)$")
+SELECT_DELTA_PATTERN = re.compile(
+    r"^blendit\.selectDelta\((\[.*\]), (\[.*\])\)$")
+DATA_CALL_PATTERN = re.compile(r"bpy\.data\.(\w+)\.(?:new|remove)\(")
+SUBSCRIPT_PATTERN = re.compile(r"bpy\.data\.(\w+)\[")
+OBJECT_PATH = (r"(bpy\.context\.object|bpy\.context\.active_object|"
+               r"bpy\.context\.view_layer\.objects\.active|"
+               r"bpy\.data\.objects\[(?:\"[^\"]*\"|'[^']*')\])")
+LINK_PATTERN = re.compile(
+    rf"^{OBJECT_PATH}\.(data|active_material|material_slots\[[^\]]*\]\.material)"
+    r"((?:\.|\[).*)?$")
+ACTIVE_PATTERN = re.compile(
+    r"^bpy\.context\.view_layer\.objects\.active = (.+)$")
+RENAME_PATTERN = re.compile(r"^(.+)\.name = (\"[^\"]*\"|'[^']*')$")
+SUFFIX_PATTERN = re.compile(r"^(.*)\.(\d{3,})$")
+
+DESELECT_ALL = ("[obj.select_set(False) for obj in",
+                "bpy.ops.object.select_all(action='DESELECT'")
+SELECT_ALL = "bpy.ops.object.select_all(action='SELECT'"
+
+# Context paths resolving to the active object
+ACTIVE_PATHS = ("bpy.context.object", "bpy.context.active_object",
+                "bpy.context.view_layer.objects.active")
+
+# Operator -> name of the object it creates
+CREATE_OPERATORS = {
+    "mesh.primitive_cube_add": "Cube",
+    "mesh.primitive_plane_add": "Plane",
+    "mesh.primitive_circle_add": "Circle",
+    "mesh.primitive_uv_sphere_add": "Sphere",
+    "mesh.primitive_ico_sphere_add": "Icosphere",
+    "mesh.primitive_cylinder_add": "Cylinder",
+    "mesh.primitive_cone_add": "Cone",
+    "mesh.primitive_torus_add": "Torus",
+    "mesh.primitive_grid_add": "Grid",
+    "mesh.primitive_monkey_add": "Suzanne",
+    "curve.primitive_bezier_curve_add": "BezierCurve",
+    "curve.primitive_bezier_circle_add": "BezierCircle",
+    "object.camera_add": "Camera",
+    "object.empty_add": "Empty",
+    "object.text_add": "Text",
+    "object.armature_add": "Armature",
+    "object.speaker_add": "Speaker",
+}
+LIGHT_NAMES = {"POINT": "Point", "SUN": "Sun", "SPOT": "Spot", "AREA": "Area"}
+
+DUPLICATE_OPERATORS = ("object.duplicate", "object.duplicate_move",
+                       "object.duplicate_move_linked")
+DELETE_OPERATORS = ("object.delete",)
+LINK_OPERATORS = ("object.make_links_data",)
+MODE_OPERATORS = ("object.editmode_toggle", "object.mode_set",
+                  "sculpt.sculptmode_toggle")
+
+# Operators that do not change scene data
+VIEW_OPERATORS = ("view3d.view_", "view3d.zoom", "view3d.localview",
+                  "screen.", "wm.tool_set_by_id", "info.", "outliner.show")
+
+
+def getBaseName(name):
+    """Returns name without a .001 like suffix"""
+
+    match = SUFFIX_PATTERN.match(name)
+    return match.group(1) if match else name
+
+
+def getReferences(text):
+    """Returns set of keys referenced by bpy.data.<collection>['name']"""
+
+    return {(collection, ast.literal_eval(name))
+            for collection, name in REFERENCE_PATTERN.findall(text)}
+
+
+def getCollectionKeys(text):
+    """
+    Returns (collection, None) keys of datablocks referenced by index or
+    created and removed in text, their names cannot be told
+    """
+
+    named = {match.group(0) for match in REFERENCE_PATTERN.finditer(text)}
+    keys = {(collection, None) for collection in DATA_CALL_PATTERN.findall(text)}
+    for match in SUBSCRIPT_PATTERN.finditer(text):
+        if not any(text.startswith(reference, match.start()) 
+                   for reference in named):
+            keys.add((match.group(1), None))
+    return keys
+
+
+def isDataKey(key):
+    """Returns True if key is a datablock other than an object"""
+
+    return key[0] not in ("objects", NAMES, SELECTION[0])
+
+
+def isSameData(key, other):
+    """Returns True if datablock keys may refer to the same datablock"""
+
+    if key == other:
+        return True
+
+    collection = DATA if key[0] in OBDATA_COLLECTIONS else key[0]
+    otherCollection = DATA if other[0] in OBDATA_COLLECTIONS else other[0]
+    if collection != otherCollection:
+        return False
+
+    # Object data created along with objects is only told apart by number
+    if key[0] == DATA and other[0] == DATA:
+        return key[1] is None or other[1] is None
+    return (key[1] is None or other[1] is None or 
+            collection == DATA)
+
+
+def getKwargs(args):
+    """Returns literal keyword arguments of an operator call"""
+
+    try:
+        call = ast.parse(f"f({args})", mode="eval").body
+    except SyntaxError:
+        return {}
+
+    kwargs = {}
+    for keyword in call.keywords:
+        try:
+            kwargs[keyword.arg] = ast.literal_eval(keyword.value)
+        except ValueError:
+            continue
+    return kwargs
+
+
+class Effect:
+    """Keys a command reads and writes, kills are fully redefined"""
+
+    __slots__ = ("reads", "writes", "kills")
+
+    def __init__(self, reads=(), writes=(), kills=()):
+        self.reads = set(reads)
+        self.writes = set(writes)
+        self.kills = set(kills)
+
+
+class SceneState:
+    """Object names, active object, selection and links while replaying"""
+
+    def __init__(self, names=()):
+        self.names = set(names)
+        self.active = None
+        self.selected = set()
+        self.editing = False
+
+        # Object name -> keys of datablocks it uses, and the reverse
+        self.links = {}
+        self.users = {}
+        self.dataCount = 0
+
+    def getUniqueName(self, base):
+        if base not in self.names:
+            return base
+        number = 1
+        while f"{base}.{number:03d}" in self.names:
+            number += 1
+        return f"{base}.{number:03d}"
+
+    def getTargets(self):
+        """Returns keys of objects context operators act on"""
+
+        targets = {("objects", name) for name in self.selected}
+        if self.active:
+            targets.add(("objects", self.active))
+        return targets
+
+    def link(self, name, keys):
+        """Records that object name uses datablocks with keys"""
+
+        self.links.setdefault(name, set()).update(keys)
+        for key in keys:
+            self.users.setdefault(key, set()).add(name)
+
+    def unlink(self, name):
+        for key in self.links.pop(name, ()):
+            self.users[key].discard(name)
+
+    def newData(self):
+        """Returns key of new object data"""
+
+        self.dataCount += 1
+        return (DATA, f"#{self.dataCount}")
+
+    def getDataKeys(self, keys):
+        """Returns keys of datablocks used by objects with keys"""
+
+        return {dataKey for collection, name in keys if collection == "objects"
+                for dataKey in self.links.get(name, ())}
+
+    def getUsers(self, keys):
+        """Returns keys of objects using any datablock with keys"""
+
+        return {("objects", name) for key, names in self.users.items()
+                if names and any(isSameData(key, other) for other in keys)
+                for name in names}
+
+    def writeData(self, keys):
+        """Returns keys written when writing datablocks with keys"""
+
+        dataKeys = {key for key in keys if isDataKey(key)}
+        return set(keys) | self.getUsers(dataKeys)
+
+    def create(self, base):
+        """Adds a new active and only selected object, returns its Effect"""
+
+        name = self.getUniqueName(base)
+        self.names.add(name)
+        self.active = name
+        self.selected = {name}
+        self.unlink(name)
+        self.link(name, {self.newData()})
+
+        key = ("objects", name)
+        reads = {(NAMES, base)} if name != base else set()
+        return Effect(reads, {key, (NAMES, base), SELECTION},
+                      {key, SELECTION})
+
+    def apply(self, command):
+        """Updates state with command, returns its Effect"""
+
+        effect = self.applyCommand(command)
+
+        # Objects referenced by index may be any of them
+        anyObject = ("objects", None)
+        for keys in (effect.reads, effect.writes):
+            if anyObject in keys:
+                keys.discard(anyObject)
+                keys.update(("objects", name) for name in self.names)
+        return effect
+
+    def applyCommand(self, command):
+        references = getReferences(command) | getCollectionKeys(command)
+
+        # Selection and active object
+        if command.startswith(DESELECT_ALL):
+            self.selected = set()
+            return Effect(writes={SELECTION}, kills={SELECTION})
+
+        if command.startswith(SELECT_ALL):
+            self.selected = set(self.names)
+            return Effect({("objects", name) for name in self.names},
+                          {SELECTION}, {SELECTION})
+
+        match = SELECT_PATTERN.match(command)
+        if match:
+            try:
+                names = set(ast.literal_eval(match.group(1)))
+            except ValueError:
+                names = set()
+            self.selected |= names
+            return Effect({("objects", name) for name in names}, {SELECTION})
+
+        match = SET_SELECTION_PATTERN.match(command)
+        if match:
+            self.selected = set(ast.literal_eval(match.group(1)))
+            return Effect({("objects", name) for name in self.selected},
+                          {SELECTION}, {SELECTION})
+
+        # Depends on the selection recorded before it, so never kills it
+        match = SELECT_DELTA_PATTERN.match(command)
+        if match:
+            added = set(ast.literal_eval(match.group(1)))
+            removed = set(ast.literal_eval(match.group(2)))
+            self.selected = (self.selected - removed) | added
+            return Effect({("objects", name) for name in added}, {SELECTION})
+
+        match = ACTIVE_PATTERN.match(command)
+        if match:
+            self.active = next((name for collection, name in references
+                                if collection == "objects"), None)
+            return Effect(references, {SELECTION})
+
+        if command.startswith("blendit."):
+            return self.applyHelper(command, references)
+
+        match = OPERATOR_PATTERN.match(command)
+        if match:
+            return self.applyOperator(match.group(1), match.group(2),
+                                      references)
+
+        match = RENAME_PATTERN.match(command)
+        if match:
+            return self.applyRename(match.group(1),
+                                    ast.literal_eval(match.group(2)),
+                                    references)
+
+        return self.applyAssignment(command, references)
+
+    def applyOperator(self, operator, args, references):
+        kwargs = getKwargs(args)
+
+        if operator.startswith(VIEW_OPERATORS):
+            return Effect()
+
+        if operator in MODE_OPERATORS:
+            if operator == "object.mode_set":
+                self.editing = kwargs.get("mode", "OBJECT") != "OBJECT"
+            else:
+                self.editing = not self.editing
+
+            # Leaving edit mode writes the edited object data
+            targets = self.getTargets()
+            return Effect(targets | {SELECTION},
+                          self.writeData(targets | self.getDataKeys(targets)))
+
+        # Primitives added in edit mode join the edited mesh
+        base = CREATE_OPERATORS.get(operator)
+        if operator == "object.light_add":
+            base = LIGHT_NAMES.get(kwargs.get("type", "POINT"), "Light")
+        if base and not self.editing:
+            return self.create(base)
+
+        if operator in DUPLICATE_OPERATORS and not self.editing:
+            targets = self.getTargets()
+            duplicate = kwargs.get("OBJECT_OT_duplicate", kwargs)
+            linked = (operator == "object.duplicate_move_linked" or
+                      isinstance(duplicate, dict) and 
+                      duplicate.get("linked", False))
+            copies = {}
+            for name in sorted(self.selected):
+                base = getBaseName(name)
+                copies[name] = self.getUniqueName(base)
+                self.names.add(copies[name])
+
+                # Materials stay shared, object data only when linked
+                keys = self.links.get(name, set())
+                if not linked:
+                    keys = {key for key in keys if key[0] != DATA}
+                    keys.add(self.newData())
+                self.unlink(copies[name])
+                self.link(copies[name], keys)
+            copyKeys = {("objects", copy) for copy in copies.values()}
+            bases = {(NAMES, getBaseName(name)) for name in copies}
+
+            self.active = copies.get(self.active)
+            self.selected = set(copies.values())
+            return Effect(targets | bases | {SELECTION},
+                          copyKeys | bases | {SELECTION}, copyKeys)
+
+        if operator in DELETE_OPERATORS and not self.editing:
+            targets = self.getTargets()
+            bases = {(NAMES, getBaseName(name)) for name in self.selected}
+            for name in self.selected:
+                self.unlink(name)
+            self.names -= self.selected
+            if self.active in self.selected:
+                self.active = None
+            self.selected = set()
+            return Effect(targets | {SELECTION},
+                          targets | bases | {SELECTION})
+
+        if operator in LINK_OPERATORS and not self.editing:
+            targets = self.getTargets()
+            keys = self.getDataKeys({("objects", self.active)})
+            if kwargs.get("type", "OBDATA") == "OBDATA":
+                keys = {key for key in keys if key[0] == DATA}
+            elif kwargs.get("type") == "MATERIAL":
+                keys = {key for key in keys if key[0] == "materials"}
+            for name in self.selected:
+                self.link(name, keys)
+            return Effect(targets | {SELECTION}, targets)
+
+        # Any other operator acts on the context
+        targets = self.getTargets()
+        writes = targets | references
+
+        # Moving objects leaves the data they use as it was
+        if not (operator.startswith("transform.") and not self.editing):
+            writes = self.writeData(writes | self.getDataKeys(targets))
+
+        # Creating or renaming datablocks changes names of new ones
+        collection = DATA_MODULES.get(operator.split(".")[0])
+        if collection:
+            writes |= self.writeData({(collection, None)})
+
+        return Effect(targets | references | {SELECTION}, writes)
+
+    def applyHelper(self, command, references):
+        """Effect of a blendit.<name>(...) replay helper"""
+
+        try:
+            call = ast.parse(command, mode="eval").body
+            name = call.func.attr
+            args = [ast.literal_eval(arg) for arg in call.args]
+        except (SyntaxError, ValueError, AttributeError):
+            return Effect(references, references)
+
+        if name == "restoreMesh":
+            keys = {("objects", args[0])}
+            writes = self.writeData(keys | self.getDataKeys(keys))
+            return Effect(keys, writes)
+        if name == "setObjectProperties":
+            keys = {("objects", objectName) for objectName in args[1]}
+            return Effect(keys, keys)
+        if name == "sync":
+            return Effect()
+        if name == "appendSlice":
+            keys = set()
+            for objectName in args[1]:
+                objectName = self.getUniqueName(objectName)
+                self.names.add(objectName)
+                self.unlink(objectName)
+                self.link(objectName, {self.newData()})
+                keys.add(("objects", objectName))
+            bases = {(NAMES, getBaseName(name)) for name in args[1]}
+            # Appended materials shift names of later ones
+            collection = ("collections", args[2])
+            writes = self.writeData({collection, ("materials", None)})
+            return Effect(bases, keys | bases | writes, keys)
+        return Effect(references, references)
+
+    def applyRename(self, path, name, references):
+        if path.startswith(ACTIVE_PATHS):
+            old = self.active
+        else:
+            old = next((key[1] for key in getReferences(path)
+                        if key[0] == "objects"), None)
+
+        if old is None or old not in self.names:
+            return Effect(references, references)
+
+        self.names.discard(old)
+        self.names.add(name)
+        keys = self.links.get(old, set())
+        self.unlink(old)
+        self.link(name, keys)
+        self.selected = {name if item == old else item
+                         for item in self.selected}
+        if self.active == old:
+            self.active = name
+
+        key = ("objects", name)
+        bases = {(NAMES, getBaseName(old)), (NAMES, getBaseName(name))}
+        return Effect({("objects", old), SELECTION} | references,
+                      {key} | bases, {key})
+
+    def getPathObject(self, path):
+        """Returns name of object at an object path, None if unknown"""
+
+        if path in ACTIVE_PATHS:
+            return self.active
+        return next((key[1] for key in getReferences(path)
+                     if key[0] == "objects"), None)
+
+    def applyLink(self, match, value, reads):
+        """Effect of assigning or writing through object data or materials"""
+
+        path, attribute, rest = match.groups()
+        name = self.getPathObject(path)
+        if path in ACTIVE_PATHS:
+            reads.add(SELECTION)
+        if name is None:
+            return None
+
+        key = ("objects", name)
+        collection = DATA if attribute == "data" else "materials"
+
+        # Assigning a datablock, the object now uses it
+        if not rest:
+            keys = {dataKey for dataKey in reads if isDataKey(dataKey)}
+            if not keys and value.strip() != "None":
+                keys = {(collection, None)}
+            self.link(name, keys)
+            return Effect(reads | {key}, {key})
+
+        # Writing the datablock, every object using it changes
+        keys = {dataKey for dataKey in self.links.get(name, ())
+                if (dataKey[0] == DATA) == (collection == DATA)}
+        if not keys:
+            keys = {(collection, None)}
+        return Effect(reads | {key}, self.writeData({key} | keys))
+
+    def applyAssignment(self, command, references):
+        target, _, value = command.partition(" = ")
+        reads = getReferences(value) | getCollectionKeys(value)
+
+        match = LINK_PATTERN.match(target)
+        if match:
+            effect = self.applyLink(match, value, reads)
+            if effect:
+                return effect
+
+        if target.startswith(ACTIVE_PATHS):
+            reads.add(SELECTION)
+            writes = {("objects", self.active)} if self.active else set()
+            return Effect(reads | writes, writes | getReferences(target))
+        if target.startswith("bpy.context.selected_objects"):
+            targets = self.getTargets()
+            return Effect(reads | targets | {SELECTION}, targets)
+
+        writes = (getReferences(target) | getCollectionKeys(target) 
+                  or references)
+        return Effect(references, self.writeData(writes))
+
+
+def analyze(commands, names=()):
+    """Returns Effect of each command, names exist before the first"""
+
+    state = SceneState(names)
+    return [state.apply(command) for command in commands]
+
+
+def getSliceIndices(effects, keys):
+    """
+    Returns indices of commands needed to reconstruct datablocks with keys
+    effects: Effect of each command, as returned by analyze
+    keys: iterable of (collection, name), e.g. ("objects", "Cube")
+    """
+
+    needed = set(keys)
+    included = []
+    for index in range(len(effects) - 1, -1, -1):
+        effect = effects[index]
+        if not effect.writes & needed:
+            continue
+        included.append(index)
+        needed -= effect.kills
+        needed |= effect.reads
+
+    included.reverse()
+    return included
+
+
+def sliceCommands(commands, keys, names=()):
+    """
+    Returns commands needed to reconstruct datablocks with keys
+    keys: iterable of (collection, name), e.g. ("objects", "Cube")
+    """
+
+    effects = analyze(commands, names)
+    return [commands[index] for index in getSliceIndices(effects, keys)]
+
+
+"""
+    Partitions
+
+    Objects whose commands never share a datablock can be replayed
+    separately. Keys touched by the same command are joined, selection
+    changes excepted, and each resulting group of existing objects is a
+    partition. Scene settings are left to be replayed after merging.
+
+    Datablocks whose name cannot be told may be any of their collection,
+    so all keys of that collection are joined. Commands writing only
+    datablocks no object uses are in no partition, such logs are not
+    split at all.
+"""
+SCENE_PREFIXES = ("bpy.context.scene.", "bpy.data.scenes[", 
+                  "bpy.data.worlds[", "bpy.context.scene.world.",
+                  "bpy.ops.scene.", "bpy.ops.world.")
+
+
+def isSceneCommand(command):
+    """Returns True if command changes scene or world settings"""
+
+    return command.startswith(SCENE_PREFIXES)
+
+
+def partition(commands, names=()):
+    """Returns list of sets of names of objects that can be replayed apart"""
+
+    parents = {}
+
+    def find(key):
+        root = key
+        while parents.setdefault(root, root) != root:
+            root = parents[root]
+        # Path compression
+        while parents[key] != root:
+            parents[key], key = root, parents[key]
+        return root
+
+    state = SceneState(names)
+    for command in commands:
+        effect = state.apply(command)
+        keys = list((effect.reads | effect.writes) - {SELECTION})
+        for key in keys[1:]:
+            parents[find(key)] = find(keys[0])
+
+    # E.g. a material made by an operator and then referenced by name
+    collections = {}
+    for key in list(parents):
+        if isDataKey(key):
+            collection = DATA if key[0] in OBDATA_COLLECTIONS else key[0]
+            collections.setdefault(collection, []).append(key)
+    for collection, keys in collections.items():
+        # Distinct unless unnamed or naming object data of any object
+        if all(key[1] is not None and key[0] == collection for key in keys):
+            continue
+        for key in keys[1:]:
+            parents[find(key)] = find(keys[0])
+
+    partitions = {}
+    for name in state.names:
+        partitions.setdefault(find(("objects", name)), set()).add(name)
+    return list(partitions.values())
+
+
+def groupPartitions(partitions, count, commands=()):
+    """
+    Returns at most count lists of object names with balanced work
+    Work of a partition is the number of commands referencing its objects.
+    """
+
+    weights = []
+    for names in partitions:
+        quoted = [f"[{name!r}]" for name in names]
+        weight = sum(1 for command in commands 
+                     if any(item in command for item in quoted))
+        weights.append((weight + len(names), sorted(names)))
+
+    # Largest first, each to the least loaded group
+    groups = [[0, []] for _ in range(min(count, len(partitions)))]
+    for weight, names in sorted(weights, key=lambda item: -item[0]):
+        group = min(groups, key=lambda group: group[0])
+        group[0] += weight
+        group[1].extend(names)
+    return [names for _, names in groups if names]
+
+
+def getPartitionGroups(commands, count, names=()):
+    """
+    Returns at most count lists of object names to replay apart, None if
+    the log cannot be split or some command would be left out of all
+    """
+
+    groups = groupPartitions(partition(commands, names), count, commands)
+    if len(groups) <= 1:
+        return None
+
+    effects = analyze(commands, names)
+    covered = set()
+    for group in groups:
+        covered.update(getSliceIndices(effects, 
+                                       [("objects", name) for name in group]))
+
+    # Selection and view changes are not kept by merging anyway
+    for index, (command, effect) in enumerate(zip(commands, effects)):
+        if index in covered or isSceneCommand(command):
+            continue
+        if any(key != SELECTION and key[0] != NAMES for key in effect.writes):
+            return None
+    return groups
@@ -0,0 +1,171 @@
+import sys
+import time
+import threading
+import importlib
+
+import bpy
+from bpy.types import Operator
+from bpy.app import handlers
+from bpy.app.handlers import persistent
+
+import pygit2 as git
+from pygit2._pygit2 import GitError
+
+# Local imports implemented to support Blender refreshes
+modulesNames = ("gitHelpers", "autoCommit")
+for module in modulesNames:
+    if module in sys.modules:
+        importlib.reload(sys.modules[module])
+    else:
+        parent = ".".join(__name__.split(".")[:-1])
+        globals()[module] = importlib.import_module(f"{parent}.{module}")
+
+
+MAINTENANCE_ICON = 'PACKAGE'
+
+"""
+    Idle maintenance
+
+    Once no change has been made for IDLE_TIME seconds, nothing is playing
+    and no modal operator runs, a repository with enough loose objects is
+    repacked on a background thread. The Optimize Repository operator uses
+    the same thread, one repack runs at a time and a timer only polls it,
+    so the interface keeps responding while objects are packed.
+"""
+# Seconds between idle checks
+IDLE_INTERVAL = 300
+
+# Seconds without changes before Blender counts as idle
+IDLE_TIME = 120
+
+# Seconds between polls of a running repack
+POLL_INTERVAL = 1
+
+# Loose objects needed before idle maintenance kicks in
+LOOSE_OBJECTS_THRESHOLD = 256
+
+# Time of the last change seen
+lastActivity = time.monotonic()
+
+# Thread running a repack and its (before, after) stats or error
+repackThread = None
+repackResult = None
+
+
+def getStatsStr(before, after):
+    """Returns summary of object stats before and after maintenance"""
+
+    return (
+        f"Loose objects: {before['loose']} -> {after['loose']}, "
+        f"Packs: {before['packs']} -> {after['packs']}, "
+        f"Size: {gitHelpers.getSizeStr(before['size'])} -> "
+        f"{gitHelpers.getSizeStr(after['size'])}"
+    )
+
+
+class BlenditMaintenance(Operator):
+    """Pack and prune repository objects."""
+
+    bl_label = "Optimize Repository"
+    bl_idname = "blendit.maintenance"
+
+    def execute(self, context):
+        filepath = bpy.path.abspath("//")
+
+        if repackThread is not None:
+            self.report({'WARNING'}, "Repository is being optimized.")
+            return {'CANCELLED'}
+
+        try:
+            git.Repository(filepath)
+        except GitError:
+            return {'CANCELLED'}
+
+        startRepack(filepath)
+        self.report({'INFO'}, "Optimizing repository in the background.")
+
+        return {'FINISHED'}
+
+
+@persistent
+def depsgraphUpdateHandler(scene, depsgraph):
+    global lastActivity
+    lastActivity = time.monotonic()
+
+
+def runRepack(filepath):
+    """Repacks repository at filepath, run on a background thread"""
+
+    global repackResult
+    try:
+        repackResult = gitHelpers.repack(git.Repository(filepath))
+    except (GitError, OSError) as error:
+        repackResult = error
+
+
+def startRepack(filepath):
+    """Repacks repository at filepath on a background thread"""
+
+    global repackThread
+    repackThread = threading.Thread(target=runRepack, args=(filepath,),
+                                    daemon=True)
+    repackThread.start()
+    bpy.app.timers.register(pollRepack, first_interval=POLL_INTERVAL)
+
+
+def pollRepack():
+    """Reports a finished background repack, returns None once done"""
+
+    global repackThread, repackResult
+    if repackThread is None:
+        return None
+    if repackThread.is_alive():
+        return POLL_INTERVAL
+
+    if isinstance(repackResult, Exception):
+        print(f"Blendit maintenance failed: {repackResult}")
+    else:
+        print(f"Blendit maintenance: {getStatsStr(*repackResult)}")
+    repackThread = None
+    repackResult = None
+    return None
+
+
+def idleMaintenance():
+    """Repacks the repository when Blender is idle and loose objects pile up"""
+
+    if repackThread is not None:
+        return IDLE_INTERVAL
+
+    # Skip while working, playing back animation or running modal operators
+    if time.monotonic() - lastActivity < IDLE_TIME or autoCommit.isBusy():
+        return IDLE_INTERVAL
+
+    filepath = bpy.path.abspath("//")
+    if not bpy.data.filepath:
+        return IDLE_INTERVAL
+
+    try:
+        repo = git.Repository(filepath)
+    except GitError:
+        return IDLE_INTERVAL
+
+    if gitHelpers.getObjectStats(repo)["loose"] < LOOSE_OBJECTS_THRESHOLD:
+        return IDLE_INTERVAL
+
+    startRepack(filepath)
+    return IDLE_INTERVAL
+
+
+def register():
+    bpy.utils.register_class(BlenditMaintenance)
+    handlers.depsgraph_update_post.append(depsgraphUpdateHandler)
+    bpy.app.timers.register(idleMaintenance, first_interval=IDLE_INTERVAL,
+                            persistent=True)
+
+def unregister():
+    bpy.utils.unregister_class(BlenditMaintenance)
+    if depsgraphUpdateHandler in handlers.depsgraph_update_post:
+        handlers.depsgraph_update_post.remove(depsgraphUpdateHandler)
+    if bpy.app.timers.is_registered(idleMaintenance):
+        bpy.app.timers.unregister(idleMaintenance)
@@ -0,0 +1,351 @@
+import io
+import os
+import sys
+import importlib
+
+import bpy
+import numpy as np
+
+# Local imports implemented to support Blender refreshes
+modulesNames = ("reports", "subscriptions")
+for module in modulesNames:
+    if module in sys.modules:
+        importlib.reload(sys.modules[module])
+    else:
+        parent = ".".join(__name__.split(".")[:-1])
+        globals()[module] = importlib.import_module(f"{parent}.{module}")
+
+
+"""
+    Mesh snapshots
+
+    When an object leaves edit or sculpt mode its mesh arrays are stored in
+    meshes/<object>/NNNNNN.npz and the edit or sculpt commands logged for
+    that run are replaced by a single blendit.restoreMesh(...) command.
+
+    Geometry, UV maps, seams, sharp edges and smooth shading are stored.
+    Meshes with data a snapshot cannot hold, such as vertex groups, shape
+    keys, custom normals or other attributes, are not snapshotted and keep
+    their logged commands, as do runs split by a flush, e.g. saving while
+    in edit mode.
+
+    Arrays are XOR delta-encoded against the previous snapshot of the same
+    object when their sizes match, which is exact for floats and compresses
+    well since unchanged values become zeros. Every KEYFRAME_INTERVAL
+    snapshots a full copy is stored to bound delta chains.
+"""
+MESHES_DIR = "meshes"
+KEYFRAME_INTERVAL = 16
+
+# Array name -> (collection, attribute, dtype, components)
+ARRAYS = {
+    "co": ("vertices", "co", np.float32, 3),
+    "edges": ("edges", "vertices", np.int32, 2),
+    "loops": ("loops", "vertex_index", np.int32, 1),
+    "loopStart": ("polygons", "loop_start", np.int32, 1),
+    "loopTotal": ("polygons", "loop_total", np.int32, 1),
+    "materialIndex": ("polygons", "material_index", np.int32, 1),
+    "seams": ("edges", "use_seam", bool, 1),
+    "sharpEdges": ("edges", "use_edge_sharp", bool, 1),
+    "smooth": ("polygons", "use_smooth", bool, 1),
+}
+
+# Arrays of UV maps are named with this prefix followed by the map name
+UV_PREFIX = "uv:"
+
+# Attributes held by the arrays above, besides UV maps and internal ones
+KNOWN_ATTRIBUTES = {"position", "material_index", "sharp_edge", "sharp_face"}
+
+EDIT_MODES = {'EDIT', 'SCULPT'}
+
+# Object name -> (relative path, arrays, snapshots since keyframe)
+lastSnapshots = {}
+
+# Object name -> mode when last seen
+lastModes = {}
+
+# Names of objects being edited together
+editedObjects = []
+
+# Relative path -> decoded arrays, for restoring delta chains
+decoded = {}
+
+# Relative path -> object name of snapshots not logged yet
+unflushed = {}
+
+# True if commands of the current mode run were flushed before it ended
+splitRun = False
+
+enabled = False
+
+
+def isCapturable(obj):
+    """Returns True if a snapshot holds all data of the mesh of obj"""
+
+    mesh = obj.data
+    if obj.vertex_groups or mesh.shape_keys or mesh.has_custom_normals:
+        return False
+
+    # Creases and bevel weights are not attributes before Blender 4.0
+    if any(getattr(mesh, layer, False) for layer in 
+           ("use_customdata_edge_crease", "use_customdata_edge_bevel",
+            "use_customdata_vertex_bevel")):
+        return False
+
+    known = KNOWN_ATTRIBUTES | set(mesh.uv_layers.keys())
+    return all(attribute.name.startswith(".") or attribute.name in known
+               for attribute in getattr(mesh, "attributes", ()))
+
+
+def getArrays(mesh):
+    """Returns dict of mesh arrays read with foreach_get"""
+
+    arrays = {}
+    for name, (collection, attribute, dtype, components) in ARRAYS.items():
+        items = getattr(mesh, collection)
+        array = np.empty(len(items) * components, dtype=dtype)
+        items.foreach_get(attribute, array)
+        arrays[name] = array
+
+    # Active map first, so it is active again once restored
+    layers = sorted(mesh.uv_layers, key=lambda layer: not layer.active)
+    for layer in layers:
+        array = np.empty(len(layer.data) * 2, dtype=np.float32)
+        layer.data.foreach_get("uv", array)
+        arrays[f"{UV_PREFIX}{layer.name}"] = array
+    return arrays
+
+
+def setArrays(mesh, arrays):
+    """Replaces mesh geometry with arrays using foreach_set"""
+
+    mesh.clear_geometry()
+    while mesh.uv_layers:
+        mesh.uv_layers.remove(mesh.uv_layers[0])
+
+    mesh.vertices.add(len(arrays["co"]) // 3)
+    mesh.edges.add(len(arrays["edges"]) // 2)
+    mesh.loops.add(len(arrays["loops"]))
+    mesh.polygons.add(len(arrays["loopStart"]))
+
+    for name, (collection, attribute, _, _) in ARRAYS.items():
+        items = getattr(mesh, collection)
+        try:
+            items.foreach_set(attribute, arrays[name])
+        except AttributeError:
+            # loop_total is read-only in newer Blender versions
+            continue
+
+    for name, array in arrays.items():
+        if name.startswith(UV_PREFIX):
+            layer = mesh.uv_layers.new(name=name[len(UV_PREFIX):])
+            layer.data.foreach_set("uv", array)
+    if mesh.uv_layers:
+        mesh.uv_layers.active_index = 0
+
+    mesh.update()
+
+
+def getBits(array):
+    """Returns array viewed as unsigned integers of the same size"""
+
+    return array.view(np.dtype(f"u{array.itemsize}"))
+
+
+def encode(arrays, previous):
+    """Returns arrays XOR-ed with previous ones where sizes match"""
+
+    delta = {}
+    for name, array in arrays.items():
+        base = previous.get(name) if previous else None
+        if base is not None and base.shape == array.shape:
+            delta[name] = getBits(array) ^ getBits(base)
+        else:
+            delta[name] = None
+    return delta
+
+
+def getSafeName(name):
+    """Returns object name usable as a directory name"""
+
+    return bpy.path.clean_name(name)
+
+
+def getNextPath(filepath, name):
+    """Returns relative path of the next snapshot of an object"""
+
+    directory = os.path.join(filepath, MESHES_DIR, getSafeName(name))
+    os.makedirs(directory, exist_ok=True)
+
+    numbers = [int(entry.split(".")[0]) for entry in os.listdir(directory)
+               if entry.endswith(".npz") and entry.split(".")[0].isdigit()]
+    number = max(numbers, default=-1) + 1
+    return f"{MESHES_DIR}/{getSafeName(name)}/{number:06d}.npz"
+
+
+def snapshot(obj):
+    """Stores mesh arrays of obj, returns restore command or None"""
+
+    if not isCapturable(obj):
+        return None
+
+    filepath = bpy.path.abspath("//")
+    arrays = getArrays(obj.data)
+    relpath = getNextPath(filepath, obj.name)
+
+    basePath, baseArrays, count = lastSnapshots.get(obj.name, (None, None, 0))
+    if basePath is None or count + 1 >= KEYFRAME_INTERVAL:
+        basePath, baseArrays, count = None, None, -1
+    delta = encode(arrays, baseArrays)
+
+    data = {"base": np.array(basePath or "")}
+    for name, array in arrays.items():
+        if delta[name] is not None:
+            data[f"delta_{name}"] = delta[name]
+        else:
+            data[name] = array
+
+    np.savez_compressed(os.path.join(filepath, relpath), **data)
+
+    lastSnapshots[obj.name] = (relpath, arrays, count + 1)
+    decoded[relpath] = arrays
+    unflushed[relpath] = obj.name
+    return f"blendit.restoreMesh({obj.name!r}, {relpath!r})"
+
+
+def loadSnapshot(read, relpath):
+    """Returns decoded arrays of a snapshot, resolving its delta chain"""
+
+    if relpath in decoded:
+        return decoded[relpath]
+
+    data = read(relpath, binary=True)
+    if data is None:
+        raise FileNotFoundError(relpath)
+
+    with np.load(io.BytesIO(data)) as file:
+        basePath = str(file["base"])
+        base = loadSnapshot(read, basePath) if basePath else {}
+
+        arrays = {}
+        for key in file.files:
+            if key.startswith("delta_"):
+                name = key[len("delta_"):]
+                arrays[name] = (file[key] ^ 
+                                getBits(base[name])).view(base[name].dtype)
+            elif key != "base":
+                arrays[key] = file[key]
+
+    decoded[relpath] = arrays
+    return arrays
+
+
+def captureModeChanges():
+    """Snapshots meshes of objects that just left edit or sculpt mode"""
+
+    global splitRun
+
+    active = bpy.context.view_layer.objects.active
+    if active is None:
+        return []
+
+    previous = lastModes.get(active.name)
+    lastModes[active.name] = active.mode
+
+    # Entering, remember every object edited together
+    if active.mode in EDIT_MODES:
+        editedObjects[:] = [obj.name for obj in
+                            bpy.context.objects_in_mode_unique_data or [active]]
+        splitRun = False
+        return []
+
+    if previous not in EDIT_MODES:
+        return []
+
+    objects = [bpy.data.objects.get(name) 
+               for name in editedObjects or [active.name]]
+    objects = [obj for obj in objects if obj and obj.type == 'MESH']
+    editedObjects.clear()
+
+    # Part of the run is already logged, there is no whole run to replace
+    if splitRun:
+        splitRun = False
+        return []
+
+    # Keep the logged commands if any mesh cannot be snapshotted. Checked
+    # before writing any, files no command refers to would not be committed
+    if not all(isCapturable(obj) for obj in objects):
+        return []
+
+    lines = [snapshot(obj) for obj in objects]
+
+    # Replace the logged edit commands of this run on next flush
+    if lines:
+        reports.modeRunReplacements.append(lines)
+    return []
+
+
+def flushHandler(commands):
+    """Notes runs split by the flush and forgets snapshots left out of it"""
+
+    global splitRun
+    if editedObjects:
+        splitRun = True
+
+    # Files no logged command refers to are not committed, so later deltas
+    # must not be based on them
+    logged = "\n".join(commands)
+    for relpath, name in unflushed.items():
+        if repr(relpath) in logged:
+            continue
+        path = os.path.join(bpy.path.abspath("//"), relpath)
+        if os.path.exists(path):
+            os.remove(path)
+        if lastSnapshots.get(name, (None,))[0] == relpath:
+            del lastSnapshots[name]
+        decoded.pop(relpath, None)
+    unflushed.clear()
+
+
+def reset():
+    """Forgets snapshots, their files may not exist after a checkout"""
+
+    global splitRun
+    lastSnapshots.clear()
+    lastModes.clear()
+    editedObjects.clear()
+    decoded.clear()
+    unflushed.clear()
+    splitRun = False
+    reports.modeRunReplacements.clear()
+
+
+def setEnabled(value):
+    """Starts or stops snapshotting meshes when leaving edit or sculpt mode"""
+
+    global enabled
+    if value == enabled:
+        return
+    enabled = value
+
+    if enabled:
+        subscriptions.registerCapture("meshSnapshots",
+                                      [(bpy.types.Object, "mode")],
+                                      captureModeChanges)
+        reports.flushHandlers.append(flushHandler)
+    else:
+        subscriptions.unregisterCapture("meshSnapshots")
+        if flushHandler in reports.flushHandlers:
+            reports.flushHandlers.remove(flushHandler)
+    reset()
+
+    # Apply to message bus subscriptions
+    subscriptions.unsubscribe()
+    subscriptions.subscribe()
+
+
+def unregister():
+    if enabled:
+        subscriptions.unregisterCapture("meshSnapshots")
+    if flushHandler in reports.flushHandlers:
+        reports.flushHandlers.remove(flushHandler)
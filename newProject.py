@@ -9,7 +9,7 @@ from bpy.props import StringProperty
 import pygit2 as git
 
 # Local imports implemented to support Blender refreshes
-modulesNames = ("gitHelpers", "reports")
+modulesNames = ("commandLog", "gitHelpers", "reports")
 for module in modulesNames:
     if module in sys.modules:
         importlib.reload(sys.modules[module])
@@ -157,9 +157,7 @@ class BlenditNewProject(bpy.types.Operator, ExportHelper):
 
         # Init python file
         with open(os.path.join(filepath, f"{filename}.py"), "w") as file:
-            file.write("import bpy\n\n")
-            file.write("def executeCommands():\n")
-            file.write("\tpass\n")
+            file.write(commandLog.LOG_HEADER)
 
         # Save .blend file
         bpy.ops.wm.save_mainfile(filepath=os.path.join(filepath, f"{filename}.blend"))
@@ -10,7 +10,9 @@ import pygit2 as git
 from pygit2._pygit2 import GitError
 
 # Local imports implemented to support Blender refreshes
-modulesNames = ("gitHelpers", "reports", "subscriptions")
+modulesNames = ("commandLog", "gitHelpers", "reports", "subscriptions",
+                "depsgraphCapture", "meshSnapshots", "replayHelpers", 
+                "logInterpreter", "logSlicer")
 for module in modulesNames:
     if module in sys.modules:
         importlib.reload(sys.modules[module])
@@ -21,6 +23,9 @@ for module in modulesNames:
 
 OPEN_PROJECT_ICON = 'FILE_FOLDER'
 
+# Logs bigger than this are streamed instead of imported as a module
+STREAM_SIZE = 64 * 1024 * 1024
+
 
 class BlenditOpenProject(bpy.types.Operator, ExportHelper):
     """Open a Blendit project."""
@@ -127,41 +132,41 @@ class BlenditOpenProject(bpy.types.Operator, ExportHelper):
             gitHelpers.configUser(repo, username, email)
         
         try:
-            regenFile(filepath, filename)
+            stats = regenFile(filepath, filename)
         except FileNotFoundError:
             self.report({'ERROR_INVALID_INPUT'}, "Blendit project not found.")
             return {'CANCELLED'}
 
+        self.report({'INFO'}, f"Regenerated, {stats.avoided} depsgraph "
+                              f"evaluations avoided.")
+
         return {'FINISHED'}
 
 
 def regenFile(filepath, filename):
+    """Regenerates the project's .blend file, returns ReplayStats"""
+
     # Load new blend file
     bpy.ops.wm.read_homefile(app_template="blendit")
 
     # Unsubscribe message busses
     subscriptions.unsubscribe()
 
-    # Import python file as a module named regen
-    regen = importRegen(filepath, filename)
+    # Import python file as a module named regen, stream very large logs
+    if logInterpreter.getLogSize(filepath, filename) > STREAM_SIZE:
+        regen = interpretRegen(filepath, filename)
+    else:
+        regen = importRegen(filepath, filename)
 
     # Regenerate blend file
-    window = bpy.context.window_manager.windows[0]
-    area = window.screen.areas[0]
-    with bpy.context.temp_override(window=window, area=area):
-        # Current area type
-        currentType = area.type
-
-        # Change area type to INFO and delete all content                
-        area.type = 'VIEW_3D'
-        
-        regen.executeCommands()
-
-        # Restore area type
-        area.type = currentType
+    stats = executeRegen(regen)
+    if hasattr(regen, "close"):
+        regen.close()
     
-    # Clear reports
+    # Clear reports and changes captured during regeneration
     reports.clearReports()
+    depsgraphCapture.reset()
+    meshSnapshots.reset()
 
     # Save .blend file
     bpy.ops.wm.save_mainfile(filepath=os.path.join(filepath, f"{filename}.blend"))
@@ -169,19 +174,93 @@ def regenFile(filepath, filename):
     # Re-subscribe to message busses
     subscriptions.subscribe()
 
-
-def importRegen(filepath, filename):
-    """ Import python file as a module named regen """
+    return stats
+
+
+def executeRegen(regen):
+    """
+    Runs regen.executeCommands in a bulk replay context, within a 3D
+    Viewport if there is a window. Returns ReplayStats
+    """
+
+    with replayHelpers.bulkReplay() as stats:
+        # Background mode has no windows to override
+        windows = bpy.context.window_manager.windows
+        if not windows:
+            regen.executeCommands()
+        else:
+            window = windows[0]
+            area = window.screen.areas[0]
+            with bpy.context.temp_override(window=window, area=area):
+                # Current area type
+                currentType = area.type
+
+                # Change area type to INFO and delete all content                
+                area.type = 'VIEW_3D'
+                
+                regen.executeCommands()
+
+                # Restore area type
+                area.type = currentType
+
+    print(f"Blendit replay: {stats}")
+    return stats
+
+
+def importRegen(filepath, filename, read=None, objects=None, 
+                commandFilter=None):
+    """ 
+    Import python file as a module named regen 
+    read: reader of project files, defaults to the working directory
+    objects: names of objects to reconstruct, only replays the commands
+    they depend on
+    commandFilter: function returning the list of commands to replay
+    """
     
     from importlib import util
 
-    spec = util.spec_from_file_location("regen", os.path.join(filepath, f"{filename}.py"))
+    # Only commands the chosen objects depend on
+    if objects:
+        keys = [("objects", name) for name in objects]
+        commandFilter = lambda commands: logSlicer.sliceCommands(commands, 
+                                                                 keys)
+
+    # Concatenate committed segments and pending commands
+    if read is None:
+        read = commandLog.fileReader(filepath)
+    source = commandLog.buildSource(read, filename, batch=True, 
+                                    commandFilter=commandFilter)
+
+    spec = util.spec_from_loader("regen", loader=None)
     regen = util.module_from_spec(spec)
-    
-    spec.loader.exec_module(regen)
+    regen.__file__ = os.path.join(filepath, f"{filename}.py")
+
+    # Helpers called by commands, reading files from the same source
+    replayHelpers.setup(read)
+    regen.blendit = replayHelpers
+
+    exec(compile(source, regen.__file__, "exec"), regen.__dict__)
 
     return regen
 
+def interpretRegen(filepath, filename, read=None):
+    """
+    Returns a LogInterpreter replaying the project log command by command
+    read: reader of project files, defaults to memory-mapping the working
+    directory
+    """
+
+    if read is None:
+        read = commandLog.fileReader(filepath)
+        buffers = logInterpreter.mapLog(filepath, filename)
+    else:
+        buffers = logInterpreter.readLog(read, filename)
+
+    replayHelpers.setup(read)
+    namespace = {"bpy": bpy, "blendit": replayHelpers}
+    return logInterpreter.LogInterpreter(buffers, namespace, sync=True)
+
+
 def register():
     bpy.utils.register_class(BlenditOpenProject)
 
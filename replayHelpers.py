@@ -0,0 +1,263 @@
+import os
+import sys
+import tempfile
+import importlib
+from contextlib import contextmanager
+
+import bpy
+from bpy.app import handlers
+import numpy as np
+
+# Local imports implemented to support Blender refreshes
+modulesNames = ("commandLog", "meshSnapshots")
+for module in modulesNames:
+    if module in sys.modules:
+        importlib.reload(sys.modules[module])
+    else:
+        parent = ".".join(__name__.split(".")[:-1])
+        globals()[module] = importlib.import_module(f"{parent}.{module}")
+
+
+"""
+    Helpers available to the command log as blendit.<name>(...)
+"""
+# Reader of project files the log is replayed from
+projectReader = None
+
+# Object names selected as recorded by the log, None until a keyframe
+selection = None
+
+
+def setup(read):
+    """Sets reader of files referenced by replayed commands"""
+
+    global projectReader, selection
+    projectReader = read
+    selection = None
+
+
+def restoreMesh(name, relpath):
+    """Replaces mesh of object name with snapshot stored at relpath"""
+
+    obj = bpy.data.objects[name]
+    arrays = meshSnapshots.loadSnapshot(projectReader, relpath)
+    meshSnapshots.setArrays(obj.data, arrays)
+
+
+def appendObjects(path, names, collectionName):
+    """
+    Appends objects with names from the .blend file at path into a new
+    collection, returns the appended objects
+    """
+
+    with bpy.data.libraries.load(path) as (dataFrom, dataTo):
+        dataTo.objects = [name for name in names if name in dataFrom.objects]
+
+    collection = bpy.data.collections.new(collectionName)
+    bpy.context.scene.collection.children.link(collection)
+    objects = [obj for obj in dataTo.objects if obj is not None]
+    for obj in objects:
+        collection.objects.link(obj)
+    return objects
+
+
+def appendSlice(relpath, names, collectionName):
+    """Appends objects from the replayed slice stored at relpath"""
+
+    data = projectReader(relpath, binary=True)
+    if data is None:
+        raise FileNotFoundError(relpath)
+
+    # Slices may be read from a commit, load them from a temporary file
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "slice.blend")
+        with open(path, "wb") as file:
+            file.write(data)
+        appendObjects(path, names, collectionName)
+
+
+def setObjectProperties(prop, values):
+    """
+    Assigns prop of many objects with one foreach_set
+    values: {object name: value}
+    """
+
+    objects = bpy.data.objects
+    if prop in commandLog.FLAG_PROPERTIES:
+        components, dtype = 1, bool
+    else:
+        components, dtype = 3, np.float32
+
+    array = np.empty(len(objects) * components, dtype=dtype)
+    objects.foreach_get(prop, array)
+    array = array.reshape(len(objects), components)
+
+    touched = []
+    for name, value in values.items():
+        index = objects.find(name)
+        if index == -1:
+            raise KeyError(f"bpy_prop_collection[key]: key \"{name}\" not found")
+        array[index] = value
+        touched.append(objects[index])
+
+    objects.foreach_set(prop, array.ravel())
+
+    # foreach_set skips property update callbacks
+    for obj in touched:
+        obj.update_tag(refresh={'OBJECT'})
+
+
+def applySelection():
+    """Selects exactly the recorded selection, touching only differences"""
+
+    objects = bpy.context.view_layer.objects
+    current = set(objects.selected.keys())
+
+    for name in current - selection:
+        objects[name].select_set(False)
+    for name in selection - current:
+        obj = objects.get(name)
+        # Objects left out of a sliced replay are skipped
+        if obj is not None:
+            obj.select_set(True)
+
+
+def setSelection(names):
+    """Selection keyframe, selects only objects names"""
+
+    global selection
+    selection = set(names)
+    applySelection()
+
+
+def selectDelta(added, removed):
+    """Adds and removes names from the recorded selection"""
+
+    global selection
+    if selection is None:
+        selection = set(bpy.context.view_layer.objects.selected.keys())
+    selection.difference_update(removed)
+    selection.update(added)
+    applySelection()
+
+
+class ReplayStats:
+    """
+    Counts of depsgraph evaluations during a bulk replay
+    A normal replay evaluates after every finished operator, avoided is
+    the number of those left to sync points.
+    """
+
+    __slots__ = ("operators", "synced", "evaluations")
+
+    def __init__(self):
+        self.operators = 0
+        self.synced = 0
+        self.evaluations = 0
+
+    @property
+    def avoided(self):
+        return max(0, self.operators - self.evaluations)
+
+    def __str__(self):
+        return (f"{self.evaluations} depsgraph evaluations for "
+                f"{self.operators} operators, {self.avoided} avoided, "
+                f"{self.synced} syncs")
+
+
+# Stats and original view layer update of the running bulk replay
+replayStats = None
+viewLayerUpdate = None
+
+PACKAGE = ".".join(__name__.split(".")[:-1])
+
+
+def getOperatorClass():
+    """Returns class running bpy.ops calls, None if it cannot be deferred"""
+
+    opsModule = sys.modules.get("bpy.ops")
+    operatorClass = getattr(opsModule, "_BPyOpsSubModOp", None)
+    if not hasattr(operatorClass, "_view_layer_update"):
+        return None
+    return operatorClass
+
+
+def deferredViewLayerUpdate(context):
+    """
+    Replaces the update bpy.ops runs before every operator and after every
+    finished one, only counting the latter
+    """
+
+    # Only set in the calling frame once the operator ran
+    if "ret" in sys._getframe(1).f_locals:
+        replayStats.operators += 1
+
+
+def countEvaluation(scene, depsgraph):
+    replayStats.evaluations += 1
+
+
+def isBlenditHandler(handler):
+    return getattr(handler, "__module__", "").startswith(f"{PACKAGE}.")
+
+
+def sync():
+    """Evaluates changes deferred since the last sync"""
+
+    if viewLayerUpdate is None:
+        if bpy.context.view_layer:
+            bpy.context.view_layer.update()
+        return
+    replayStats.synced += 1
+    viewLayerUpdate(bpy.context)
+
+
+@contextmanager
+def bulkReplay():
+    """
+    Context for replaying a whole log at once
+    Turns off undo, defers the view layer update bpy.ops runs around every
+    operator to blendit.sync() calls and the end of the replay, and keeps
+    Blendit's depsgraph handlers from capturing intermediate states.
+    Nothing is drawn while the replay holds the main thread, view changes
+    are made instant instead of animating over many redraws and every area
+    is redrawn once at the end. Yields ReplayStats.
+    """
+
+    global replayStats, viewLayerUpdate
+
+    replayStats = ReplayStats()
+    preferences = bpy.context.preferences
+    useGlobalUndo = preferences.edit.use_global_undo
+    smoothView = preferences.view.smooth_view
+    preferences.edit.use_global_undo = False
+    preferences.view.smooth_view = 0
+
+    ownHandlers = [handler for handler in handlers.depsgraph_update_post
+                   if isBlenditHandler(handler)]
+    for handler in ownHandlers:
+        handlers.depsgraph_update_post.remove(handler)
+    handlers.depsgraph_update_post.append(countEvaluation)
+
+    # Falls back to updating after every operator
+    operatorClass = getOperatorClass()
+    if operatorClass is not None:
+        viewLayerUpdate = operatorClass._view_layer_update
+        operatorClass._view_layer_update = staticmethod(deferredViewLayerUpdate)
+
+    try:
+        yield replayStats
+        sync()
+    finally:
+        if operatorClass is not None:
+            operatorClass._view_layer_update = staticmethod(viewLayerUpdate)
+        viewLayerUpdate = None
+
+        handlers.depsgraph_update_post.remove(countEvaluation)
+        handlers.depsgraph_update_post.extend(ownHandlers)
+        preferences.edit.use_global_undo = useGlobalUndo
+        preferences.view.smooth_view = smoothView
+
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                area.tag_redraw()
@@ -1,5 +1,17 @@
+import sys
+import importlib
+
 import bpy
 
+# Local imports implemented to support Blender refreshes
+modulesNames = ("commandLog",)
+for module in modulesNames:
+    if module in sys.modules:
+        importlib.reload(sys.modules[module])
+    else:
+        parent = ".".join(__name__.split(".")[:-1])
+        globals()[module] = importlib.import_module(f"{parent}.{module}")
+
 
 def getReports():
     """Returns a list of reports as seen in the Info area"""
@@ -39,10 +51,14 @@ def ignoreReport(report):
     return False
 
 
-def getCommands():
-    """Extract executable commands from reports"""
+def getCommands(captured=()):
+    """
+    Extract executable commands from reports
+    captured: (operator reports before them, commands) captured outside of
+    reports, put among the reports in that order
+    """
 
-    reports = getReports()
+    reports = commandLog.interleaveCommands(getReports(), captured)
     commands = []
     for i in range(len(reports)):
         report = reports[i]
@@ -65,6 +81,24 @@ def getCommands():
     return commands
 
 
+def getLastOperator():
+    """Returns pointer of the last registered operator, 0 if none"""
+
+    operators = bpy.context.window_manager.operators
+    return operators[-1].as_pointer() if operators else 0
+
+
+def countOperatorsSince(pointer):
+    """Returns number of operators registered after the one at pointer"""
+
+    count = 0
+    for operator in reversed(bpy.context.window_manager.operators):
+        if operator.as_pointer() == pointer:
+            break
+        count += 1
+    return count
+
+
 def clearReports():
     """Clears reports seen in the Info area"""
 
@@ -81,4 +115,39 @@ def clearReports():
         bpy.ops.info.report_delete()
 
         # Restore context
-        area.type = currentType
\ No newline at end of file
+        area.type = currentType
+
+
+# Functions returning lists of (operator reports before them, commands)
+# captured outside of reports
+commandSources = []
+
+# Lines replacing the last edit or sculpt mode runs, oldest first
+modeRunReplacements = []
+
+# Functions called with the commands of each flush once logged
+flushHandlers = []
+
+
+def flushCommands():
+    """Appends captured commands to the project log without saving .blend"""
+
+    filepath = bpy.path.abspath("//")
+    filename = bpy.path.basename(bpy.data.filepath).split(".")[0]
+
+    captured = [item for source in commandSources for item in source()]
+    commands = getCommands(captured)
+
+    # Collapse mesh editing runs into lines restoring their result
+    if modeRunReplacements:
+        commands = commandLog.replaceModeRuns(commands, modeRunReplacements)
+        modeRunReplacements.clear()
+
+    # Keep only the last of consecutive assignments to the same property
+    commands = commandLog.coalesceCommands(commands)
+    commandLog.appendCommands(filepath, filename, commands)
+
+    for handler in flushHandlers:
+        handler(commands)
+
+    clearReports()
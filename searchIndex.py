@@ -0,0 +1,148 @@
+import os
+import re
+import json
+from bisect import bisect_left
+
+"""
+    Search index sidecar, .git/blendit/search-index
+
+    One JSON line per commit with the words of its message, author and
+    the operators it appended
+        {"commit": hex, "words": [...]}
+
+    Loaded into an inverted index, word -> commit ids, with a sorted list
+    of words so query words also match as prefixes of indexed words.
+"""
+FILENAME = "search-index"
+WORD_PATTERN = re.compile(r"[\w.]+")
+
+
+def getWords(text):
+    """
+    Returns set of lowercase words of text
+    Dotted and underscored words like object.light_add are also split.
+    """
+
+    words = set()
+    for word in WORD_PATTERN.findall(text.lower()):
+        word = word.strip(".")
+        if not word:
+            continue
+        words.add(word)
+        words.update(part for part in word.split(".") if part)
+        words.update(part for part in re.split(r"[._]", word) if part)
+    return words
+
+
+class SearchIndex:
+    """Inverted index of commit words"""
+
+    def __init__(self, path):
+        self.path = os.path.join(path, FILENAME)
+        self.postings = {}
+        self.commits = set()
+        self.words = []
+        self.load()
+
+    def load(self):
+        """Reads entries from disk, ignoring a truncated last line"""
+
+        try:
+            with open(self.path, "r") as file:
+                lines = file.readlines()
+        except FileNotFoundError:
+            return
+
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            self.add(entry["commit"], entry["words"])
+        self.words = sorted(self.postings)
+
+    def add(self, commit, words):
+        self.commits.add(commit)
+        for word in words:
+            self.postings.setdefault(word, set()).add(commit)
+
+    def __contains__(self, commit):
+        return str(commit) in self.commits
+
+    def update(self, entries):
+        """
+        Adds commits and appends them to disk
+        entries: list of (commit hex, text)
+        """
+
+        lines = []
+        for commit, text in entries:
+            if commit in self.commits:
+                continue
+            words = sorted(getWords(text))
+            self.add(commit, words)
+            lines.append(json.dumps({"commit": commit, "words": words}))
+
+        if not lines:
+            return 0
+
+        self.words = sorted(self.postings)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a") as file:
+            file.write("".join(f"{line}\n" for line in lines))
+        return len(lines)
+
+    def getPrefixMatches(self, prefix):
+        """Returns commits with a word starting with prefix"""
+
+        commits = set()
+        index = bisect_left(self.words, prefix)
+        while index < len(self.words) and self.words[index].startswith(prefix):
+            commits |= self.postings[self.words[index]]
+            index += 1
+        return commits
+
+    def search(self, query):
+        """Returns set of commit hex ids matching every word of query"""
+
+        result = None
+        for word in sorted(getWords(query), key=len, reverse=True):
+            matches = self.getPrefixMatches(word)
+            result = matches if result is None else result & matches
+            if not result:
+                return set()
+        return result if result is not None else set(self.commits)
+
+
+# Loaded indexes, keyed by path
+indexes = {}
+
+
+def load(path):
+    """Returns cached SearchIndex stored in path, reloaded if changed"""
+
+    filePath = os.path.join(path, FILENAME)
+    try:
+        size = os.path.getsize(filePath)
+    except OSError:
+        size = 0
+
+    cached = indexes.get(path)
+    if cached and cached[1] == size:
+        return cached[0]
+
+    index = SearchIndex(path)
+    indexes[path] = (index, size)
+    return index
+
+
+def update(path, entries):
+    """Adds (commit hex, text) entries to the index stored in path"""
+
+    index = load(path)
+    index.update(entries)
+
+    filePath = os.path.join(path, FILENAME)
+    indexes[path] = (index, os.path.getsize(filePath)
+                     if os.path.exists(filePath) else 0)
+    return index
@@ -1,17 +1,19 @@
 import os
 import sys
+import shutil
+import threading
 import importlib
 
 import bpy
 from bpy.types import Operator
-from bpy.props import StringProperty
+from bpy.props import BoolProperty, EnumProperty, StringProperty
 
 import pygit2 as git
 from pygit2._pygit2 import GitError
-from pygit2 import GIT_RESET_SOFT, GIT_RESET_HARD
 
 # Local imports implemented to support Blender refreshes
-modulesNames = ("gitHelpers", "openProject")
+modulesNames = ("gitHelpers", "commandLog", "openProject", "reports", 
+                "batchRegen", "thumbnails", "replayHelpers", "assetStore")
 for module in modulesNames:
     if module in sys.modules:
         importlib.reload(sys.modules[module])
@@ -20,6 +22,16 @@ for module in modulesNames:
         globals()[module] = importlib.import_module(f"{parent}.{module}")
 
 
+def flushCommands(context, filepath, filename):
+    """Flushes commands to the project log, saving .blend only if enabled"""
+
+    if context.window_manager.blendit.saveBlend:
+        # Save .blend file (Writes commands to Python file and clears reports)
+        bpy.ops.wm.save_mainfile(filepath=os.path.join(filepath, f"{filename}.blend"))
+    else:
+        reports.flushCommands()
+
+
 class BlenditNewBranch(Operator):
     """Create New Branch."""
 
@@ -36,8 +48,8 @@ class BlenditNewBranch(Operator):
         filepath = bpy.path.abspath("//")
         filename = bpy.path.basename(bpy.data.filepath).split(".")[0]
 
-        # Save .blend file (Writes commands to Python file and clears reports)
-        bpy.ops.wm.save_mainfile(filepath=os.path.join(filepath, f"{filename}.blend"))
+        # Write commands to Python file and clear reports
+        flushCommands(context, filepath, filename)
 
         # Get repo
         try:
@@ -74,8 +86,8 @@ class BlenditRevertToCommit(Operator):
         filepath = bpy.path.abspath("//")
         filename = bpy.path.basename(bpy.data.filepath).split(".")[0]
 
-        # Save .blend file (Writes commands to Python file and clears reports)
-        bpy.ops.wm.save_mainfile(filepath=os.path.join(filepath, f"{filename}.blend"))
+        # Write commands to Python file and clear reports
+        flushCommands(context, filepath, filename)
 
         # Get repo
         try:
@@ -88,26 +100,16 @@ class BlenditRevertToCommit(Operator):
         if latestCommit.hex == revertCommit.hex:
             return {'CANCELLED'}
 
-        """
-            https://stackoverflow.com/a/1470452
-
-            A <-- B <-- C <-- D            <-- master <-- HEAD
-            
-            Revert to A
-            
-            $ git reset A --hard
-            $ git reset D --soft
-            $ git commit
-            
-            A <-- B <-- C <-- D <-- A'     <-- master <-- HEAD
-        """
-        repo.reset(revertCommit.oid, GIT_RESET_HARD)
-        repo.reset(latestCommit.oid, GIT_RESET_SOFT)
-        gitHelpers.commit(repo, f"Reverted to commit: {revertCommit.hex[:7]}")
+        # Commit target tree on top of HEAD
+        gitHelpers.revert(repo, revertCommit, 
+                          f"Reverted to commit: {revertCommit.hex[:7]}")
+        gitHelpers.restoreAssets(repo)
 
         # Regen file
-        openProject.regenFile(filepath, filename)
+        stats = openProject.regenFile(filepath, filename)
 
+        self.report({'INFO'}, f"Regenerated, {stats.avoided} depsgraph "
+                              f"evaluations avoided.")
         return {'FINISHED'}
 
 
@@ -123,12 +125,18 @@ class BlenditCommit(Operator):
         description="A short description of the changes made"
     )
 
+    stageAll: BoolProperty(
+        name="Stage All",
+        default=False,
+        description="Commit all files in the project, not only Blendit's"
+    )
+
     def invoke(self, context, event):
         filepath = bpy.path.abspath("//")
         filename = bpy.path.basename(bpy.data.filepath).split(".")[0]
 
-        # Save .blend file (Writes commands to Python file and clears reports)
-        bpy.ops.wm.save_mainfile(filepath=os.path.join(filepath, f"{filename}.blend"))
+        # Write commands to Python file and clear reports
+        flushCommands(context, filepath, filename)
 
         # Commit changes
         try:
@@ -136,7 +144,10 @@ class BlenditCommit(Operator):
         except GitError:
             return {'CANCELLED'}
 
-        gitHelpers.commit(repo, self.message)
+        oid = gitHelpers.commit(repo, self.message, self.stageAll)
+
+        # Thumbnail of the viewport, shown in the list of commits
+        thumbnails.captureViewport(thumbnails.getThumbnailPath(repo, oid))
 
         # Clear commit message property
         self.message = ""
@@ -146,7 +157,233 @@ class BlenditCommit(Operator):
         return {'FINISHED'}
 
 
-classes = (BlenditNewBranch, BlenditRevertToCommit, BlenditCommit)
+class BlenditBlame(Operator):
+    """Show the Commit that added each Command"""
+
+    bl_label = __doc__
+    bl_idname = "blendit.blame"
+
+    def invoke(self, context, event):
+        filepath = bpy.path.abspath("//")
+        filename = bpy.path.basename(bpy.data.filepath).split(".")[0]
+
+        # Write commands to Python file and clear reports
+        flushCommands(context, filepath, filename)
+
+        try:
+            repo = git.Repository(filepath)
+        except GitError:
+            return {'CANCELLED'}
+
+        # Blame is written to a text datablock, seen in the Text Editor
+        name = f"{filename} blame"
+        text = bpy.data.texts.get(name) or bpy.data.texts.new(name)
+        text.from_string(gitHelpers.getBlameStr(gitHelpers.blame(repo)))
+
+        self.report({'INFO'}, f"Blame written to text \"{name}\".")
+        return {'FINISHED'}
+
+
+class BlenditSetDiffBase(Operator):
+    """Compare other Commits with this Commit"""
+
+    bl_label = __doc__
+    bl_idname = "blendit.set_diff_base"
+
+    id: StringProperty(
+        name="",
+        description="ID of commit to compare with"
+    )
+
+    def execute(self, context):
+        context.window_manager.blendit.diffBase = self.id
+        return {'FINISHED'}
+
+
+# (old, new, list of (sign, command), rewritten) of the last diff shown
+lastDiff = None
+
+
+class BlenditDiffCommits(Operator):
+    """Show Commands added or removed between two Commits"""
+
+    bl_label = __doc__
+    bl_idname = "blendit.diff_commits"
+
+    old: StringProperty(
+        name="",
+        description="ID of commit to compare from"
+    )
+
+    new: StringProperty(
+        name="",
+        description="ID of commit to compare to"
+    )
+
+    def execute(self, context):
+        global lastDiff
+
+        filepath = bpy.path.abspath("//")
+        filename = bpy.path.basename(bpy.data.filepath).split(".")[0]
+
+        try:
+            repo = git.Repository(filepath)
+        except GitError:
+            return {'CANCELLED'}
+
+        lines, rewritten = gitHelpers.diffCommits(repo, self.old, self.new)
+        lastDiff = (self.old, self.new, lines, rewritten)
+
+        # Full diff is written to a text datablock, seen in the Text Editor
+        name = f"{filename} diff"
+        text = bpy.data.texts.get(name) or bpy.data.texts.new(name)
+        text.from_string(f"--- {self.old}\n+++ {self.new}\n" + 
+                         "".join(f"{sign} {command}\n" 
+                                 for sign, command in lines))
+
+        added = sum(1 for sign, _ in lines if sign == "+")
+        self.report({'INFO'}, f"{added} commands added, "
+                              f"{len(lines) - added} removed.")
+        return {'FINISHED'}
+
+
+# Replayed slices appended to the project, kept in the asset store
+SLICES_DIR = "slices"
+
+# Seconds between polls of a running slice replay
+POLL_INTERVAL = 0.5
+
+# Running slice replay, (thread, result, operator settings)
+sliceJob = None
+
+
+def getSlicePath(filepath, oid):
+    """Returns relative path of the next slice of commit oid"""
+
+    directory = os.path.join(filepath, assetStore.ASSETS_DIR, SLICES_DIR)
+    os.makedirs(directory, exist_ok=True)
+
+    number = 0
+    while os.path.exists(os.path.join(directory, 
+                                      f"{oid[:7]}-{number:03d}.blend")):
+        number += 1
+    return f"{assetStore.ASSETS_DIR}/{SLICES_DIR}/{oid[:7]}-{number:03d}.blend"
+
+
+def runSlice(filepath, oid, output, names, result):
+    """Replays a slice in a headless Blender, run on a background thread"""
+
+    result.update(batchRegen.runJob(filepath, oid, output, 
+                                    ["--objects", *names]))
+
+
+def pollSlice():
+    """Opens or appends a finished slice replay, returns None once done"""
+
+    global sliceJob
+    thread, result, (filepath, oid, target, names) = sliceJob
+    if thread.is_alive():
+        return POLL_INTERVAL
+    sliceJob = None
+
+    if result["error"]:
+        print(f"Blendit replay failed: {result['error']}")
+        return None
+
+    output = result["output"]
+    if bpy.path.abspath("//") != filepath:
+        print("Blendit replay finished after the project was closed.")
+        return None
+    if target == 'NEW':
+        bpy.ops.wm.open_mainfile(filepath=output)
+        return None
+
+    # Keep the slice with the project, regenerating replays the append
+    filename = bpy.path.basename(bpy.data.filepath).split(".")[0]
+    relpath = getSlicePath(filepath, oid)
+    shutil.copyfile(output, os.path.join(filepath, relpath))
+
+    reports.flushCommands()
+    collectionName = f"{oid[:7]} slice"
+    objects = replayHelpers.appendObjects(output, names, collectionName)
+    commandLog.appendCommands(filepath, filename, [
+        f"blendit.appendSlice({relpath!r}, {names!r}, {collectionName!r})"])
+
+    print(f"Blendit replayed {len(objects)} objects in {result['time']:.2f}s")
+    return None
+
+
+class BlenditReplaySlice(Operator):
+    """Rebuild selected Objects as of this Commit, replaying only the Commands they depend on"""
+
+    bl_label = "Replay Selected from Commit"
+    bl_idname = "blendit.replay_slice"
+
+    id: StringProperty(
+        name="",
+        description="ID of commit to replay from"
+    )
+
+    target: EnumProperty(
+        name="Into",
+        items=[
+            ('CURRENT', "Current File", "Append the objects to a new "
+                                        "collection of the current file"),
+            ('NEW', "New File", "Open a file containing only the objects"),
+        ],
+        default='CURRENT'
+    )
+
+    def execute(self, context):
+        global sliceJob
+
+        filepath = bpy.path.abspath("//")
+
+        if sliceJob is not None:
+            self.report({'WARNING'}, "A replay is already running.")
+            return {'CANCELLED'}
+
+        try:
+            repo = git.Repository(filepath)
+        except GitError:
+            return {'CANCELLED'}
+
+        # Selected objects, else every object of the active collection
+        names = [obj.name for obj in context.selected_objects]
+        if not names and context.collection:
+            names = [obj.name for obj in context.collection.all_objects]
+        if not names:
+            self.report({'ERROR_INVALID_INPUT'}, "No objects selected.")
+            return {'CANCELLED'}
+
+        # Replay the slice in a headless Blender process. A new file is
+        # written next to the project, outside the repository
+        if self.target == 'NEW':
+            project = os.path.normpath(filepath)
+            output = os.path.join(os.path.dirname(project), 
+                                  f"{os.path.basename(project)}-"
+                                  f"{self.id[:7]}-slice.blend")
+        else:
+            output = os.path.join(gitHelpers.getBlenditPath(repo), "slices", 
+                                  f"{self.id[:7]}.blend")
+
+        # The process runs on a thread, a timer picks up its result
+        result = {}
+        thread = threading.Thread(
+            target=runSlice, daemon=True,
+            args=(os.path.abspath(filepath), self.id, output, names, result))
+        sliceJob = (thread, result, (filepath, self.id, self.target, names))
+        thread.start()
+        bpy.app.timers.register(pollSlice, first_interval=POLL_INTERVAL)
+
+        self.report({'INFO'}, f"Replaying {len(names)} objects "
+                              f"in the background.")
+        return {'FINISHED'}
+
+
+classes = (BlenditNewBranch, BlenditRevertToCommit, BlenditCommit, 
+           BlenditBlame, BlenditSetDiffBase, BlenditDiffCommits, 
+           BlenditReplaySlice)
 
 def register():
     for cls in classes:
@@ -1,8 +1,17 @@
-import os
-import functools
+import sys
+import importlib
 
 import bpy
 
+# Local imports implemented to support Blender refreshes
+modulesNames = ("commandLog", "reports")
+for module in modulesNames:
+    if module in sys.modules:
+        importlib.reload(sys.modules[module])
+    else:
+        parent = ".".join(__name__.split(".")[:-1])
+        globals()[module] = importlib.import_module(f"{parent}.{module}")
+
 
 class BlenditSubscriber:
     """Subscriber to different event publishers"""
@@ -14,47 +23,411 @@ class BlenditSubscriber:
 blenditSubscriber = BlenditSubscriber()
 
 
-def writeToFile(lines):
-    """Writes list of lines to associated python file"""
+# Seconds notifications are coalesced for before lines are written
+FRAME_WINDOW = 0.1
+
+"""
+    Watched properties
+
+    Only properties whose changes are not reported in the Info area are
+    watched by default, like Outliner toggles and presets. Others would be
+    logged twice. The set is a preference, as "Type.property" names.
+"""
+DEFAULT_WATCHED = ("Object.hide_viewport Object.hide_render "
+                   "Object.hide_select Modifier.show_viewport "
+                   "Modifier.show_render RenderSettings.resolution_x "
+                   "RenderSettings.resolution_y "
+                   "RenderSettings.resolution_percentage "
+                   "RenderSettings.fps RenderSettings.fps_base")
+
+
+def formatValue(value):
+    """Returns Python expression of a property value"""
+
+    if isinstance(value, bpy.types.ID):
+        # e.g. bpy.data.materials['Material']
+        return repr(value)
+    if isinstance(value, set):
+        return repr(value) if value else "set()"
+    if hasattr(value, "__len__") and not isinstance(value, str):
+        items = [formatValue(item) for item in value]
+        return f"({', '.join(items)}{',' if len(items) == 1 else ''})"
+    return repr(value)
+
+
+class PropertyWatcher:
+    """
+    Captures assignments for watched properties that changed
+    Each owner ID is subscribed to on its own, so a notification only
+    diffs the items of the owners it names. Changes notified only through
+    the type, like those of new items, diff the items of every owner.
+    """
+
+    def __init__(self, collection, getItems, properties):
+        """
+        collection: name of the bpy.data collection of the owner IDs
+        getItems: returns iterable of (path, item) of an owner ID
+        properties: names of the properties to watch
+        """
+
+        self.collection = collection
+        self.getItems = getItems
+        self.properties = properties
+
+        # (owner session_uid, item pointer) -> {property: value}
+        self.snapshot = {}
+
+        # session_uids of owners, (owner, item pointer) of items subscribed
+        self.owners = set()
+        self.subscribed = set()
+
+    def getValues(self, item):
+        values = {}
+        for name in self.properties:
+            try:
+                values[name] = formatValue(getattr(item, name))
+            except AttributeError:
+                continue
+        return values
+
+    def getKeys(self, item):
+        """Returns msgbus keys of the watched properties of an item"""
+
+        return [item.path_resolve(name, False) for name in self.properties]
+
+    def subscribe(self, name, ids):
+        """Subscribes to the items of owner IDs not subscribed to yet"""
+
+        for id in ids:
+            owner = id.session_uid
+            for _, item in self.getItems(id):
+                if (owner, item.as_pointer()) in self.subscribed:
+                    continue
+                self.subscribed.add((owner, item.as_pointer()))
+
+                for key in self.getKeys(item):
+                    bpy.msgbus.subscribe_rna(
+                        key=key,
+                        owner=blenditSubscriber,
+                        args=((name,), owner),
+                        notify=notify,
+                        options={'PERSISTENT'}
+                    )
+
+    def reset(self):
+        """Takes a snapshot without capturing anything"""
+
+        self.snapshot.clear()
+        self.subscribed.clear()
+        self.__call__()
+
+    def __call__(self, owners=None):
+        """
+        Returns assignments of changed properties and the owner IDs diffed
+        owners: session_uids of owners notified, None to diff every owner
+        """
+
+        ids = getattr(bpy.data, self.collection)
+        if owners is None or len(ids) != len(self.owners):
+            # New or deleted owners, diff all of them
+            ids = list(ids)
+            self.owners = {id.session_uid for id in ids}
+            self.snapshot = {key: values for key, values in self.snapshot.items()
+                             if key[0] in self.owners}
+        else:
+            ids = [id for id in ids if id.session_uid in owners]
+
+        lines = []
+        for id in ids:
+            for path, item in self.getItems(id):
+                key = (id.session_uid, item.as_pointer())
+                values = self.getValues(item)
+                previous = self.snapshot.get(key)
+                self.snapshot[key] = values
+
+                # New items are created by operators, only track them
+                if previous is None:
+                    continue
+
+                for name, value in values.items():
+                    if previous.get(name) != value:
+                        lines.append(f"{path}.{name} = {value}")
+
+        return lines, ids
+
+
+def getObjects(obj):
+    yield repr(obj), obj
+
+
+def getModifiers(obj):
+    for modifier in obj.modifiers:
+        yield f"{obj!r}.modifiers[{modifier.name!r}]", modifier
+
+
+def getMaterials(material):
+    yield repr(material), material
+
+
+def getScenes(scene):
+    yield repr(scene), scene
+
+
+def getRenderSettings(scene):
+    yield f"{scene!r}.render", scene.render
+
+
+# Selection deltas written between full selection keyframes
+KEYFRAME_INTERVAL = 100
+
+
+class SelectionTracker:
+    """
+    Captures selection changes against the last written selection
+    Writes only the names added and removed, with a full keyframe every
+    KEYFRAME_INTERVAL changes or when the delta outgrows it. Replay keeps
+    the recorded selection, so operators changing it in between are fine.
+    """
+
+    def __init__(self):
+        self.selected = None
+        self.deltas = 0
+
+    def reset(self):
+        """Next capture writes a keyframe"""
+
+        self.selected = None
+        self.deltas = 0
 
-    filepath = bpy.path.abspath("//")
-    filename = bpy.path.basename(bpy.data.filepath).split(".")[0]
+    def __call__(self):
+        objects = bpy.context.view_layer.objects
+        selected = set(objects.selected.keys())
+        lines = []
 
-    # Save .blend file (Writes commands to Python file and clears reports)
-    bpy.ops.wm.save_mainfile(filepath=os.path.join(filepath, f"{filename}.blend"))
+        if self.selected is None or self.deltas >= KEYFRAME_INTERVAL:
+            lines.append(f"blendit.setSelection({sorted(selected)})")
+            self.deltas = 0
+        else:
+            added = selected - self.selected
+            removed = self.selected - selected
+            if len(added) + len(removed) > len(selected):
+                lines.append(f"blendit.setSelection({sorted(selected)})")
+                self.deltas = 0
+            elif added or removed:
+                lines.append(f"blendit.selectDelta({sorted(added)}, "
+                             f"{sorted(removed)})")
+                self.deltas += 1
 
-    # Append lines to Python file
-    with open(os.path.join(filepath, f"{filename}.py"), "a") as file:
-        for line in lines:
-            file.write(f"\t{line}\n")
+        self.selected = selected
+        lines.append(f"bpy.context.view_layer.objects.active = "
+                     f"{objects.active!r}")
+        return lines
 
 
-def activeObjectCallback():
-    """Called when active object changes"""
+"""
+    Capture registry
+    name -> (msgbus keys, capture returning lines for the current state)
+    PropertyWatcher captures also subscribe to each of their owners
+"""
+captures = {}
 
-    objectsToSelect  = bpy.context.view_layer.objects.selected.keys()
-    objectToActivate = bpy.context.view_layer.objects.active.__repr__()
-    lines = (
-        "[obj.select_set(False) for obj in bpy.context.view_layer.objects.selected.values()]",
-        f"[bpy.context.view_layer.objects.get(obj).select_set(True) for obj in {objectsToSelect}]",
-        f"bpy.context.view_layer.objects.active = {objectToActivate}",
-    )
-    bpy.app.timers.register(functools.partial(writeToFile, lines))
+# Names of captures notified within the current frame window, in order,
+# with session_uids of the owners notified, None for type notifications,
+# and operators registered before the first notification
+pendingCaptures = {}
+pendingPositions = {}
+
+# (operators registered before, lines) of captures already run
+captured = []
+
+# Operators registered since the last flush and pointer of the last one
+operatorCount = 0
+lastOperator = 0
+
+# Names of the watched properties, None until set
+watched = None
+
+# Type name -> (bpy.data collection of owners, function returning items)
+WATCHABLE = {
+    "Object": ("objects", getObjects),
+    "Modifier": ("objects", getModifiers),
+    "Material": ("materials", getMaterials),
+    "Scene": ("scenes", getScenes),
+    "RenderSettings": ("scenes", getRenderSettings),
+}
+
+
+def registerCapture(name, keys, capture):
+    """Adds msgbus keys to subscribe to and their capture function"""
+
+    captures[name] = (keys, capture)
+
+
+def unregisterCapture(name):
+    """Removes a capture, takes effect on next subscribe"""
+
+    captures.pop(name, None)
+
+
+def parseWatched(text):
+    """
+    Returns {type name: property names} of "Type.property" names in text,
+    and the names that are not watchable properties
+    """
+
+    watched = {}
+    invalid = []
+    for name in text.replace(",", " ").split():
+        typeName, _, prop = name.partition(".")
+        rnaType = getattr(bpy.types, typeName, None)
+        if (typeName not in WATCHABLE or rnaType is None or 
+                prop not in rnaType.bl_rna.properties):
+            invalid.append(name)
+        elif prop not in watched.setdefault(typeName, []):
+            watched[typeName].append(prop)
+    return watched, invalid
+
+
+def setWatched(text):
+    """
+    Registers a PropertyWatcher per type of the properties in text, takes
+    effect on next subscribe. Returns names that are not watchable
+    """
+
+    global watched
+    watched = text
+
+    types, invalid = parseWatched(text)
+    for typeName, (collection, getItems) in WATCHABLE.items():
+        if typeName not in types:
+            unregisterCapture(typeName)
+            continue
+        properties = tuple(types[typeName])
+        rnaType = getattr(bpy.types, typeName)
+        registerCapture(typeName, [(rnaType, prop) for prop in properties],
+                        PropertyWatcher(collection, getItems, properties))
+    return invalid
+
+
+def registerDefaultCaptures():
+    registerCapture("activeObject", [(bpy.types.LayerObjects, "active")],
+                    SelectionTracker())
+    if watched is None:
+        setWatched(DEFAULT_WATCHED)
+
+
+def checkOperators():
+    """Counts operators registered since the last check"""
+
+    global operatorCount, lastOperator
+    operatorCount += reports.countOperatorsSince(lastOperator)
+    lastOperator = reports.getLastOperator()
+
+
+def notify(names, owner=None):
+    """Called on msgbus notification, only queues the captures"""
+
+    checkOperators()
+    for name in names:
+        pendingCaptures.setdefault(name, set()).add(owner)
+        pendingPositions.setdefault(name, operatorCount)
+    if not bpy.app.timers.is_registered(flushCaptures):
+        bpy.app.timers.register(flushCaptures, first_interval=FRAME_WINDOW)
+
+
+def runCaptures():
+    """Runs each notified capture once, keeping lines with their position"""
+
+    for name, owners in pendingCaptures.items():
+        if name not in captures:
+            continue
+        capture = captures[name][1]
+        if not isinstance(capture, PropertyWatcher):
+            lines = capture()
+        else:
+            # Type notifications alone come from items not subscribed to yet
+            owners.discard(None)
+            lines, ids = capture(owners or None)
+            capture.subscribe(name, ids)
+
+        # Drop duplicates and superseded assignments
+        lines = commandLog.coalesceCommands(list(dict.fromkeys(lines)))
+        if lines:
+            captured.append((pendingPositions[name], lines))
+    pendingCaptures.clear()
+    pendingPositions.clear()
+
+
+def popCommands():
+    """
+    Returns (operators registered before, lines) of captures since the last
+    flush, put among the reports by reports.flushCommands
+    """
+
+    global operatorCount, lastOperator
+
+    runCaptures()
+    commands = list(captured)
+    captured.clear()
+    operatorCount = 0
+    lastOperator = reports.getLastOperator()
+    return commands
+
+
+def flushCaptures():
+    """Logs lines of notified captures among the reports made around them"""
+
+    runCaptures()
+    if captured:
+        reports.flushCommands()
 
 
 def subscribe():
     """Subscribes to different event publishers"""
 
-    # Active Object
-    bpy.msgbus.subscribe_rna(
-        key=(bpy.types.LayerObjects, "active"),
-        owner=blenditSubscriber,
-        args=(),
-        notify=activeObjectCallback,
-        options={'PERSISTENT'}
-    )
+    global operatorCount, lastOperator
+
+    if "activeObject" not in captures:
+        registerDefaultCaptures()
+
+    # Subscriptions left from before would notify twice per change
+    bpy.msgbus.clear_by_owner(blenditSubscriber)
+    pendingCaptures.clear()
+    pendingPositions.clear()
+    captured.clear()
+    operatorCount = 0
+    lastOperator = reports.getLastOperator()
+    if popCommands not in reports.commandSources:
+        reports.commandSources.append(popCommands)
+
+    # Each key is subscribed to once, notifying every capture using it
+    keyCaptures = {}
+    for name, (keys, capture) in captures.items():
+        # Start watching from current state
+        if hasattr(capture, "reset"):
+            capture.reset()
+        if isinstance(capture, PropertyWatcher):
+            capture.subscribe(name, getattr(bpy.data, capture.collection))
+
+        for key in keys:
+            if name not in keyCaptures.setdefault(key, []):
+                keyCaptures[key].append(name)
+
+    for key, names in keyCaptures.items():
+        bpy.msgbus.subscribe_rna(
+            key=key,
+            owner=blenditSubscriber,
+            args=(tuple(names),),
+            notify=notify,
+            options={'PERSISTENT'}
+        )
 
 
 def unsubscribe():
     """Unsubscribes to all event publishers"""
     bpy.msgbus.clear_by_owner(blenditSubscriber)
+    pendingCaptures.clear()
+    pendingPositions.clear()
+    captured.clear()
+    if popCommands in reports.commandSources:
+        reports.commandSources.remove(popCommands)
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+# Blender-free modules are imported by name, like blenditCli does
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture
+def project(tmp_path):
+    """Returns function making a committed project from command batches"""
+
+    git = pytest.importorskip("pygit2")
+    import commandLog
+    import gitHelpers
+
+    def make(batches, name="project"):
+        path = tmp_path / name
+        path.mkdir()
+        repo = git.init_repository(str(path))
+        repo.config["User.name"] = "Tester"
+        repo.config["User.email"] = "tester@example.com"
+        with open(path / f"{name}.py", "w") as file:
+            file.write(commandLog.LOG_HEADER)
+
+        commits = []
+        for number, commands in enumerate(batches):
+            commandLog.appendCommands(str(path), name, commands)
+            commits.append(gitHelpers.commit(repo, f"Commit {number}"))
+        return repo, commits
+
+    return make
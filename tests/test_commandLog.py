@@ -0,0 +1,228 @@
+import os
+
+import commandLog
+
+
+def test_coalesceKeepsLastOfRepeatedAssignments():
+    commands = [
+        "bpy.context.object.location = (0.1, 0, 0)",
+        "bpy.context.object.location = (0.2, 0, 0)",
+        "bpy.context.object.location = (0.3, 0, 0)",
+    ]
+    assert commandLog.coalesceCommands(commands) == commands[-1:]
+
+
+def test_coalesceKeepsAssignmentsReadByNextValue():
+    commands = [
+        "bpy.context.object.location = (1, 0, 0)",
+        "bpy.context.object.location = bpy.context.object.location * 2",
+    ]
+    assert commandLog.coalesceCommands(commands) == commands
+
+
+def test_coalesceKeepsAssignmentsSeparatedByOtherCommands():
+    commands = [
+        "bpy.context.object.location = (1, 0, 0)",
+        "bpy.ops.object.duplicate()",
+        "bpy.context.object.location = (2, 0, 0)",
+    ]
+    assert commandLog.coalesceCommands(commands) == commands
+
+
+def test_coalesceValueReplacesItems():
+    commands = [
+        "bpy.context.object.location[0] = 1.0",
+        "bpy.context.object.location = (2, 0, 0)",
+    ]
+    assert commandLog.coalesceCommands(commands) == commands[-1:]
+
+
+def test_coalesceKeepsEditsOfPreviouslyPointedDatablock():
+    commands = [
+        "bpy.context.object.active_material.roughness = 0.2",
+        "bpy.context.object.active_material = bpy.data.materials['B']",
+    ]
+    assert commandLog.coalesceCommands(commands) == commands
+
+
+def test_coalesceKeepsEditsBeforeClearingPointer():
+    commands = [
+        "bpy.context.object.active_material.roughness = 0.2",
+        "bpy.context.object.active_material = None",
+    ]
+    assert commandLog.coalesceCommands(commands) == commands
+
+
+RESTORE = ["blendit.restoreMesh('Cube', 'meshes/Cube/000000.npz')"]
+
+
+def test_replaceModeRunsReplacesMeshEditRun():
+    commands = [
+        "bpy.ops.mesh.primitive_cube_add()",
+        "bpy.ops.object.editmode_toggle()",
+        "bpy.ops.mesh.subdivide()",
+        "bpy.ops.mesh.mark_seam(clear=False)",
+        "bpy.ops.object.editmode_toggle()",
+    ]
+    assert (commandLog.replaceModeRuns(commands, [RESTORE]) ==
+            commands[:1] + RESTORE)
+
+
+def test_replaceModeRunsKeepsRunsDoingMore():
+    commands = [
+        "bpy.ops.object.mode_set(mode='EDIT')",
+        "bpy.ops.uv.unwrap(method='ANGLE_BASED')",
+        "bpy.ops.object.mode_set(mode='OBJECT')",
+    ]
+    assert commandLog.replaceModeRuns(commands, [RESTORE]) == commands + RESTORE
+
+
+def test_replaceModeRunsKeepsRunsChangingUnsnapshottedData():
+    commands = [
+        "bpy.ops.object.editmode_toggle()",
+        "bpy.ops.transform.edge_crease(value=1)",
+        "bpy.ops.object.editmode_toggle()",
+    ]
+    assert commandLog.replaceModeRuns(commands, [RESTORE]) == commands + RESTORE
+
+
+def test_replaceModeRunsDropsUnmatched():
+    older = ["blendit.restoreMesh('Cube', 'meshes/Cube/000001.npz')"]
+    commands = [
+        "bpy.ops.object.editmode_toggle()",
+        "bpy.ops.mesh.subdivide()",
+        "bpy.ops.object.editmode_toggle()",
+    ]
+    assert commandLog.replaceModeRuns(commands, [older, RESTORE]) == RESTORE
+
+    # Rest of a run split by an earlier flush keeps its commands
+    assert (commandLog.replaceModeRuns(commands[1:], [RESTORE]) == 
+            commands[1:])
+
+
+def test_batchLongRunsByProperty():
+    commands = [f"bpy.data.objects['Cube.{i:03d}'].location = ({i}, 0, 0)"
+                for i in range(commandLog.MIN_BATCH)]
+    commands.append("bpy.data.objects['Cube.000'].hide_render = True")
+    commands.append("bpy.ops.object.shade_smooth()")
+
+    locations = {f"Cube.{i:03d}": (float(i), 0.0, 0.0)
+                 for i in range(commandLog.MIN_BATCH)}
+    assert commandLog.batchAssignments(commands) == [
+        f"blendit.setObjectProperties('location', {locations!r})",
+        "blendit.setObjectProperties('hide_render', {'Cube.000': True})",
+        commands[-1]]
+
+
+def test_batchKeepsShortRuns():
+    commands = [f"bpy.data.objects['Cube.{i:03d}'].location = ({i}, 0, 0)"
+                for i in range(commandLog.MIN_BATCH - 1)]
+    commands.append("bpy.ops.object.shade_smooth()")
+    assert commandLog.batchAssignments(commands) == commands
+
+
+def test_batchOnlyLiteralTransformsAndFlags():
+    parse = commandLog.parseObjectAssignment
+    assert parse("bpy.data.objects['Cube'].scale = (1, 2, 3)") == (
+        "Cube", "scale", (1.0, 2.0, 3.0))
+    assert parse("bpy.data.objects[\"Cube\"].hide_select = False") == (
+        "Cube", "hide_select", False)
+    assert parse("bpy.data.objects['Cube'].location = (1, 2)") is None
+    assert parse("bpy.data.objects['Cube'].hide_viewport = 1") is None
+    assert parse("bpy.data.objects['Cube'].location = "
+                 "bpy.data.objects['Plane'].location") is None
+    assert parse("bpy.data.objects['Cube'].name = 'Box'") is None
+    assert parse("bpy.context.object.location = (1, 2, 3)") is None
+
+
+def test_syncBeforeOperatorsNotKnownToBeDeferrable():
+    commands = [
+        "bpy.ops.mesh.primitive_cube_add()",
+        "bpy.ops.object.duplicate_move()",
+        "bpy.ops.transform.rotate(value=1.0, orient_axis='Z')",
+    ]
+    assert commandLog.insertSyncPoints(commands) == [
+        commands[0], commandLog.SYNC_COMMAND, commands[1],
+        commandLog.SYNC_COMMAND, commands[2]]
+
+
+def test_syncAfterAssignmentsBeforeOtherCommands():
+    commands = [
+        "bpy.ops.mesh.primitive_cube_add()",
+        "bpy.context.object.location = (1, 0, 0)",
+        "bpy.context.object.scale = (2, 2, 2)",
+        "bpy.ops.mesh.primitive_plane_add()",
+    ]
+    assert commandLog.insertSyncPoints(commands) == [
+        *commands[:3], commandLog.SYNC_COMMAND, commands[3]]
+
+
+def test_syncBeforeReadingEvaluatedData():
+    commands = [
+        "bpy.ops.mesh.primitive_cube_add()",
+        "bpy.data.objects['Cube'].matrix_world.translation.x = 1",
+    ]
+    assert commandLog.insertSyncPoints(commands) == [
+        commands[0], commandLog.SYNC_COMMAND, commands[1]]
+
+
+def test_interleaveInCaptureOrder():
+    reports = [
+        "bpy.ops.mesh.primitive_cube_add()",
+        "bpy.ops.transform.translate(value=(1, 0, 0))",
+        "bpy.context.object.name = 'Box'",
+        "bpy.ops.object.shade_smooth()",
+    ]
+    captured = [
+        (1, ["bpy.data.objects['Cube'].hide_render = True"]),
+        (3, ["bpy.data.objects['Box'].scale = (2, 2, 2)"]),
+        (9, ["bpy.data.materials['Material'].roughness = 0.1"]),
+        (1, ["bpy.data.objects['Cube'].location = (1, 0, 0)"]),
+    ]
+    assert commandLog.interleaveCommands(reports, captured) == [
+        reports[0],
+        "bpy.data.objects['Cube'].hide_render = True",
+        "bpy.data.objects['Cube'].location = (1, 0, 0)",
+        reports[1],
+        reports[2],
+        reports[3],
+        "bpy.data.objects['Box'].scale = (2, 2, 2)",
+        "bpy.data.materials['Material'].roughness = 0.1",
+    ]
+
+
+def test_compactLogWritesFreshSegment(project):
+    move = "bpy.data.objects['Cube'].location = (1, 0, 0)"
+    repo, _ = project([["bpy.ops.mesh.primitive_cube_add()", move],
+                       ["bpy.data.objects['Cube'].location = (2, 0, 0)"]])
+    path = repo.workdir
+    read = commandLog.fileReader(path)
+    old = commandLog.readManifest(read)
+    assert old == ["segments/000000.seg", "segments/000001.seg"]
+
+    segment, removed, before, after = commandLog.compactLog(path, "project")
+
+    assert segment == "segments/000002.seg"
+    assert removed == old
+    assert (before, after) == (3, 2)
+    assert commandLog.readManifest(read) == [segment]
+    assert not any(os.path.exists(os.path.join(path, name)) for name in old)
+
+    # Later segments are numbered after the compacted one
+    commandLog.appendCommands(path, "project", [move])
+    assert commandLog.sealSegment(path, "project") == "segments/000003.seg"
+
+
+def test_segmentNamesAreNotReusedAfterRevert(project):
+    import gitHelpers
+
+    cube = "bpy.ops.mesh.primitive_cube_add()"
+    repo, commits = project([[cube], ["bpy.ops.mesh.primitive_plane_add()"]])
+
+    gitHelpers.revert(repo, repo[commits[0]], "Revert")
+    commandLog.appendCommands(repo.workdir, "project", [cube])
+    gitHelpers.commit(repo, "Cube again")
+
+    read = commandLog.fileReader(repo.workdir)
+    assert commandLog.readManifest(read) == ["segments/000000.seg",
+                                             "segments/000002.seg"]
@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+pytest.importorskip("pygit2")
+
+import gitHelpers
+
+
+def test_getSizeStr():
+    assert gitHelpers.getSizeStr(512) == "512 B"
+    assert gitHelpers.getSizeStr(2048) == "2.0 KB"
+    assert gitHelpers.getSizeStr(3 * 1024 ** 3) == "3.0 GB"
+
+
+def test_repackPacksLooseObjects(project):
+    repo, _ = project([["bpy.ops.mesh.primitive_cube_add()"],
+                       ["bpy.ops.mesh.primitive_plane_add()"]])
+
+    before, after = gitHelpers.repack(repo)
+
+    assert before["loose"] > 0
+    assert after["loose"] == 0
+    assert after["packs"] == 1
+    assert after["packed"] == before["loose"]
+    assert gitHelpers.getObjectStats(repo) == after
+
+
+def test_repackKeepsRecentUnreachableObjects(project):
+    repo, _ = project([["bpy.ops.mesh.primitive_cube_add()"]])
+    blob = repo.create_blob(b"unreachable")
+    gitHelpers.repack(repo)
+
+    # Only kept in a pack, e.g. written by a tool keeping everything
+    builder = gitHelpers.git.PackBuilder(repo)
+    builder.add(blob)
+    builder.write(os.path.join(repo.path, "objects", "pack"))
+    objectsPath = os.path.join(repo.path, "objects")
+    for path in gitHelpers.getLooseObjects(objectsPath):
+        os.remove(path)
+    temp = os.path.join(repo.path, "objects", "ab", "tmp_obj_123")
+    os.makedirs(os.path.dirname(temp))
+    open(temp, "w").close()
+
+    gitHelpers.repack(repo)
+    assert blob in repo
+    assert blob in gitHelpers.getLooseObjects(objectsPath).values()
+    reopened = gitHelpers.git.Repository(repo.workdir)
+    assert reopened[blob].data == b"unreachable"
+    assert os.path.exists(temp)
+
+    gitHelpers.repack(repo, pruneExpire=-60)
+    assert blob not in gitHelpers.git.Repository(repo.workdir)
+
+
+def test_repackKeepsObjectsInReflogs(project):
+    repo, commits = project([["bpy.ops.mesh.primitive_cube_add()"],
+                             ["bpy.ops.mesh.primitive_plane_add()"]])
+    repo.head.set_target(commits[0], "reset: moving to first commit")
+
+    # Temporary files of interrupted writes are not objects
+    objectsPath = os.path.join(repo.path, "objects")
+    loose = len(gitHelpers.getLooseObjects(objectsPath))
+    temp = os.path.join(objectsPath, "ab", "tmp_obj_123")
+    os.makedirs(os.path.dirname(temp), exist_ok=True)
+    open(temp, "w").close()
+    assert gitHelpers.getObjectStats(repo)["loose"] == loose
+
+    gitHelpers.repack(repo, pruneExpire=-60)
+    assert commits[1] in gitHelpers.git.Repository(repo.workdir)
+
+
+def test_treeReaderReadsAssetsFromStore(project):
+    repo, _ = project([["bpy.ops.mesh.primitive_cube_add()"]])
+    path = os.path.join(repo.workdir, "assets", "slices", "abc1234-000.blend")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as file:
+        file.write(b"BLENDER")
+    commit = repo[gitHelpers.commit(repo, "Slice")]
+    os.remove(path)
+
+    read = gitHelpers.treeReader(repo, commit)
+    assert read("assets/slices/abc1234-000.blend", binary=True) == b"BLENDER"
+    assert read("assets/slices/missing.blend") is None
@@ -0,0 +1,68 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("pygit2")
+
+import gitHelpers
+import logIndex
+
+
+def getCredits(repo, commit=None):
+    return [(record.hex, command)
+            for record, command in gitHelpers.blame(repo, commit)]
+
+
+def test_identicalSegmentIsCreditedToLaterCommit(project):
+    cube = "bpy.ops.mesh.primitive_cube_add()"
+    move = "bpy.data.objects['Cube'].location = (1, 0, 0)"
+    repo, commits = project([[cube], [move], [cube]])
+
+    assert getCredits(repo) == [(str(commits[0]), cube),
+                                (str(commits[1]), move),
+                                (str(commits[2]), cube)]
+
+    ranges = gitHelpers.getLogIndex(repo).getRanges(commits[2])
+    assert [(first, last) for _, _, first, last in ranges] == [(2, 3)]
+
+
+def test_revertKeepsOriginalCredits(project):
+    cube = "bpy.ops.mesh.primitive_cube_add()"
+    plane = "bpy.ops.mesh.primitive_plane_add()"
+    repo, commits = project([[cube], [plane]])
+
+    reverted = gitHelpers.revert(repo, repo[commits[0]], "Revert")
+
+    assert getCredits(repo) == [(str(commits[0]), cube)]
+    assert gitHelpers.getLogIndex(repo).getRanges(reverted) == []
+
+
+def test_olderSidecarIsRebuilt(project):
+    cube = "bpy.ops.mesh.primitive_cube_add()"
+    repo, commits = project([[cube]])
+
+    path = os.path.join(gitHelpers.getBlenditPath(repo), logIndex.FILENAME)
+    with open(path, "w") as file:
+        file.write(json.dumps({"commit": str(commits[0]),
+                               "segments": [["0" * 40, 34, 1, 0, 0]]}) + "\n")
+    logIndex.indexes.clear()
+
+    assert getCredits(repo) == [(str(commits[0]), cube)]
+
+
+def test_segmentAddedOnTwoBranchesIsCreditedInHistory(project):
+    cube = "bpy.ops.mesh.primitive_cube_add()"
+    plane = "bpy.ops.mesh.primitive_plane_add()"
+    move = "bpy.data.objects['Cube'].location = (1, 0, 0)"
+    repo, commits = project([[cube], [plane]])
+
+    # Same segment committed again on a branch from the first commit
+    repo.reset(commits[0], gitHelpers.git.GIT_RESET_HARD)
+    gitHelpers.commandLog.appendCommands(repo.workdir, "project", [plane])
+    branched = gitHelpers.commit(repo, "Branched")
+    gitHelpers.commandLog.appendCommands(repo.workdir, "project", [move])
+    gitHelpers.commit(repo, "Move")
+    gitHelpers.getLogIndex(repo, commits[1])
+
+    assert getCredits(repo)[1] == (str(branched), plane)
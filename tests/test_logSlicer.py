@@ -0,0 +1,149 @@
+import logSlicer
+
+
+CUBE = "bpy.ops.mesh.primitive_cube_add(size=2)"
+PLANE = "bpy.ops.mesh.primitive_plane_add(size=2)"
+SPHERE = "bpy.ops.mesh.primitive_uv_sphere_add()"
+
+
+def sliceObject(commands, name, names=()):
+    return logSlicer.sliceCommands(commands, [("objects", name)], names)
+
+
+def test_sliceKeepsOnlyDependencies():
+    commands = [
+        CUBE,
+        PLANE,
+        "bpy.data.objects['Cube'].location = (1, 0, 0)",
+        "bpy.data.objects['Plane'].location = (0, 1, 0)",
+    ]
+    assert sliceObject(commands, "Cube") == [commands[0], commands[2]]
+    assert sliceObject(commands, "Plane") == [commands[1], commands[3]]
+
+
+def test_materialEditedThroughOtherObject():
+    commands = [
+        CUBE,
+        "bpy.data.objects['Cube'].active_material = bpy.data.materials['Mat']",
+        PLANE,
+        "bpy.data.objects['Plane'].active_material = bpy.data.materials['Mat']",
+        "bpy.context.object.active_material.roughness = 0.2",
+        SPHERE,
+    ]
+    assert sliceObject(commands, "Cube") == commands[:5]
+
+
+def test_explicitMaterialEdit():
+    commands = [
+        CUBE,
+        "bpy.ops.material.new()",
+        "bpy.context.object.active_material = bpy.data.materials['Material']",
+        PLANE,
+        "bpy.data.materials['Material'].diffuse_color = (1, 0, 0, 1)",
+    ]
+    assert sliceObject(commands, "Cube") == [commands[0], commands[1],
+                                             commands[2], commands[4]]
+
+
+def test_linkedDuplicateEditsSharedMesh():
+    commands = [
+        CUBE,
+        "bpy.ops.object.duplicate_move_linked()",
+        "bpy.ops.object.editmode_toggle()",
+        "bpy.ops.mesh.subdivide()",
+        "bpy.ops.object.editmode_toggle()",
+        PLANE,
+    ]
+    assert sliceObject(commands, "Cube") == commands[:5]
+
+    partitions = logSlicer.partition(commands)
+    assert sorted(map(sorted, partitions)) == [["Cube", "Cube.001"],
+                                               ["Plane"]]
+
+
+def test_blenditHelpers():
+    commands = [
+        CUBE,
+        "blendit.restoreMesh('Cube', 'meshes/Cube-000.mesh')",
+        "blendit.setObjectProperties('location', "
+        "{'Cube': (1, 0, 0), 'Plane': (0, 1, 0)})",
+    ]
+    assert sliceObject(commands, "Cube", ["Plane"]) == commands
+
+    # Every object assigned must exist for the batched assignment to run
+    assert sliceObject(commands, "Plane", ["Plane"]) == commands
+
+
+def test_appendedSlice():
+    commands = [
+        CUBE,
+        "blendit.appendSlice('assets/slices/abc1234-000.blend', ['Cube'], "
+        "'abc1234 slice')",
+        "bpy.data.objects['Cube.001'].location = (1, 0, 0)",
+    ]
+    effect = logSlicer.analyze(commands)[1]
+    assert ("objects", "Cube.001") in effect.writes
+    assert ("collections", "abc1234 slice") in effect.writes
+    assert sliceObject(commands, "Cube.001") == commands
+
+
+def test_selectionDeltaDependsOnPreviousSelection():
+    commands = [
+        CUBE,
+        PLANE,
+        "blendit.setSelection(['Cube'])",
+        "blendit.selectDelta(['Plane'], ['Cube'])",
+        "bpy.ops.transform.translate(value=(1, 0, 0))",
+    ]
+    effects = logSlicer.analyze(commands)
+    assert logSlicer.SELECTION in effects[2].kills
+    assert logSlicer.SELECTION not in effects[3].kills
+    assert ("objects", "Plane") in effects[4].writes
+
+    # The keyframe is kept for the delta applied on top of it
+    assert sliceObject(commands, "Plane") == commands
+
+
+def test_partitionJoinsSharedData():
+    commands = [
+        CUBE,
+        PLANE,
+        SPHERE,
+        "bpy.data.objects['Cube'].active_material = bpy.data.materials['Mat']",
+        "bpy.data.objects['Plane'].active_material = bpy.data.materials['Mat']",
+    ]
+    partitions = logSlicer.partition(commands)
+    assert sorted(map(sorted, partitions)) == [["Cube", "Plane"], ["Sphere"]]
+
+    groups = logSlicer.groupPartitions(partitions, 4, commands)
+    assert sorted(map(sorted, groups)) == [["Cube", "Plane"], ["Sphere"]]
+
+
+def test_partitionJoinsUnnamedData():
+    commands = [
+        CUBE,
+        "bpy.ops.material.new()",
+        PLANE,
+        SPHERE,
+        "bpy.data.objects['Sphere'].active_material = "
+        "bpy.data.materials['Material']",
+    ]
+    partitions = logSlicer.partition(commands)
+    assert sorted(map(sorted, partitions)) == [["Cube", "Sphere"], ["Plane"]]
+
+
+def test_partitionGroupsCoverEveryCommand():
+    commands = [
+        CUBE,
+        PLANE,
+        "bpy.data.objects['Cube'].location = (1, 0, 0)",
+        "bpy.context.scene.frame_end = 10",
+        "bpy.ops.view3d.view_all()",
+    ]
+    groups = logSlicer.getPartitionGroups(commands, 4)
+    assert sorted(groups) == [["Cube"], ["Plane"]]
+
+    # Data no object uses would be left out of every partition
+    commands.append("bpy.data.node_groups['Group'].use_fake_user = True")
+    assert logSlicer.getPartitionGroups(commands, 4) is None
+    assert logSlicer.getPartitionGroups(commands[:1], 4) is None
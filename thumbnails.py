@@ -0,0 +1,289 @@
+import os
+import sys
+import importlib
+import subprocess
+
+import bpy
+import bpy.utils.previews
+import gpu
+import numpy as np
+from mathutils import Vector
+
+import pygit2 as git
+from pygit2._pygit2 import GitError
+
+# Local imports implemented to support Blender refreshes
+modulesNames = ("gitHelpers",)
+for module in modulesNames:
+    if module in sys.modules:
+        importlib.reload(sys.modules[module])
+    else:
+        parent = ".".join(__name__.split(".")[:-1])
+        globals()[module] = importlib.import_module(f"{parent}.{module}")
+
+
+"""
+    Commit thumbnails, .git/blendit/thumbnails/<commit id>.png
+
+    Captured from the 3D Viewport when committing. If enabled, commits
+    without one are regenerated and rendered by a headless Blender process
+    in the background, one at a time, newest first. Commits that failed to
+    render, like empty ones, are listed in thumbnails/failed and skipped.
+"""
+THUMBNAILS_DIR = "thumbnails"
+THUMBNAIL_SIZE = 128
+FAILED_FILE = "failed"
+
+# Seconds between checks for missing thumbnails
+BACKFILL_INTERVAL = 5
+
+# Only the most recent commits are back-filled
+BACKFILL_LIMIT = 20
+
+BATCH_REGEN = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "batchRegen.py")
+
+# Loaded previews, keyed by commit id
+previews = None
+
+# Project path -> thumbnails directory
+thumbnailsPaths = {}
+
+# Running back-fill process, (repository, commit id, process)
+backfillProcess = None
+enabled = False
+
+
+def getThumbnailPath(repo, oid):
+    """Returns path of the thumbnail of commit oid"""
+
+    return os.path.join(gitHelpers.getBlenditPath(repo), THUMBNAILS_DIR,
+                        f"{oid}.png")
+
+
+def getFailedCommits(repo):
+    """Returns set of commit ids whose thumbnail failed to render"""
+
+    path = os.path.join(gitHelpers.getBlenditPath(repo), THUMBNAILS_DIR,
+                        FAILED_FILE)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as file:
+        return set(file.read().split())
+
+
+def addFailedCommit(repo, oid):
+    """Records that the thumbnail of commit oid failed to render"""
+
+    directory = os.path.join(gitHelpers.getBlenditPath(repo), THUMBNAILS_DIR)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, FAILED_FILE), "a") as file:
+        file.write(f"{oid}\n")
+
+
+def saveImage(pixels, width, height, path):
+    """Saves float RGBA pixels as a PNG"""
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image = bpy.data.images.new("Blendit Thumbnail", width, height,
+                                alpha=True)
+    image.pixels.foreach_set(pixels)
+    image.filepath_raw = path
+    image.file_format = 'PNG'
+    image.save()
+    bpy.data.images.remove(image)
+
+
+def captureViewport(path):
+    """
+    Draws the first 3D Viewport offscreen into a thumbnail at path
+    Uses no operators, so nothing is reported into the command log.
+    Returns True if a thumbnail was saved.
+    """
+
+    for window in bpy.context.window_manager.windows:
+        area = next((area for area in window.screen.areas
+                     if area.type == 'VIEW_3D'), None)
+        if area:
+            break
+    else:
+        return False
+
+    space = area.spaces.active
+    region = next(region for region in area.regions
+                  if region.type == 'WINDOW')
+    width = THUMBNAIL_SIZE
+    height = max(1, THUMBNAIL_SIZE * region.height // max(1, region.width))
+
+    offscreen = gpu.types.GPUOffScreen(width, height)
+    offscreen.draw_view3d(
+        bpy.context.scene,
+        bpy.context.view_layer,
+        space,
+        region,
+        space.region_3d.view_matrix,
+        space.region_3d.window_matrix,
+        do_color_management=True
+    )
+    with offscreen.bind():
+        framebuffer = gpu.state.active_framebuffer_get()
+        buffer = framebuffer.read_color(0, 0, width, height, 4, 0, 'UBYTE')
+    offscreen.free()
+
+    buffer.dimensions = width * height * 4
+    pixels = np.array(buffer, dtype=np.float32) / 255
+    saveImage(pixels, width, height, path)
+    return True
+
+
+def renderHeadless(path):
+    """Renders the scene with Workbench into a thumbnail at path"""
+
+    scene = bpy.context.scene
+    camera = scene.camera
+    if camera is None:
+        camera = addFramingCamera(scene)
+        if camera is None:
+            return False
+
+    render = scene.render
+    render.engine = 'BLENDER_WORKBENCH'
+    render.resolution_x = THUMBNAIL_SIZE
+    render.resolution_y = THUMBNAIL_SIZE * 3 // 4
+    render.resolution_percentage = 100
+    render.image_settings.file_format = 'PNG'
+    render.filepath = path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    bpy.ops.render.render(write_still=True)
+    return True
+
+
+def addFramingCamera(scene):
+    """Adds a camera looking at every visible object, None if empty"""
+
+    points = [obj.matrix_world @ Vector(corner)
+              for obj in scene.objects if obj.visible_get()
+              for corner in obj.bound_box]
+    if not points:
+        return None
+
+    low = Vector(map(min, zip(*points)))
+    high = Vector(map(max, zip(*points)))
+    center = (low + high) / 2
+    radius = max((high - low).length / 2, 0.1)
+
+    data = bpy.data.cameras.new("Blendit Thumbnail")
+    camera = bpy.data.objects.new("Blendit Thumbnail", data)
+    scene.collection.objects.link(camera)
+
+    direction = Vector((1, -1, 0.8)).normalized()
+    camera.location = center + direction * radius * 3
+    camera.rotation_euler = (-direction).to_track_quat('-Z', 'Y').to_euler()
+    data.clip_end = radius * 10
+    scene.camera = camera
+    return camera
+
+
+def getIcon(oid):
+    """Returns icon id of the thumbnail of commit oid, 0 if missing"""
+
+    if previews is None:
+        return 0
+    if oid in previews:
+        return previews[oid].icon_id
+
+    # Called while drawing, the repository is only opened once per project
+    filepath = bpy.path.abspath("//")
+    if filepath not in thumbnailsPaths:
+        try:
+            repo = git.Repository(filepath)
+        except GitError:
+            return 0
+        thumbnailsPaths[filepath] = os.path.dirname(
+            getThumbnailPath(repo, oid))
+
+    path = os.path.join(thumbnailsPaths[filepath], f"{oid}.png")
+    if not os.path.exists(path):
+        return 0
+    return previews.load(oid, path, 'IMAGE').icon_id
+
+
+def startBackfill(repo, oid):
+    """Starts a headless Blender rendering the thumbnail of commit oid"""
+
+    global backfillProcess
+
+    path = getThumbnailPath(repo, oid)
+    output = os.path.join(os.path.dirname(path), "backfill.blend")
+    backfillProcess = (repo, oid, subprocess.Popen(
+        [bpy.app.binary_path, "-b", "--factory-startup",
+         "--python-exit-code", "1", "--python", BATCH_REGEN,
+         "--", "--worker", repo.workdir, oid, output, "--thumbnail", path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+
+
+def backfillThumbnails():
+    """Renders missing thumbnails of listed commits, one at a time"""
+
+    global backfillProcess
+
+    if backfillProcess:
+        repo, oid, process = backfillProcess
+        if process.poll() is None:
+            return BACKFILL_INTERVAL
+        if process.returncode != 0:
+            addFailedCommit(repo, oid)
+        backfillProcess = None
+
+    if not bpy.data.filepath:
+        return BACKFILL_INTERVAL
+
+    try:
+        repo = git.Repository(bpy.path.abspath("//"))
+    except GitError:
+        return BACKFILL_INTERVAL
+
+    failedCommits = getFailedCommits(repo)
+    commitsList = bpy.context.window_manager.blendit.commitsList
+    for item in commitsList[:BACKFILL_LIMIT]:
+        if item.id in failedCommits:
+            continue
+        if not os.path.exists(getThumbnailPath(repo, item.id)):
+            startBackfill(repo, item.id)
+            break
+
+    return BACKFILL_INTERVAL
+
+
+def setEnabled(value):
+    """Starts or stops back-filling missing thumbnails"""
+
+    global enabled, backfillProcess
+    if value == enabled:
+        return
+    enabled = value
+
+    if enabled:
+        bpy.app.timers.register(backfillThumbnails,
+                                first_interval=BACKFILL_INTERVAL, 
+                                persistent=True)
+    else:
+        if bpy.app.timers.is_registered(backfillThumbnails):
+            bpy.app.timers.unregister(backfillThumbnails)
+        if backfillProcess:
+            backfillProcess[2].terminate()
+            backfillProcess = None
+
+
+def register():
+    global previews
+    previews = bpy.utils.previews.new()
+
+
+def unregister():
+    global previews
+    setEnabled(False)
+    if previews is not None:
+        bpy.utils.previews.remove(previews)
+        previews = None